@@ -0,0 +1,218 @@
+import asyncio
+import base64
+import datetime
+import itertools
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import Response
+from googleapiclient.errors import HttpError
+from calender_list import iter_calendars
+from event_index import UpcomingEvents
+from event_sync import STORE_FILE, EventStore
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Threads that run blocking googleapiclient and SQLite work; bounds concurrent Calendar calls
+CALENDAR_WORKERS = int(os.environ.get('CALENDAR_WORKERS', 8))
+
+# Local event store shared by every route and by the push-notification sync
+STORE_PATH = os.environ.get('CALENDAR_STORE', STORE_FILE)
+
+# How long the calendar list is reused before it is fetched again
+CALENDAR_LIST_MAX_AGE = 300
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+executor = ThreadPoolExecutor(max_workers=CALENDAR_WORKERS, thread_name_prefix='calendar')
+store = EventStore(STORE_PATH)
+router = APIRouter()
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+_refreshes = {}
+_calendar_list = {'fetched': None, 'items': []}
+
+
+class FastJSONResponse(Response):
+    """
+    JSON response rendered with orjson when it is installed.
+    """
+
+    media_type = 'application/json'
+
+    def render(self, content):
+        if orjson is not None:
+            return orjson.dumps(content)
+        return json.dumps(content, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, valid):
+    """
+    Decode a cursor made by encode_cursor(); valid(key) checks it has the shape the endpoint expects.
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        key = None
+    if key is None or not valid(key):
+        raise HTTPException(status_code=400, detail='Invalid cursor')
+    return key
+
+
+def _is_calendar_key(key):
+    return isinstance(key, str)
+
+
+def _is_event_key(key):
+    # EventIndex.key(): [start timestamp, event ID]
+    return (isinstance(key, list) and len(key) == 2 and isinstance(key[0], (int, float))
+            and not isinstance(key[0], bool) and isinstance(key[1], str))
+
+
+def _parse_time(value):
+    if value is None:
+        return None
+    try:
+        moment = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f'Invalid RFC3339 time: {value}')
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return moment
+
+
+def _page(items, limit, key):
+    """
+    Take one page from an iterator that yields at least one item past the page when there are more.
+    """
+    items = list(itertools.islice(items, limit + 1))
+    next_cursor = encode_cursor(key(items[limit - 1])) if len(items) > limit else None
+    return {'items': items[:limit], 'next_cursor': next_cursor}
+
+
+def _upcoming_events(calendar_id):
+    with _indexes_lock:
+        upcoming = _indexes.get(calendar_id)
+        if upcoming is None:
+            upcoming = _indexes[calendar_id] = UpcomingEvents(calendar_id, store)
+        return upcoming
+
+
+async def _run(function, *args):
+    """
+    Run blocking work on the bounded executor, translating API errors into HTTP errors.
+    """
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, function, *args)
+    except HttpError as error:
+        status = error.resp.status if error.resp.status in (403, 404, 410) else 502
+        raise HTTPException(status_code=status, detail=str(error))
+
+
+def _refresh_done(calendar_id, upcoming, future):
+    _refreshes.pop(calendar_id, None)
+    if future.cancelled() or future.exception() is None:
+        return
+    if upcoming.cached_index()[0] is None:
+        # Nothing was ever loaded, so the waiting request reports the error; do not keep an
+        # index object around for a calendar that cannot be read
+        with _indexes_lock:
+            if _indexes.get(calendar_id) is upcoming:
+                del _indexes[calendar_id]
+    else:
+        # Background refreshes have no caller to report to; the stale index keeps being served
+        print(f"Refreshing {calendar_id} failed: {future.exception()}")
+
+
+async def _index(calendar_id):
+    """
+    Return the calendar's EventIndex without blocking the event loop.
+    A stale index is served as-is while one background refresh per calendar brings it up to date;
+    only the very first request for a calendar waits for the sync.
+    """
+    upcoming = _upcoming_events(calendar_id)
+    index, fresh = upcoming.cached_index()
+    if fresh:
+        return index
+
+    refresh = _refreshes.get(calendar_id)
+    if refresh is None:
+        refresh = asyncio.ensure_future(_run(upcoming.index))
+        _refreshes[calendar_id] = refresh
+        refresh.add_done_callback(lambda future: _refresh_done(calendar_id, upcoming, future))
+    if index is not None:
+        return index
+
+    return await asyncio.shield(refresh)
+
+
+def on_calendar_changed(calendar_id, result=None):
+    """
+    ChannelManager listener: the store was updated behind the index's back, so rebuild it on next use.
+    """
+    with _indexes_lock:
+        upcoming = _indexes.get(calendar_id)
+    if upcoming is not None:
+        upcoming.invalidate(rebuild=True)
+
+
+def _fetch_calendar_list():
+    items = sorted(iter_calendars(fields=('id', 'summary', 'timeZone', 'primary', 'accessRole')),
+                   key=lambda calendar: calendar['id'])
+    _calendar_list['items'] = items
+    _calendar_list['fetched'] = time.monotonic()
+    return items
+
+
+@router.get('/calendars', response_class=FastJSONResponse)
+async def list_calendars(limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: str | None = None):
+    fetched = _calendar_list['fetched']
+    items = _calendar_list['items']
+    if fetched is None or time.monotonic() - fetched > CALENDAR_LIST_MAX_AGE:
+        items = await _run(_fetch_calendar_list)
+
+    after = decode_cursor(cursor, _is_calendar_key) if cursor else None
+    remaining = (calendar for calendar in items if after is None or calendar['id'] > after)
+    return FastJSONResponse(_page(remaining, limit, lambda calendar: calendar['id']))
+
+
+@router.get('/calendars/{calendar_id}/events', response_class=FastJSONResponse)
+async def list_calendar_events(calendar_id: str, time_min: str | None = None, time_max: str | None = None,
+                               limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                               cursor: str | None = None):
+    """
+    Events (recurring ones expanded into instances) starting in [time_min, time_max), in start order.
+    Served from the local index, which covers a year either side of now.
+    """
+    index = await _index(calendar_id)
+    after = decode_cursor(cursor, _is_event_key) if cursor else None
+    events = index.scan(after=after, start_min=_parse_time(time_min), start_max=_parse_time(time_max))
+    return FastJSONResponse(_page(events, limit, index.key))
+
+
+@router.get('/upcoming', response_class=FastJSONResponse)
+async def upcoming_events(calendar_id: str = 'primary', limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+                          cursor: str | None = None):
+    """
+    Events that have not ended yet, in start order, like events().list(timeMin=now, orderBy='startTime').
+    """
+    index = await _index(calendar_id)
+    now = time.time()
+    if cursor:
+        events = index.scan(after=decode_cursor(cursor, _is_event_key), ended_after=now)
+    else:
+        # The segment tree finds the first page, including events already in progress, in O(log n)
+        events = iter(index.upcoming(limit + 1, now))
+    return FastJSONResponse(_page(events, limit, index.key))
@@ -1,12 +1,66 @@
 
 
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
+import asyncio
+import os
+import sys
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header
+from fastapi.responses import HTMLResponse, Response
 from fastapi.templating import Jinja2Templates
 
-app = FastAPI()
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# The Calendar client modules live next to this app as plain scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'CalenderAPI'))
+
+import calendar_routes
+from response_cache import CacheMiddleware, ResponseCache
+from static_assets import PrecompressedStaticFiles
+from tracing import PROMETHEUS_CONTENT_TYPE, render_metrics
+from watch_channels import ChannelManager
+
+# Public HTTPS URL of the /calendar/notifications route; push notifications are off when unset
+WEBHOOK_URL = os.environ.get('CALENDAR_WEBHOOK_URL')
+
+# Comma-separated calendars to watch for changes
+WATCH_CALENDARS = os.environ.get('CALENDAR_WATCH_IDS', 'primary')
+
+channel_manager = None
+
+# Shared by the middleware and by anything that needs to invalidate cached responses
+response_cache = ResponseCache()
+
+
+def invalidate_calendar_responses(calendar_id, result=None):
+    # Drop cached pages that may include the changed calendar's events
+    response_cache.invalidate_prefix(f'/calendars/{calendar_id}/')
+    response_cache.invalidate_prefix('/upcoming')
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global channel_manager
+    if WEBHOOK_URL:
+        channel_manager = ChannelManager(WEBHOOK_URL, store=calendar_routes.store).start()
+        channel_manager.add_listener(calendar_routes.on_calendar_changed)
+        channel_manager.add_listener(invalidate_calendar_responses)
+        calendar_ids = [part.strip() for part in WATCH_CALENDARS.split(',') if part.strip()]
+        # These calls go to the API, so they run on the executor instead of blocking the event loop
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(calendar_routes.executor, channel_manager.retain, calendar_ids)
+        for calendar_id in calendar_ids:
+            await loop.run_in_executor(calendar_routes.executor, channel_manager.ensure_watch, calendar_id)
+    yield
+    if channel_manager is not None:
+        # Waits for a running sync to finish
+        await asyncio.get_running_loop().run_in_executor(calendar_routes.executor, channel_manager.close)
+        channel_manager = None
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(CacheMiddleware, cache=response_cache)
+app.include_router(calendar_routes.router)
+# Assets get .br/.gz copies at startup; link them via static_files.asset_path() for immutable caching
+static_files = PrecompressedStaticFiles(directory="static")
+app.mount("/static", static_files, name="static")
 
 @app.get("/")
 def read_root():
@@ -15,4 +69,24 @@ def read_root():
 
 @app.get("/items/{item_id}")
 def read_item(item_id: int, q: str | None = None):
-    return {"item_id": item_id, "q": q}
\ No newline at end of file
+    return {"item_id": item_id, "q": q}
+
+
+@app.get("/metrics")
+def metrics():
+    # Calendar client latency, retry, transfer, credential and discovery metrics for Prometheus
+    return Response(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@app.post("/calendar/notifications")
+async def calendar_notification(
+    x_goog_channel_id: str = Header(),
+    x_goog_resource_id: str = Header(),
+    x_goog_resource_state: str = Header(),
+    x_goog_channel_token: str | None = Header(default=None),
+):
+    # Only validate and queue here; the sync runs on the channel manager's worker thread
+    if channel_manager is None or channel_manager.handle_notification(
+            x_goog_channel_id, x_goog_channel_token, x_goog_resource_id, x_goog_resource_state) is None:
+        return Response(status_code=404)
+    return Response(status_code=200)
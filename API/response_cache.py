@@ -0,0 +1,223 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode
+from tracing import REGISTRY
+
+# Default bounds of the response cache
+MAX_ENTRIES = 1024
+TTL_SECONDS = 30
+
+# Responses larger than this are streamed through without being cached
+MAX_BODY_BYTES = 1024 * 1024
+
+# Paths that are never cached: live metrics and static files, which have their own caching
+EXCLUDED_PREFIXES = ('/metrics', '/static/')
+
+CACHE_EVENTS = REGISTRY.counter(
+    'http_response_cache_events_total', 'Response cache hits, misses, evictions and invalidations.', ('event',))
+
+
+def cache_key(path, query_string=b''):
+    """
+    Hash a route path and its query parameters; parameter order does not matter.
+    """
+    if isinstance(query_string, bytes):
+        query_string = query_string.decode('latin-1')
+    query = urlencode(sorted(parse_qsl(query_string, keep_blank_values=True)))
+    return hashlib.blake2b(f'{path}?{query}'.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU store with a per-entry time to live.
+    Every entry remembers the path it was stored for, so whole route prefixes can be invalidated.
+    Args:
+        max_entries (int): Least recently used entries are evicted beyond this size.
+        ttl (float): Seconds an entry stays fresh.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.listeners = []
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def _count(self, name, amount=1):
+        self._stats[name] += amount
+        CACHE_EVENTS.inc(name, amount=amount)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry['expires'] <= time.monotonic():
+                del self.entries[key]
+                self._count('expirations')
+                entry = None
+            if entry is None:
+                self._count('misses')
+                return None
+            self.entries.move_to_end(key)
+            self._count('hits')
+            return entry
+
+    def set(self, key, path, value, ttl=None):
+        """
+        Store value (a dict) under key; it is returned from get() with 'path' and 'expires' added.
+        """
+        entry = dict(value, path=path, expires=time.monotonic() + (self.ttl if ttl is None else ttl))
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self._count('evictions')
+        return entry
+
+    def invalidate(self, key):
+        with self.lock:
+            if self.entries.pop(key, None) is not None:
+                self._count('invalidations')
+
+    def invalidate_prefix(self, prefix):
+        """
+        Drop every entry whose path starts with prefix, e.g. '/items/' or '/calendars/primary'.
+        Returns the number of entries dropped.
+        """
+        with self.lock:
+            keys = [key for key, entry in self.entries.items() if entry['path'].startswith(prefix)]
+            for key in keys:
+                del self.entries[key]
+            if keys:
+                self._count('invalidations', len(keys))
+        for listener in self.listeners:
+            listener(prefix)
+        return len(keys)
+
+    def clear(self):
+        self.invalidate_prefix('')
+
+    def add_listener(self, callback):
+        """
+        Call callback(prefix) after every prefix invalidation, e.g. to purge a downstream cache.
+        """
+        self.listeners.append(callback)
+
+    def stats(self):
+        with self.lock:
+            return dict(self._stats, entries=len(self.entries))
+
+
+def _etag_matches(if_none_match, etag):
+    """
+    If-None-Match uses the weak comparison: W/ prefixes are ignored and '*' matches anything.
+    """
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*' or candidate.removeprefix('W/') == etag:
+            return True
+    return False
+
+
+class CacheMiddleware:
+    """
+    ASGI middleware that serves repeated GET requests from a ResponseCache.
+    Successful responses are stored under a hash of path and query parameters with a strong ETag
+    (a digest of the body); a matching If-None-Match is answered with 304 and no body.
+    Responses marked no-store or private, requests carrying Authorization, and bodies over
+    max_body bytes bypass the cache.
+    Args:
+        app: The ASGI app to wrap.
+        cache (ResponseCache): Shared store; pass one in to invalidate it from route handlers.
+        exclude (tuple): Path prefixes that are never cached.
+        max_body (int): Largest body that is cached.
+    """
+
+    def __init__(self, app, cache=None, exclude=EXCLUDED_PREFIXES, max_body=MAX_BODY_BYTES):
+        self.app = app
+        self.cache = cache or ResponseCache()
+        self.exclude = tuple(exclude)
+        self.max_body = max_body
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] not in ('GET', 'HEAD') \
+                or scope['path'].startswith(self.exclude):
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = dict(scope['headers'])
+        if b'authorization' in request_headers:
+            await self.app(scope, receive, send)
+            return
+
+        key = cache_key(scope['path'], scope.get('query_string', b''))
+        entry = self.cache.get(key)
+        if entry is not None:
+            await self._send_entry(entry, request_headers, send, scope['method'] == 'HEAD', b'HIT')
+            return
+        if scope['method'] == 'HEAD':
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        chunks = []
+        size = 0
+        passthrough = False
+
+        async def capture(message):
+            nonlocal start, size, passthrough
+            if passthrough:
+                await send(message)
+            elif message['type'] == 'http.response.start':
+                start = message
+            elif message['type'] == 'http.response.body':
+                chunks.append(message.get('body', b''))
+                size += len(chunks[-1])
+                if size > self.max_body and message.get('more_body', False):
+                    # Too large to cache: flush what we have and stream the rest through
+                    passthrough = True
+                    await send(start)
+                    await send({'type': 'http.response.body', 'body': b''.join(chunks), 'more_body': True})
+                elif not message.get('more_body', False):
+                    await self._finish(key, scope['path'], start, b''.join(chunks), request_headers, send)
+
+        await self.app(scope, receive, capture)
+
+    async def _finish(self, key, path, start, body, request_headers, send):
+        headers = [(name, value) for name, value in start.get('headers', [])
+                   if name.lower() not in (b'content-length', b'etag')]
+        cache_control = b', '.join(value for name, value in headers if name.lower() == b'cache-control')
+        value = {
+            'status': start['status'],
+            'headers': headers,
+            'body': body,
+            'etag': '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"',
+        }
+        # A body sent in one message never took the passthrough path, so its size is checked here
+        cacheable = start['status'] == 200 and len(body) <= self.max_body
+        if cacheable and b'no-store' not in cache_control and b'private' not in cache_control:
+            value = self.cache.set(key, path, value)
+        await self._send_entry(value, request_headers, send, False, b'MISS')
+
+    async def _send_entry(self, entry, request_headers, send, head, cache_status):
+        headers = list(entry['headers'])
+        etag = entry['etag'].encode('latin-1')
+        headers.append((b'etag', etag))
+        headers.append((b'x-cache', cache_status))
+        if not any(name.lower() == b'cache-control' for name, _ in headers):
+            # Clients may keep the response but must revalidate it, which costs a 304 at most
+            headers.append((b'cache-control', b'no-cache'))
+
+        if_none_match = request_headers.get(b'if-none-match')
+        if entry['status'] == 200 and if_none_match and _etag_matches(if_none_match.decode('latin-1'), entry['etag']):
+            headers = [(name, value) for name, value in headers if name.lower() != b'content-type']
+            await send({'type': 'http.response.start', 'status': 304, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        headers.append((b'content-length', str(len(entry['body'])).encode('latin-1')))
+        await send({'type': 'http.response.start', 'status': entry['status'], 'headers': headers})
+        await send({'type': 'http.response.body', 'body': b'' if head else entry['body']})
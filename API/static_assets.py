@@ -0,0 +1,261 @@
+import argparse
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import stat
+import sys
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Files smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 256
+
+# Media types that compress well; images, video and archives are already compressed
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'application/xml',
+                      'application/wasm', 'image/svg+xml', 'font/ttf', 'font/otf', 'application/vnd.ms-fontobject')
+
+# Sidecar file suffix of each content coding, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Hex digits of the content digest put into fingerprinted names
+DIGEST_LENGTH = 12
+
+# Fingerprinted names made by asset_path(), like app.3f2a9c1e07bd.css
+HASHED_NAME = re.compile(rf'^(?P<stem>.+)\.(?P<digest>[0-9a-f]{{{DIGEST_LENGTH}}})(?P<suffix>\.[^./]+)$')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+
+def is_compressible(path):
+    if path.endswith(tuple(suffix for _, suffix in ENCODINGS)):
+        return False
+    media_type = mimetypes.guess_type(path)[0] or ''
+    return media_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def _write_atomic(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as out:
+        out.write(data)
+    os.replace(tmp_path, path)
+
+
+def _compress(encoding, data):
+    if encoding == 'br':
+        return brotli.compress(data, quality=11)
+    # mtime=0 keeps the output identical between builds
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def precompress(directory, min_size=MIN_COMPRESS_SIZE, force=False):
+    """
+    Write .gz (and, when the brotli package is installed, .br) copies next to every compressible file.
+    Up-to-date copies are kept, so this is cheap to run on every start as well as at build time.
+    A copy that would not be smaller than the original is not kept.
+    Returns: (files compressed, bytes before, bytes after) for the copies written.
+    """
+    encodings = [(encoding, suffix) for encoding, suffix in ENCODINGS if encoding != 'br' or brotli is not None]
+    written = 0
+    before = after = 0
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            if not is_compressible(path):
+                continue
+            source = os.stat(path)
+            data = None
+            for encoding, suffix in encodings:
+                target = path + suffix
+                try:
+                    if not force and os.stat(target).st_mtime >= source.st_mtime:
+                        continue
+                except FileNotFoundError:
+                    pass
+                if data is None:
+                    with open(path, 'rb') as asset:
+                        data = asset.read()
+                compressed = _compress(encoding, data) if len(data) >= min_size else None
+                if compressed is None or len(compressed) >= len(data):
+                    if os.path.exists(target):
+                        os.remove(target)
+                    continue
+                _write_atomic(target, compressed)
+                written += 1
+                before += len(data)
+                after += len(compressed)
+    return written, before, after
+
+
+def fingerprint(path):
+    with open(path, 'rb') as asset:
+        return hashlib.file_digest(asset, lambda: hashlib.blake2b(digest_size=DIGEST_LENGTH // 2)).hexdigest()
+
+
+def _accepted_encodings(accept_encoding):
+    """
+    Parse an Accept-Encoding header into the set of codings with a non-zero q-value.
+    """
+    accepted = set()
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(coding.strip().lower())
+    if '*' in accepted:
+        accepted.update(encoding for encoding, _ in ENCODINGS)
+    return accepted
+
+
+class _AssetResponse(FileResponse):
+    # Larger reads mean fewer event loop round trips for big files when the server cannot sendfile
+    chunk_size = 256 * 1024
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles that serves precompressed .br/.gz copies and long-lived caching headers.
+    The copies are written once (see precompress()) and picked per request from Accept-Encoding;
+    each gets its own ETag and responses carry Vary: Accept-Encoding.
+    Files are also reachable under fingerprinted names (see asset_path()); those are sent with an
+    immutable Cache-Control while the file is as it was when scanned, everything else with no-cache. Range requests are answered by FileResponse, and servers that offer the
+    http.response.pathsend extension send files without copying them through Python.
+    Args:
+        directory (str): Directory to serve.
+        compress (bool): Write missing or stale .br/.gz copies when the app is created.
+        min_size (int): Smallest file that gets compressed copies.
+        **kwargs: Passed on to StaticFiles.
+    """
+
+    def __init__(self, directory, compress=True, min_size=MIN_COMPRESS_SIZE, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        if compress:
+            precompress(directory, min_size)
+        self.fingerprints = {}
+        self.scanned = {}
+        self.variants = {}
+        self.scan()
+
+    def scan(self):
+        """
+        Record the content digest, size and mtime and the compressed copies of every file;
+        call again after deploying new assets.
+        """
+        fingerprints = {}
+        scanned = {}
+        variants = {}
+        for directory in self.all_directories:
+            for root, _, names in os.walk(directory):
+                for name in names:
+                    path = os.path.join(root, name)
+                    if name.endswith(tuple(suffix for _, suffix in ENCODINGS)):
+                        continue
+                    relative = os.path.relpath(path, directory).replace(os.sep, '/')
+                    if relative not in fingerprints:
+                        stat_result = os.stat(path)
+                        fingerprints[relative] = fingerprint(path)
+                        scanned[relative] = (stat_result.st_mtime_ns, stat_result.st_size)
+                    found = {}
+                    for encoding, suffix in ENCODINGS:
+                        try:
+                            found[encoding] = (path + suffix, os.stat(path + suffix))
+                        except FileNotFoundError:
+                            continue
+                    if found:
+                        variants[os.path.realpath(path)] = found
+        self.fingerprints = fingerprints
+        self.scanned = scanned
+        self.variants = variants
+
+    def asset_path(self, path):
+        """
+        Return the fingerprinted name of a file, e.g. 'static.css' -> 'static.3f2a9c1e07bd.css',
+        to put into page URLs; unknown files are returned unchanged.
+        """
+        digest = self.fingerprints.get(path)
+        if digest is None:
+            return path
+        stem, suffix = os.path.splitext(path)
+        return f'{stem}.{digest}{suffix}'
+
+    def _fingerprinted(self, path):
+        """
+        Return the file that a name made by asset_path() stands for, or None if path is not one.
+        """
+        head, name = os.path.split(path)
+        match = HASHED_NAME.match(name)
+        if not match:
+            return None
+        original = os.path.join(head, match['stem'] + match['suffix']).replace(os.sep, '/')
+        return original if self.fingerprints.get(original) == match['digest'] else None
+
+    def lookup_path(self, path):
+        full_path, stat_result = super().lookup_path(path)
+        if stat_result is None:
+            # Map a fingerprinted name back to the file whose digest was recorded by scan()
+            original = self._fingerprinted(path)
+            if original is not None:
+                return super().lookup_path(original)
+        return full_path, stat_result
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        request_headers = Headers(scope=scope)
+        # A file changed since scan() may no longer match its digest, so it is not cached for good
+        original = self._fingerprinted(self.get_path(scope))
+        immutable = original is not None and \
+            self.scanned.get(original) == (stat_result.st_mtime_ns, stat_result.st_size)
+        headers = {'cache-control': IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL}
+        media_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+        path = full_path
+        variants = self.variants.get(os.path.realpath(full_path))
+        if variants:
+            headers['vary'] = 'Accept-Encoding'
+            accepted = _accepted_encodings(request_headers.get('accept-encoding', ''))
+            for encoding, _ in ENCODINGS:
+                if encoding in accepted and encoding in variants:
+                    variant_path, variant_stat = variants[encoding]
+                    # A copy older than its source was left over from a previous build
+                    if variant_stat.st_mtime >= stat_result.st_mtime and stat.S_ISREG(variant_stat.st_mode):
+                        path, stat_result = variant_path, variant_stat
+                        headers['content-encoding'] = encoding
+                        break
+
+        response = _AssetResponse(path, status_code=status_code, headers=headers, media_type=media_type,
+                                  stat_result=stat_result)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Precompress static assets to gzip and brotli.')
+    parser.add_argument('directory', nargs='?', default='static')
+    parser.add_argument('--min-size', type=int, default=MIN_COMPRESS_SIZE)
+    parser.add_argument('--force', action='store_true', help='Recompress files whose copies are up to date')
+    args = parser.parse_args(argv)
+
+    if brotli is None:
+        print("brotli is not installed; writing gzip copies only (pip install brotli)")
+    written, before, after = precompress(args.directory, args.min_size, args.force)
+    print(f"Wrote {written} compressed copies: {before} -> {after} bytes.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
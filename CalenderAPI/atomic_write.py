@@ -0,0 +1,32 @@
+import contextlib
+import os
+import uuid
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode='w', private=False, fsync=False, **open_args):
+    """
+    Write a file under a temporary name in the same directory and move it over path when the
+    block completes, so readers see either the old file or the whole new one. If the block
+    raises, the temporary file is removed and path is left as it was.
+    Args:
+        path (str): File to write.
+        mode (str): 'w' or 'wb'; open_args (encoding, newline, ...) are passed to open().
+        private (bool): Create the file readable by the owner only, e.g. for credentials.
+        fsync (bool): Flush the data to disk before the rename.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    tmp_path = os.path.join(directory, f'.{name}.{uuid.uuid4().hex[:8]}.tmp')
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+    fd = os.open(tmp_path, flags, 0o600 if private else 0o666)
+    try:
+        with open(fd, mode, **open_args) as stream:
+            yield stream
+            if fsync:
+                stream.flush()
+                os.fsync(stream.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
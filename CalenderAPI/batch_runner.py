@@ -0,0 +1,97 @@
+import time
+from googleapiclient.errors import HttpError
+from request_scheduler import backoff_delay, get_scheduler, is_retryable
+from tracing import API_RETRIES
+
+# Google recommends at most 50 calls per Calendar batch request
+BATCH_SIZE = 50
+
+# How many times a failed item is retried before it is reported as failed
+MAX_RETRIES = 4
+
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _execute_batch(service, scheduler, requests):
+    """
+    Send one batch request and return {request_id: (response, HttpError or None)}.
+    """
+    results = {}
+
+    def callback(request_id, response, exception):
+        results[request_id] = (response, exception)
+
+    batch = service.new_batch_http_request(callback=callback)
+    for request_id, request in requests.items():
+        batch.add(request, request_id=request_id)
+    # A batch counts as one API call per item against the quota; failed items are retried by
+    # execute_batched() alone, so the scheduler does not resend the whole batch as well
+    scheduler.execute(batch, cost=len(requests), max_retries=0)
+    return results
+
+
+def execute_batched(service, requests, batch_size=BATCH_SIZE, max_retries=MAX_RETRIES,
+                    scheduler=None, ok_statuses=()):
+    """
+    Execute many API requests packed into Calendar batch requests.
+    Only items that failed with a retryable error are resent, with jittered exponential backoff;
+    server errors are only retried for idempotent items (see is_retryable()).
+    Args:
+        service: Calendar service the requests were made from.
+        requests (iterable): (request_id, HttpRequest) pairs; consumed lazily, one batch at a time.
+        batch_size (int): Number of calls packed into one HTTP request.
+        max_retries (int): Retry rounds for transient failures.
+        scheduler: Optional RequestScheduler; defaults to the process-wide one.
+        ok_statuses (tuple): Error statuses that count as success, e.g. 410 for deletes.
+    Returns: dict with 'succeeded' ({request_id: response}) and 'failed' ({request_id: error message}).
+    """
+    scheduler = scheduler or get_scheduler()
+    succeeded = {}
+    failed = {}
+
+    for chunk in _chunks(requests, batch_size):
+        # Batch request IDs must be unique, so later duplicates within the chunk are dropped
+        pending = {}
+        for request_id, request in chunk:
+            pending.setdefault(request_id, request)
+
+        for attempt in range(max_retries + 1):
+            if attempt:
+                time.sleep(backoff_delay(attempt))
+
+            try:
+                results = _execute_batch(service, scheduler, pending)
+            except HttpError as error:
+                # The whole batch request failed; treat every item alike
+                results = dict.fromkeys(pending, (None, error))
+
+            retry = {}
+            for request_id, request in pending.items():
+                if request_id not in results:
+                    failed[request_id] = 'No response in batch'
+                    continue
+                response, error = results[request_id]
+                if error is None or error.resp.status in ok_statuses:
+                    succeeded[request_id] = response
+                    failed.pop(request_id, None)
+                elif is_retryable(error, request):
+                    retry[request_id] = request
+                    API_RETRIES.inc(getattr(request, 'methodId', 'batch'))
+                    failed[request_id] = str(error)
+                else:
+                    failed[request_id] = str(error)
+
+            pending = retry
+            if not pending:
+                break
+
+    return {'succeeded': succeeded, 'failed': failed}
@@ -0,0 +1,51 @@
+import argparse
+import time
+from google.auth.credentials import AnonymousCredentials
+from bulk_delete_events import SCOPES, bulk_delete_events
+from calendar_service import get_calendar_service
+from fake_calendar_server import FakeCalendarServer
+from request_scheduler import RequestScheduler
+
+
+def _seed(server, count):
+    return [server.backend.add_event('primary', {'summary': f'Stale event {i}'})['id'] for i in range(count)]
+
+
+def delete_one_at_a_time(service, event_ids):
+    """
+    The delete_events.py path: one HTTP round trip per event.
+    """
+    events = service.events()
+    for event_id in event_ids:
+        events.delete(calendarId='primary', eventId=event_id).execute()
+
+
+def run(count, latency):
+    with FakeCalendarServer(latency=latency) as server:
+        service = get_calendar_service(SCOPES, credentials=AnonymousCredentials(), root_url=server.root_url)
+
+        event_ids = _seed(server, count)
+        start = time.perf_counter()
+        delete_one_at_a_time(service, event_ids)
+        serial = time.perf_counter() - start
+
+        event_ids = _seed(server, count)
+        start = time.perf_counter()
+        # Lift the quota budget so the benchmark measures transport cost only
+        scheduler = RequestScheduler(user_rate=1e9, project_rate=1e9)
+        result = bulk_delete_events(event_ids, service=service, scheduler=scheduler)
+        batched = time.perf_counter() - start
+        assert not result['failed'], result['failed']
+
+    print(f"{count} deletes, {latency * 1000:.1f} ms simulated round trip")
+    print(f"  one at a time: {serial:8.3f} s  {count / serial:10.1f} ops/sec")
+    print(f"  batched:       {batched:8.3f} s  {count / batched:10.1f} ops/sec")
+    print(f"  speedup:       {serial / batched:8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark bulk deletion against a local fake Calendar API.')
+    parser.add_argument('--count', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds per HTTP round trip')
+    args = parser.parse_args()
+    run(args.count, args.latency)
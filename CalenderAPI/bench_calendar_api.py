@@ -0,0 +1,156 @@
+import argparse
+import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from google.auth.credentials import AnonymousCredentials
+from calendar_service import get_calendar_service
+from fake_calendar_server import FakeCalendarBackend, FakeCalendarServer
+from request_scheduler import RequestScheduler
+
+# OAuth2 scopes for Google Calendar API
+SCOPES = ['https://www.googleapis.com/auth/calendar']
+
+# Operations run by default, in order
+OPERATIONS = ('list', 'insert', 'delete', 'share')
+
+# Calendar that receives the ACL rules created by the 'share' benchmark
+SHARED_CALENDAR = 'bench-shared'
+
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(fraction * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def _seed_events(server, count, prefix):
+    return [server.backend.add_event('primary', {
+        'summary': f'{prefix} {i}',
+        'start': {'dateTime': '2030-01-01T09:00:00Z'},
+        'end': {'dateTime': '2030-01-01T10:00:00Z'},
+    })['id'] for i in range(count)]
+
+
+def _operation_requests(name, server, count, page_size):
+    """
+    Return a list of `count` functions that each build one request from a worker's resources.
+    """
+    if name == 'list':
+        return [lambda api: api.events.list(calendarId='primary', maxResults=page_size)] * count
+    if name == 'insert':
+        body = {
+            'summary': 'Benchmark event',
+            'start': {'dateTime': '2030-01-02T09:00:00Z'},
+            'end': {'dateTime': '2030-01-02T10:00:00Z'},
+        }
+        return [lambda api: api.events.insert(calendarId='primary', body=body)] * count
+    if name == 'delete':
+        event_ids = _seed_events(server, count, 'Delete me')
+        return [lambda api, event_id=event_id: api.events.delete(calendarId='primary', eventId=event_id)
+                for event_id in event_ids]
+    if name == 'share':
+        server.backend.add_calendar(SHARED_CALENDAR)
+        return [lambda api, i=i: api.acl.insert(calendarId=SHARED_CALENDAR, body={
+            'role': 'reader', 'scope': {'type': 'user', 'value': f'bench{i}@example.com'},
+        }) for i in range(count)]
+    raise ValueError(f'Unknown operation: {name}')
+
+
+def run_operation(name, server, scheduler, count, threads, page_size):
+    """
+    Time `count` calls of one operation spread over `threads` workers.
+    Returns: dict with ops/sec, p50/p99 latency in milliseconds, and error and retry counts.
+    """
+    requests = _operation_requests(name, server, count, page_size)
+    latencies = []
+    errors = []
+    local = threading.local()
+    retries_before = scheduler.stats()['retries']
+
+    def call(make_request):
+        # Each worker thread gets its own service and HTTP connection from the per-thread cache;
+        # resource collections are built once per thread since building one takes milliseconds
+        if not hasattr(local, 'events'):
+            service = get_calendar_service(SCOPES, credentials=AnonymousCredentials(), root_url=server.root_url)
+            local.events = service.events()
+            local.acl = service.acl()
+        start = time.perf_counter()
+        try:
+            scheduler.execute(make_request(local))
+        except Exception as error:
+            errors.append(error)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(call, requests))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'operation': name,
+        'count': count,
+        'seconds': elapsed,
+        'ops_per_sec': count / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'errors': len(errors),
+        'retries': scheduler.stats()['retries'] - retries_before,
+    }
+
+
+def run(operations=OPERATIONS, count=200, threads=1, latency=0.0, error_rate=0.0, quota=None,
+        list_size=250, seed=0):
+    """
+    Start a fake Calendar API, run each operation against it and return one result dict per operation.
+    The client side is the same code path the scripts use: a cached service and the request
+    scheduler, whose own rate limits are lifted so only the fake server's quota applies.
+    """
+    backend = FakeCalendarBackend(error_rate=error_rate, quota=quota, seed=seed)
+    results = []
+    with FakeCalendarServer(latency=latency, backend=backend) as server:
+        _seed_events(server, list_size, 'Listed event')
+        scheduler = RequestScheduler(user_rate=1e9, project_rate=1e9)
+        for name in operations:
+            results.append(run_operation(name, server, scheduler, count, threads, list_size))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark Calendar API operations against a local fake server.')
+    parser.add_argument('operations', nargs='*', help=f"Operations to run (default: {' '.join(OPERATIONS)})")
+    parser.add_argument('--count', type=int, default=200, help='Calls per operation')
+    parser.add_argument('--threads', type=int, default=1, help='Concurrent callers')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds per HTTP round trip')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of calls the server fails')
+    parser.add_argument('--quota', type=float, help='Server-side API calls allowed per second')
+    parser.add_argument('--list-size', type=int, default=250, help='Events returned per list call')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='Print results as JSON for baselines')
+    args = parser.parse_args(argv)
+    unknown = set(args.operations) - set(OPERATIONS)
+    if unknown:
+        parser.error(f"unknown operation(s): {', '.join(sorted(unknown))}")
+
+    results = run(args.operations or OPERATIONS, args.count, args.threads, args.latency, args.error_rate,
+                  args.quota, args.list_size, args.seed)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.count} calls per operation, {args.threads} thread(s), "
+          f"{args.latency * 1000:.1f} ms simulated round trip")
+    print(f"  {'operation':<10}{'ops/sec':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}{'retries':>9}")
+    for result in results:
+        print(f"  {result['operation']:<10}{result['ops_per_sec']:>10.1f}{result['p50_ms']:>10.2f}"
+              f"{result['p99_ms']:>10.2f}{result['errors']:>8}{result['retries']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import sys
+from dotenv import load_dotenv
+from googleapiclient.errors import HttpError
+from batch_runner import BATCH_SIZE, MAX_RETRIES, execute_batched
+from calendar_service import get_calendar_service
+from event_list import iter_events
+
+# Load environment variables from .env file
+load_dotenv()
+
+# OAuth2 scopes for Google Calendar API
+SCOPES = ['https://www.googleapis.com/auth/calendar']
+
+
+def bulk_delete_events(event_ids, calendar_id='primary', batch_size=BATCH_SIZE,
+                       max_retries=MAX_RETRIES, service=None, scheduler=None):
+    """
+    Delete many events using Calendar batch requests.
+    Only items that failed with a retryable error are resent; events that are already gone (410) count as deleted.
+    Args:
+        event_ids (iterable): Event IDs to delete; consumed lazily, one batch at a time.
+        calendar_id (str): The calendar the events belong to (default: 'primary').
+        batch_size (int): Number of deletes packed into one HTTP request.
+        max_retries (int): Retry rounds for transient failures.
+        service: Optional Calendar service; defaults to get_calendar_service(SCOPES).
+        scheduler: Optional RequestScheduler; defaults to the process-wide one.
+    Returns: dict with 'deleted' (list of IDs) and 'failed' ({event_id: error message}).
+    """
+    service = service or get_calendar_service(SCOPES)
+    # service.events() builds a new resource object each call, so create it once
+    events = service.events()
+    requests = (
+        (event_id, events.delete(calendarId=calendar_id, eventId=event_id))
+        for event_id in event_ids
+    )
+    result = execute_batched(service, requests, batch_size, max_retries, scheduler, ok_statuses=(410,))
+    return {'deleted': list(result['succeeded']), 'failed': result['failed']}
+
+
+def event_ids_in_range(time_min=None, time_max=None, calendar_id='primary', service=None):
+    """
+    Yield the IDs of all events in a calendar that overlap [time_min, time_max).
+    """
+    for event in iter_events(calendar_id, fields=('id',), time_min=time_min, time_max=time_max,
+                             service=service or get_calendar_service(SCOPES)):
+        yield event['id']
+
+
+def read_event_ids(stream):
+    """
+    Yield event IDs from a text stream, one per line; blank lines and '#' comments are skipped.
+    """
+    for line in stream:
+        event_id = line.strip()
+        if event_id and not event_id.startswith('#'):
+            yield event_id
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Delete many calendar events using batch requests.')
+    parser.add_argument('--calendar', default='primary', help="Calendar ID (default: 'primary')")
+    parser.add_argument('--file', help="File with one event ID per line; '-' or omitted reads stdin")
+    parser.add_argument('--time-min', help='Delete events ending after this RFC3339 timestamp')
+    parser.add_argument('--time-max', help='Delete events starting before this RFC3339 timestamp')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--max-retries', type=int, default=MAX_RETRIES)
+    args = parser.parse_args(argv)
+
+    try:
+        if args.time_min or args.time_max:
+            # Materialize the IDs first so deletions do not shift the listing pages
+            event_ids = list(event_ids_in_range(args.time_min, args.time_max, args.calendar))
+            result = bulk_delete_events(event_ids, args.calendar, args.batch_size, args.max_retries)
+        elif args.file and args.file != '-':
+            with open(args.file, 'r') as ids_file:
+                result = bulk_delete_events(read_event_ids(ids_file), args.calendar,
+                                            args.batch_size, args.max_retries)
+        else:
+            result = bulk_delete_events(read_event_ids(sys.stdin), args.calendar,
+                                        args.batch_size, args.max_retries)
+    except HttpError as error:
+        print(f"An error occurred: {error}")
+        return 1
+
+    for event_id in result['deleted']:
+        print(f"Event with ID {event_id} deleted successfully.")
+    for event_id, error in result['failed'].items():
+        print(f"Failed to delete event {event_id}: {error}")
+    print(f"Deleted {len(result['deleted'])} events, {len(result['failed'])} failed.")
+    return 1 if result['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
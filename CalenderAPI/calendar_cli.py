@@ -0,0 +1,380 @@
+import argparse
+import datetime
+import json
+import os
+import socket
+import socketserver
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# Only the standard library is imported up front. googleapiclient, google-auth and dotenv are
+# imported only where commands run, so talking to a warm daemon never pays for them.
+
+# OAuth2 scopes for Google Calendar API; one scope set lets every command share one service
+SCOPES = ['https://www.googleapis.com/auth/calendar']
+
+# Unix socket of the warm daemon
+SOCKET_PATH = os.environ.get('CALENDAR_SOCKET', os.path.join(os.path.expanduser('~'), '.calendar-cli.sock'))
+
+# Daemon worker threads; each keeps its own Calendar service and HTTP connection warm
+DAEMON_WORKERS = 8
+
+# Daemon output is sent to the client in chunks of about this many characters
+OUTPUT_CHUNK = 8192
+
+
+def _load_env():
+    from dotenv import load_dotenv
+    # Load environment variables from .env file; once per process, before the first command runs
+    load_dotenv()
+
+
+def _service():
+    from calendar_service import get_calendar_service
+    return get_calendar_service(SCOPES)
+
+
+def cmd_list(args, out):
+    from calender_list import iter_calendars
+    for calendar_list_entry in iter_calendars(service=_service()):
+        if args.json:
+            print(json.dumps(calendar_list_entry), file=out)
+        else:
+            print(f"Calendar Summary: {calendar_list_entry['summary']}, Calendar ID: {calendar_list_entry['id']}",
+                  file=out)
+    return 0
+
+
+def cmd_events(args, out):
+    from event_list import iter_events
+    fields = ('id', 'summary', 'start', 'end')
+    for event in iter_events(args.calendar, fields, args.time_min, args.time_max, args.max_results,
+                             service=_service()):
+        if args.json:
+            print(json.dumps(event), file=out)
+        else:
+            print(f"Event ID: {event['id']}, Summary: {event.get('summary', 'No summary available')}", file=out)
+    return 0
+
+
+def _when(value, time_zone):
+    # A bare YYYY-MM-DD is an all-day date, anything longer an RFC3339 timestamp
+    if len(value) == 10:
+        return {'date': value}
+    when = {'dateTime': value}
+    if time_zone:
+        when['timeZone'] = time_zone
+    return when
+
+
+def cmd_create(args, out):
+    from request_scheduler import execute
+    if args.body:
+        with open(args.body, 'r') as body_file:
+            event = json.load(body_file)
+    else:
+        end = args.end
+        if not end:
+            # Without --end, all-day events last one day and timed events take no time
+            end = args.start
+            if len(end) == 10:
+                end = (datetime.date.fromisoformat(end) + datetime.timedelta(days=1)).isoformat()
+        event = {'summary': args.summary, 'start': _when(args.start, args.time_zone),
+                 'end': _when(end, args.time_zone)}
+        if args.location:
+            event['location'] = args.location
+        if args.description:
+            event['description'] = args.description
+
+    event = execute(_service().events().insert(calendarId=args.calendar, body=event))
+    if args.json:
+        print(json.dumps(event), file=out)
+    else:
+        print(f"Event created: {event.get('htmlLink')} (ID: {event['id']})", file=out)
+    return 0
+
+
+def cmd_delete(args, out):
+    from bulk_delete_events import bulk_delete_events, read_event_ids
+    event_ids = list(args.event_ids)
+    if args.file:
+        with open(args.file, 'r') as ids_file:
+            event_ids.extend(read_event_ids(ids_file))
+    if args.stdin_lines:
+        event_ids.extend(read_event_ids(args.stdin_lines))
+
+    result = bulk_delete_events(event_ids, args.calendar, service=_service())
+    for event_id in result['deleted']:
+        print(f"Event with ID {event_id} deleted successfully.", file=out)
+    for event_id, error in result['failed'].items():
+        print(f"Failed to delete event {event_id}: {error}", file=out)
+    return 1 if result['failed'] else 0
+
+
+def cmd_share(args, out):
+    from calender_sharing import bulk_share_calendars
+    grants = [(args.calendar_id, email, args.role) for email in args.emails]
+    result = bulk_share_calendars(grants, send_notifications=not args.no_notify, service=_service())
+    for kind in ('inserted', 'updated'):
+        for calendar_id, email in result[kind]:
+            print(f"Calendar {calendar_id} shared with {email} as {args.role}.", file=out)
+    if result['unchanged']:
+        print(f"{result['unchanged']} share(s) already in place.", file=out)
+    for operation, error in result['failed'].items():
+        print(f"Failed {operation}: {error}", file=out)
+    return 1 if result['failed'] else 0
+
+
+def cmd_mkcal(args, out):
+    from request_scheduler import execute
+    calendar = {'summary': args.summary}
+    if args.time_zone:
+        calendar['timeZone'] = args.time_zone
+    created_calendar = execute(_service().calendars().insert(body=calendar))
+    print(f'Secondary calendar created: {created_calendar.get("id")}', file=out)
+    return 0
+
+
+def cmd_rmcal(args, out):
+    from request_scheduler import execute
+    calendars = _service().calendars()
+    for calendar_id in args.calendar_ids:
+        execute(calendars.delete(calendarId=calendar_id))
+        print(f'Calendar with ID {calendar_id} deleted successfully.', file=out)
+    return 0
+
+
+# Handlers a command may name; the daemon only runs these, whatever a client sends
+COMMANDS = {
+    'cmd_list': cmd_list,
+    'cmd_events': cmd_events,
+    'cmd_create': cmd_create,
+    'cmd_delete': cmd_delete,
+    'cmd_share': cmd_share,
+    'cmd_mkcal': cmd_mkcal,
+    'cmd_rmcal': cmd_rmcal,
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='calendar', description='Google Calendar command line.')
+    parser.add_argument('--socket', default=SOCKET_PATH, help='Unix socket of the warm daemon')
+    parser.add_argument('--no-daemon', action='store_true', help='Always run in this process')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    list_parser = subparsers.add_parser('list', help='List calendars')
+    list_parser.add_argument('--json', action='store_true', help='Print one JSON object per line')
+    list_parser.set_defaults(handler='cmd_list')
+
+    events_parser = subparsers.add_parser('events', help='List events')
+    events_parser.add_argument('--calendar', default='primary')
+    events_parser.add_argument('--time-min', help='Only events ending after this RFC3339 timestamp')
+    events_parser.add_argument('--time-max', help='Only events starting before this RFC3339 timestamp')
+    events_parser.add_argument('--max-results', type=int)
+    events_parser.add_argument('--json', action='store_true', help='Print one JSON object per line')
+    events_parser.set_defaults(handler='cmd_events')
+
+    create_parser = subparsers.add_parser('create', help='Create an event')
+    create_parser.add_argument('--calendar', default='primary')
+    create_parser.add_argument('--summary')
+    create_parser.add_argument('--start', help='RFC3339 timestamp or YYYY-MM-DD')
+    create_parser.add_argument('--end', help='RFC3339 timestamp or YYYY-MM-DD (default: the start, or the next day)')
+    create_parser.add_argument('--time-zone')
+    create_parser.add_argument('--location')
+    create_parser.add_argument('--description')
+    create_parser.add_argument('--body', help='JSON file with the full event resource')
+    create_parser.add_argument('--json', action='store_true', help='Print the created event as JSON')
+    create_parser.set_defaults(handler='cmd_create')
+
+    delete_parser = subparsers.add_parser('delete', help='Delete events')
+    delete_parser.add_argument('event_ids', nargs='*')
+    delete_parser.add_argument('--calendar', default='primary')
+    delete_parser.add_argument('--file', help="File with one event ID per line; '-', or no IDs at all, reads stdin")
+    delete_parser.set_defaults(handler='cmd_delete', stdin_lines=None)
+
+    share_parser = subparsers.add_parser('share', help='Share a calendar')
+    share_parser.add_argument('calendar_id')
+    share_parser.add_argument('emails', nargs='+')
+    share_parser.add_argument('--role', default='reader', choices=('freeBusyReader', 'reader', 'writer', 'owner'))
+    share_parser.add_argument('--no-notify', action='store_true', help='Do not email the new users')
+    share_parser.set_defaults(handler='cmd_share')
+
+    mkcal_parser = subparsers.add_parser('mkcal', help='Create a secondary calendar')
+    mkcal_parser.add_argument('summary')
+    mkcal_parser.add_argument('--time-zone')
+    mkcal_parser.set_defaults(handler='cmd_mkcal')
+
+    rmcal_parser = subparsers.add_parser('rmcal', help='Delete secondary calendars')
+    rmcal_parser.add_argument('calendar_ids', nargs='+')
+    rmcal_parser.set_defaults(handler='cmd_rmcal')
+
+    daemon_parser = subparsers.add_parser('daemon', help='Serve commands over the Unix socket')
+    daemon_parser.add_argument('--workers', type=int, default=DAEMON_WORKERS)
+    daemon_parser.set_defaults(handler=None)
+    return parser
+
+
+def run_command(options, out):
+    """
+    Run one parsed command in this process and return its exit status.
+    """
+    name = options.get('handler')
+    handler = COMMANDS.get(name) if isinstance(name, str) else None
+    if handler is None:
+        print(f"Unknown command: {options.get('command')!r}", file=out)
+        return 2
+    from googleapiclient.errors import HttpError
+    try:
+        return handler(argparse.Namespace(**options), out)
+    except HttpError as error:
+        print(f"An error occurred: {error}", file=out)
+        return 1
+
+
+class _SocketOutput:
+    """
+    File-like object that forwards printed text to a daemon client as JSON lines.
+    """
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.buffer = []
+        self.size = 0
+
+    def write(self, text):
+        self.buffer.append(text)
+        self.size += len(text)
+        if self.size >= OUTPUT_CHUNK:
+            self.flush()
+        return len(text)
+
+    def flush(self):
+        if self.buffer:
+            self.wfile.write((json.dumps({'out': ''.join(self.buffer)}) + '\n').encode('utf-8'))
+            self.buffer = []
+            self.size = 0
+        self.wfile.flush()
+
+
+class _DaemonHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        out = _SocketOutput(self.wfile)
+        try:
+            status = run_command(request, out)
+        except Exception as error:
+            print(f"An error occurred: {error!r}", file=out)
+            status = 1
+        out.flush()
+        self.wfile.write((json.dumps({'exit': status}) + '\n').encode('utf-8'))
+
+
+class _DaemonServer(socketserver.UnixStreamServer):
+    """
+    Unix socket server that hands connections to a fixed pool of threads, so the per-thread
+    Calendar services built for one invocation are reused by the next.
+    """
+
+    def __init__(self, path, workers):
+        super().__init__(path, _DaemonHandler)
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def serve(path=SOCKET_PATH, workers=DAEMON_WORKERS):
+    """
+    Run the warm daemon until interrupted.
+    Heavy modules, credentials and the discovery document are loaded once, up front.
+    """
+    if os.path.exists(path):
+        # Refuse to steal the socket of a daemon that is still running
+        if _connect(path) is not None:
+            raise SystemExit(f"A calendar daemon is already listening on {path}")
+        os.remove(path)
+
+    _load_env()
+    _service()
+    # Only the owner may talk to a process that holds their credentials
+    old_umask = os.umask(0o177)
+    try:
+        server = _DaemonServer(path, workers)
+    finally:
+        os.umask(old_umask)
+    print(f"Calendar daemon listening on {path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.pool.shutdown(wait=False)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _connect(path):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+    except OSError:
+        client.close()
+        return None
+    return client
+
+
+def _run_remote(client, options):
+    """
+    Send a command to the daemon, copy its output to stdout and return its exit status.
+    """
+    with client, client.makefile('rwb') as stream:
+        stream.write((json.dumps(options) + '\n').encode('utf-8'))
+        stream.flush()
+        for line in stream:
+            message = json.loads(line)
+            if 'out' in message:
+                sys.stdout.write(message['out'])
+            else:
+                return message['exit']
+    print("The calendar daemon closed the connection.", file=sys.stderr)
+    return 1
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == 'daemon':
+        serve(args.socket, args.workers)
+        return 0
+
+    # The daemon cannot read this process's stdin, so IDs piped to 'delete' are read here and sent along
+    if args.command == 'delete' and (args.file == '-' or not (args.file or args.event_ids)):
+        args.file = None
+        args.stdin_lines = sys.stdin.readlines()
+
+    # The daemon has its own working directory, so file arguments are sent as absolute paths
+    for name in ('file', 'body'):
+        if getattr(args, name, None):
+            setattr(args, name, os.path.abspath(getattr(args, name)))
+    if args.command == 'create' and not args.body and not (args.summary and args.start):
+        build_parser().error('create needs --summary and --start, or --body')
+
+    options = {key: value for key, value in vars(args).items() if key not in ('socket', 'no_daemon')}
+    client = None if args.no_daemon or not os.path.exists(args.socket) else _connect(args.socket)
+    if client is not None:
+        return _run_remote(client, options)
+    _load_env()
+    return run_command(options, sys.stdout)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
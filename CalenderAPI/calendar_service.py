@@ -0,0 +1,138 @@
+import copy
+import json
+import os
+import threading
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
+from oauth_credentials import create_oauth2_credentials
+from tracing import DISCOVERY_SECONDS, HTTP_RECEIVED_BYTES, HTTP_SENT_BYTES, SERVICE_BUILD_SECONDS
+
+# Local copy of the discovery document, used when the client library does not ship one
+DISCOVERY_CACHE_FILE = 'calendar_v3_discovery.json'
+
+DISCOVERY_URL = 'https://www.googleapis.com/discovery/v1/apis/calendar/v3/rest'
+
+# Point the client at another server (e.g. a local fake) instead of googleapis.com
+ROOT_URL_ENV = 'CALENDAR_API_ROOT_URL'
+
+# Socket timeout in seconds for the pooled HTTP transport
+HTTP_TIMEOUT = 60
+
+_discovery_document = None
+_discovery_lock = threading.Lock()
+
+# httplib2.Http is not thread-safe, so every thread keeps its own transport and services
+_thread_state = threading.local()
+
+
+def _fetch_discovery_document():
+    """
+    Return the Calendar v3 discovery document as a string.
+    Prefer the copy bundled with googleapiclient, then the local cache file,
+    and only download it when neither is available.
+    """
+    document = discovery_cache.get_static_doc('calendar', 'v3')
+    if document:
+        return document
+
+    if os.path.exists(DISCOVERY_CACHE_FILE):
+        with open(DISCOVERY_CACHE_FILE, 'r') as cache:
+            return cache.read()
+
+    response, content = httplib2.Http(timeout=HTTP_TIMEOUT).request(DISCOVERY_URL)
+    if response.status != 200:
+        raise RuntimeError(f"Could not download discovery document: HTTP {response.status}")
+    document = content.decode('utf-8')
+    with open(DISCOVERY_CACHE_FILE, 'w') as cache:
+        cache.write(document)
+    return document
+
+
+def load_discovery_document(root_url=None):
+    """
+    Return the parsed Calendar v3 discovery document.
+    The document is read and parsed once per process.
+    Args:
+        root_url (str): Optional API root that replaces https://www.googleapis.com/.
+    """
+    global _discovery_document
+
+    if _discovery_document is None:
+        with _discovery_lock:
+            if _discovery_document is None:
+                with DISCOVERY_SECONDS.time():
+                    _discovery_document = json.loads(_fetch_discovery_document())
+
+    root_url = root_url or os.environ.get(ROOT_URL_ENV)
+    if not root_url:
+        return _discovery_document
+
+    document = copy.copy(_discovery_document)
+    document['rootUrl'] = root_url.rstrip('/') + '/'
+    document['baseUrl'] = document['rootUrl'] + document['servicePath']
+    return document
+
+
+class _TracedHttp(httplib2.Http):
+    """
+    httplib2 transport that counts the body bytes sent and received per HTTP method.
+    """
+
+    def request(self, uri, method='GET', body=None, *args, **kwargs):
+        response, content = super().request(uri, method, body, *args, **kwargs)
+        if body:
+            HTTP_SENT_BYTES.inc(method, amount=len(body))
+        if content:
+            HTTP_RECEIVED_BYTES.inc(method, amount=len(content))
+        return response, content
+
+
+def _thread_http():
+    """
+    Return this thread's HTTP transport; it keeps its connections open between requests.
+    """
+    http = getattr(_thread_state, 'http', None)
+    if http is None:
+        http = _TracedHttp(timeout=HTTP_TIMEOUT)
+        _thread_state.http = http
+        _thread_state.services = {}
+    return http
+
+
+def get_calendar_service(scopes, credentials=None, root_url=None):
+    """
+    Return a Calendar API service object for the current thread.
+    Services are built once per thread, scope set and credentials, and then reused,
+    so repeated calls cost a dictionary lookup instead of a discovery parse and a new connection.
+    Args:
+        scopes (list): OAuth2 scopes the service needs.
+        credentials: Optional credentials; defaults to create_oauth2_credentials(scopes).
+        root_url (str): Optional API root, e.g. a local fake server.
+    """
+    if credentials is None:
+        credentials = create_oauth2_credentials(scopes)
+    root_url = root_url or os.environ.get(ROOT_URL_ENV)
+
+    http = _thread_http()
+    key = (frozenset(scopes), root_url)
+    cached = _thread_state.services.get(key)
+
+    # Credentials are refreshed in place, so a new object only appears after a fresh login
+    if cached is not None and cached[0] is credentials:
+        return cached[1]
+
+    document = load_discovery_document(root_url)
+    with SERVICE_BUILD_SECONDS.time():
+        service = build_from_document(document, http=AuthorizedHttp(credentials, http=http))
+    _thread_state.services[key] = (credentials, service)
+    return service
+
+
+def clear_service_cache():
+    """
+    Drop the current thread's cached services and transport.
+    """
+    _thread_state.http = None
+    _thread_state.services = {}
@@ -1,11 +1,7 @@
-import os
-import pickle
 from dotenv import load_dotenv
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.exceptions import RefreshError
 from googleapiclient.errors import HttpError
+from calendar_service import get_calendar_service
+from request_scheduler import execute
 
 # Load environment variables from .env file
 load_dotenv()
@@ -13,58 +9,34 @@ load_dotenv()
 # OAuth2 scopes for Google Calendar API
 SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
 
-def create_oauth2_credentials():
+def iter_calendars(fields=('id', 'summary'), service=None):
     """
-    Create OAuth2 credentials using the installed application flow.
-    Save and reuse credentials to avoid re-authenticating each time.
+    Yield every calendar in the user's calendar list, following nextPageToken.
+    Args:
+        fields (tuple): Calendar list entry fields to request; None fetches full entries.
+        service: Optional Calendar service; defaults to get_calendar_service(SCOPES).
     """
-    credentials = None
+    calendar_list = (service or get_calendar_service(SCOPES)).calendarList()
+    params = {}
+    if fields is not None:
+        params['fields'] = f"nextPageToken,items({','.join(fields)})"
 
-    # Token file to store the user's access and refresh tokens
-    token_file = 'token.pickle'
+    page_token = None
+    while True:
+        calendar_list_result = execute(calendar_list.list(pageToken=page_token, maxResults=250, **params))
+        yield from calendar_list_result.get('items', [])
 
-    # Check if the token file exists and is not empty
-    if os.path.exists(token_file) and os.path.getsize(token_file) > 0:
-        try:
-            with open(token_file, 'rb') as token:
-                credentials = pickle.load(token)
-        except Exception as e:
-            print(f"Error loading token file: {e}")
-            credentials = None
-
-    # If there are no valid credentials available, prompt the user to log in
-    if not credentials or not credentials.valid:
-        if credentials and credentials.expired and credentials.refresh_token:
-            credentials.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                'credentials.json',  # Specify the path to your client secret JSON file
-                scopes=SCOPES
-            )
-            credentials = flow.run_local_server(port=0)
-
-        # Save the credentials for the next run
-        with open(token_file, 'wb') as token:
-            pickle.dump(credentials, token)
-
-    return credentials
+        page_token = calendar_list_result.get('nextPageToken')
+        if not page_token:
+            return
 
 def list_calendars():
     """
     List all calendars and their IDs.
     """
     try:
-        # Use the create_oauth2_credentials function to obtain credentials
-        credentials = create_oauth2_credentials()
-
-        # Build the Calendar API service using the obtained credentials
-        service = build("calendar", "v3", credentials=credentials)
-
-        # List calendars using Calendar API
-        calendar_list = service.calendarList().list().execute()
-
         # Print all calendars and their IDs
-        for calendar_list_entry in calendar_list['items']:
+        for calendar_list_entry in iter_calendars():
             print(f"Calendar Summary: {calendar_list_entry['summary']}, Calendar ID: {calendar_list_entry['id']}")
 
     except HttpError as error:
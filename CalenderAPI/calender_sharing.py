@@ -1,11 +1,8 @@
-import os
-import pickle
 from dotenv import load_dotenv
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.exceptions import RefreshError
 from googleapiclient.errors import HttpError
+from batch_runner import execute_batched
+from calendar_service import get_calendar_service
+from request_scheduler import execute
 
 # Load environment variables from .env file
 load_dotenv()
@@ -13,46 +10,6 @@ load_dotenv()
 # OAuth2 scopes for Google Calendar API
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 
-def create_oauth2_credentials():
-    """
-    Create OAuth2 credentials using the installed application flow.
-    Save and reuse credentials to avoid re-authenticating each time.
-    """
-    credentials = None
-
-    # Token file to store the user's access and refresh tokens
-    token_file = 'token.pickle'
-
-    # Check if the token file exists and is not empty
-    if os.path.exists(token_file) and os.path.getsize(token_file) > 0:
-        try:
-            with open(token_file, 'rb') as token:
-                credentials = pickle.load(token)
-        except Exception as e:
-            print(f"Error loading token file: {e}")
-            credentials = None
-
-    # If there are no valid credentials available, prompt the user to log in
-    if not credentials or not credentials.valid:
-        if credentials and credentials.expired and credentials.refresh_token:
-            try:
-                credentials.refresh(Request())
-            except RefreshError as e:
-                print(f"Error refreshing credentials: {e}")
-                return None
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                'credentials.json',  # Specify the path to your client secret JSON file
-                scopes=SCOPES,
-            )
-            credentials = flow.run_local_server(port=0)
-
-        # Save the credentials for the next run
-        with open(token_file, 'wb') as token:
-            pickle.dump(credentials, token)
-
-    return credentials
-
 def share_calendar(calendar_id, email, role='reader'):
     """
     Share a Google Calendar with another user.
@@ -62,15 +19,8 @@ def share_calendar(calendar_id, email, role='reader'):
         role (str): The role for the user (default: 'reader', options: 'owner', 'writer', 'reader').
     """
     try:
-        # Use the create_oauth2_credentials function to obtain credentials
-        credentials = create_oauth2_credentials()
-
-        if not credentials:
-            print("Failed to obtain valid credentials.")
-            return
-
-        # Build the Calendar API service using the obtained credentials
-        service = build("calendar", "v3", credentials=credentials)
+        # Reuse the cached Calendar API service instead of rebuilding it on every call
+        service = get_calendar_service(SCOPES)
 
         # Define the permission body
         rule = {
@@ -82,13 +32,122 @@ def share_calendar(calendar_id, email, role='reader'):
         }
 
         # Insert the rule (share the calendar)
-        created_rule = service.acl().insert(calendarId=calendar_id, body=rule).execute()
+        created_rule = execute(service.acl().insert(calendarId=calendar_id, body=rule))
 
         print(f"Calendar shared successfully with {email} with role {role}.")
 
     except HttpError as error:
         print(f"An error occurred: {error}")
 
+def _fetch_acls(service, calendar_ids, scheduler=None):
+    """
+    Fetch the full ACL of every calendar; first pages go out together in batch requests.
+    Returns: ({calendar_id: [rules]}, {calendar_id: error message}).
+    """
+    acl = service.acl()
+    result = execute_batched(
+        service,
+        ((calendar_id, acl.list(calendarId=calendar_id, maxResults=250)) for calendar_id in calendar_ids),
+        scheduler=scheduler,
+    )
+
+    acls = {}
+    for calendar_id, acl_result in result['succeeded'].items():
+        rules = list(acl_result.get('items', []))
+        page_token = acl_result.get('nextPageToken')
+        # Only calendars with more than 250 rules need follow-up pages
+        while page_token:
+            acl_result = execute(acl.list(calendarId=calendar_id, maxResults=250, pageToken=page_token))
+            rules.extend(acl_result.get('items', []))
+            page_token = acl_result.get('nextPageToken')
+        acls[calendar_id] = rules
+    return acls, result['failed']
+
+def plan_acl_changes(current_rules, desired_roles, prune=False):
+    """
+    Compute the minimal set of ACL changes for one calendar.
+    Args:
+        current_rules (list): Existing ACL rules as returned by acl().list().
+        desired_roles (dict): {email: role} the calendar should be shared with.
+        prune (bool): Also delete user rules that are not in desired_roles (owners are never removed).
+    Returns: (inserts [(email, role)], updates [(rule_id, email, role)], deletes [(rule_id, email)]).
+    """
+    existing = {}
+    for rule in current_rules:
+        scope = rule.get('scope', {})
+        if scope.get('type') == 'user' and scope.get('value'):
+            existing[scope['value'].lower()] = rule
+
+    inserts, updates, deletes = [], [], []
+    for email, role in desired_roles.items():
+        rule = existing.get(email.lower())
+        if rule is None:
+            inserts.append((email, role))
+        elif rule['role'] != role:
+            updates.append((rule['id'], email, role))
+
+    if prune:
+        wanted = {email.lower() for email in desired_roles}
+        for email, rule in existing.items():
+            if email not in wanted and rule['role'] != 'owner':
+                deletes.append((rule['id'], email))
+
+    return inserts, updates, deletes
+
+def bulk_share_calendars(grants, prune=False, send_notifications=True, service=None, scheduler=None):
+    """
+    Share many calendars with many users in a handful of round trips.
+    The current ACL is fetched once per calendar, diffed against the requested grants,
+    and only the missing inserts, role updates and (with prune) deletes are sent, in batches.
+    Args:
+        grants (iterable): (calendar_id, email, role) tuples; the last role given for a pair wins.
+        prune (bool): Remove user rules not listed in grants for the calendars involved.
+        send_notifications (bool): Email new users about the share (the API default).
+        service: Optional Calendar service; defaults to get_calendar_service(SCOPES).
+        scheduler: Optional RequestScheduler; defaults to the process-wide one.
+    Returns: dict with 'inserted', 'updated', 'deleted' lists of (calendar_id, email),
+             an 'unchanged' count and 'failed' ({operation: error message}).
+    """
+    service = service or get_calendar_service(SCOPES)
+
+    desired = {}
+    for calendar_id, email, role in grants:
+        desired.setdefault(calendar_id, {})[email] = role
+
+    acls, failed = _fetch_acls(service, list(desired), scheduler)
+
+    acl = service.acl()
+    operations = {}
+    requests = []
+    unchanged = 0
+    for calendar_id, rules in acls.items():
+        inserts, updates, deletes = plan_acl_changes(rules, desired[calendar_id], prune)
+        unchanged += len(desired[calendar_id]) - len(inserts) - len(updates)
+        for email, role in inserts:
+            body = {'scope': {'type': 'user', 'value': email}, 'role': role}
+            request_id = f"insert:{calendar_id}:{email}"
+            operations[request_id] = ('inserted', calendar_id, email)
+            requests.append((request_id, acl.insert(calendarId=calendar_id, body=body,
+                                                       sendNotifications=send_notifications)))
+        for rule_id, email, role in updates:
+            request_id = f"update:{calendar_id}:{email}"
+            operations[request_id] = ('updated', calendar_id, email)
+            requests.append((request_id, acl.patch(calendarId=calendar_id, ruleId=rule_id, body={'role': role})))
+        for rule_id, email in deletes:
+            request_id = f"delete:{calendar_id}:{email}"
+            operations[request_id] = ('deleted', calendar_id, email)
+            requests.append((request_id, acl.delete(calendarId=calendar_id, ruleId=rule_id)))
+
+    result = execute_batched(service, requests, scheduler=scheduler)
+
+    summary = {'inserted': [], 'updated': [], 'deleted': [], 'unchanged': unchanged,
+               'failed': {f"list:{calendar_id}": error for calendar_id, error in failed.items()}}
+    for request_id in result['succeeded']:
+        kind, calendar_id, email = operations[request_id]
+        summary[kind].append((calendar_id, email))
+    summary['failed'].update(result['failed'])
+    return summary
+
 if __name__ == "__main__":
     # Example usage: Share a calendar with a specific email address
     calendar_id_to_share = '1b90945a4bbd496d3efa45dbe482c0e315288f68a9a1cafbe0c8d329012836e7@group.calendar.google.com'
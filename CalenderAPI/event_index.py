@@ -0,0 +1,209 @@
+import bisect
+import datetime
+import threading
+import time
+from event_sync import EventStore, event_time, sync_calendar
+from recurrence import expand_events
+
+# How long an index may be served before it is revalidated against the API
+MAX_AGE_SECONDS = 60
+
+# Recurring events are expanded this far before and after the time the index is built
+EXPANSION_HORIZON = datetime.timedelta(days=366)
+
+
+def _timestamp(value):
+    """
+    Accept epoch seconds or a datetime (naive values are taken as UTC).
+    """
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return value.timestamp()
+    return float(value)
+
+
+class EventIndex:
+    """
+    Immutable interval index over events, keyed by start and end time.
+    Events are sorted by start (ties broken by ID); a segment tree holds the maximum end time of
+    every range, so overlap queries visit O(log n) nodes plus the events they report.
+    Args:
+        events (iterable): Calendar event dicts with 'start' and 'end' objects.
+    """
+
+    def __init__(self, events):
+        entries = []
+        for event in events:
+            start_ts = event_time(event.get('start'))[1]
+            end_ts = event_time(event.get('end'))[1]
+            if start_ts is None:
+                continue
+            entries.append((start_ts, end_ts if end_ts is not None else start_ts, event))
+        entries.sort(key=lambda entry: (entry[0], entry[2].get('id', '')))
+
+        self._keys = [(entry[0], entry[2].get('id', '')) for entry in entries]
+        self._starts = [entry[0] for entry in entries]
+        self._ends = [entry[1] for entry in entries]
+        self._events = [entry[2] for entry in entries]
+
+        size = 1
+        while size < max(len(entries), 1):
+            size *= 2
+        self._size = size
+        tree = [float('-inf')] * (2 * size)
+        tree[size:size + len(entries)] = self._ends
+        for node in range(size - 1, 0, -1):
+            tree[node] = max(tree[2 * node], tree[2 * node + 1])
+        self._max_end = tree
+
+    def __len__(self):
+        return len(self._events)
+
+    def _collect(self, after, limit, count, out):
+        """
+        Append, in start order, indices i < limit with end > after; stop once out holds count items.
+        """
+        stack = [(1, 0, self._size)]
+        while stack and len(out) < count:
+            node, lo, hi = stack.pop()
+            if lo >= limit or self._max_end[node] <= after:
+                continue
+            if hi - lo == 1:
+                out.append(lo)
+                continue
+            mid = (lo + hi) // 2
+            # Push the right half first so the left half is visited first
+            stack.append((2 * node + 1, mid, hi))
+            stack.append((2 * node, lo, mid))
+
+    def overlapping(self, start, end, count=None):
+        """
+        Return events that overlap [start, end), ordered by start time.
+        """
+        start, end = _timestamp(start), _timestamp(end)
+        limit = bisect.bisect_left(self._starts, end)
+        found = []
+        self._collect(start, limit, count if count is not None else len(self._events), found)
+        return [self._events[i] for i in found]
+
+    def upcoming(self, count=10, now=None):
+        """
+        Return the next `count` events that have not ended yet, like events().list()
+        with timeMin=now, singleEvents=True and orderBy='startTime'.
+        """
+        now = time.time() if now is None else _timestamp(now)
+        found = []
+        self._collect(now, len(self._events), count, found)
+        return [self._events[i] for i in found]
+
+    def on_day(self, day, tz=datetime.timezone.utc):
+        """
+        Return events that overlap the calendar day `day` (a date) in timezone `tz`.
+        """
+        midnight = datetime.datetime.combine(day, datetime.time(), tzinfo=tz)
+        return self.overlapping(midnight, midnight + datetime.timedelta(days=1))
+
+    @staticmethod
+    def key(event):
+        """
+        Return the (start timestamp, id) sort key of an event; usable as a pagination cursor.
+        """
+        return event_time(event.get('start'))[1], event.get('id', '')
+
+    def scan(self, after=None, start_min=None, start_max=None, ended_after=None):
+        """
+        Lazily yield events in (start, id) order.
+        Args:
+            after (tuple): Resume strictly after this key(), e.g. the last event of the previous page.
+            start_min, start_max: Only events starting in [start_min, start_max).
+            ended_after: Skip events that ended at or before this time.
+        """
+        position = 0
+        if after is not None:
+            position = bisect.bisect_right(self._keys, tuple(after))
+        if start_min is not None:
+            position = max(position, bisect.bisect_left(self._starts, _timestamp(start_min)))
+        stop = len(self._events) if start_max is None else bisect.bisect_left(self._starts, _timestamp(start_max))
+        ended_after = None if ended_after is None else _timestamp(ended_after)
+
+        for index in range(position, stop):
+            if ended_after is not None and self._ends[index] <= ended_after:
+                continue
+            yield self._events[index]
+
+
+class UpcomingEvents:
+    """
+    Serve time-range queries for one calendar from a local EventIndex.
+    Once the index is older than max_age seconds, the next query revalidates it with an
+    incremental sync; the index is only rebuilt when the sync reports changes.
+    Recurring events are stored as compact masters and expanded locally within EXPANSION_HORIZON.
+    Args:
+        calendar_id (str): The calendar to index (default: 'primary').
+        store (EventStore): Local event store; defaults to EventStore().
+        max_age (float): Freshness bound in seconds.
+        service: Optional Calendar service passed to sync_calendar().
+    """
+
+    def __init__(self, calendar_id='primary', store=None, max_age=MAX_AGE_SECONDS, service=None):
+        self.calendar_id = calendar_id
+        self.store = store or EventStore()
+        self.max_age = max_age
+        self.service = service
+        self._lock = threading.Lock()
+        self._index = None
+        self._validated_at = None
+        self._stale = False
+
+    def invalidate(self, rebuild=False):
+        """
+        Force revalidation on the next query.
+        Pass rebuild=True when the store was changed by someone else (e.g. a push-notification sync),
+        so the index is rebuilt even if its own sync finds nothing new.
+        """
+        if rebuild:
+            self._stale = True
+        self._validated_at = None
+
+    def cached_index(self):
+        """
+        Return (index or None, fresh) without syncing; lets async callers serve a stale index
+        while a refresh runs elsewhere.
+        """
+        index, validated_at = self._index, self._validated_at
+        fresh = index is not None and validated_at is not None and time.monotonic() - validated_at < self.max_age
+        return index, fresh
+
+    def index(self):
+        """
+        Return a fresh-enough EventIndex, syncing and rebuilding it if needed.
+        """
+        index, validated_at = self._index, self._validated_at
+        if index is not None and validated_at is not None and time.monotonic() - validated_at < self.max_age:
+            return index
+
+        with self._lock:
+            # Another thread may have revalidated while we waited
+            if self._index is not None and self._validated_at is not None \
+                    and time.monotonic() - self._validated_at < self.max_age:
+                return self._index
+
+            result = sync_calendar(self.calendar_id, self.store, self.service)
+            if self._index is None or self._stale or result['full'] or result['upserted'] or result['deleted']:
+                self._stale = False
+                now = datetime.datetime.now(datetime.timezone.utc)
+                self._index = EventIndex(expand_events(
+                    self.store.events(self.calendar_id), now - EXPANSION_HORIZON, now + EXPANSION_HORIZON,
+                ))
+            self._validated_at = time.monotonic()
+            return self._index
+
+    def upcoming(self, count=10, now=None):
+        return self.index().upcoming(count, now)
+
+    def overlapping(self, start, end, count=None):
+        return self.index().overlapping(start, end, count)
+
+    def on_day(self, day, tz=datetime.timezone.utc):
+        return self.index().on_day(day, tz)
@@ -1,11 +1,7 @@
-import os
-import pickle
 from dotenv import load_dotenv
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.exceptions import RefreshError
 from googleapiclient.errors import HttpError
+from calendar_service import get_calendar_service
+from request_scheduler import execute
 
 # Load environment variables from .env file
 load_dotenv()
@@ -13,71 +9,91 @@ load_dotenv()
 # OAuth2 scopes for Google Calendar API
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 
-def create_oauth2_credentials():
+# Largest page the Calendar API will return for events().list()
+MAX_PAGE_SIZE = 2500
+
+def iter_event_pages(calendar_id='primary', fields=('id', 'summary'), page_size=MAX_PAGE_SIZE,
+                     service=None, **params):
     """
-    Create OAuth2 credentials using the installed application flow.
-    Save and reuse credentials to avoid re-authenticating each time.
+    Yield raw events().list() result pages, following nextPageToken lazily.
+    The last page carries nextSyncToken when the listing is eligible for incremental sync.
+    Args:
+        calendar_id (str): The calendar to list (default: 'primary').
+        fields (tuple): Event fields to request through partial response; None fetches full events.
+        page_size (int): Events requested per page (at most 2500).
+        service: Optional Calendar service; defaults to get_calendar_service(SCOPES).
+        params: Any other events().list() parameters, e.g. timeMin, syncToken or singleEvents.
     """
-    credentials = None
-
-    # Token file to store the user's access and refresh tokens
-    token_file = 'token.pickle'
-
-    # Check if the token file exists and is not empty
-    if os.path.exists(token_file) and os.path.getsize(token_file) > 0:
-        try:
-            with open(token_file, 'rb') as token:
-                credentials = pickle.load(token)
-        except Exception as e:
-            print(f"Error loading token file: {e}")
-            credentials = None
-
-    # If there are no valid credentials available, prompt the user to log in
-    if not credentials or not credentials.valid:
-        if credentials and credentials.expired and credentials.refresh_token:
-            credentials.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                'credentials.json',  # Specify the path to your client secret JSON file
-                scopes=SCOPES
-            )
-            credentials = flow.run_local_server(port=0)
-
-        # Save the credentials for the next run
-        with open(token_file, 'wb') as token:
-            pickle.dump(credentials, token)
-
-    return credentials
-
-def list_events():
+    events = (service or get_calendar_service(SCOPES)).events()
+    if fields is not None:
+        params['fields'] = f"nextPageToken,nextSyncToken,items({','.join(fields)})"
+
+    page_token = None
+    while True:
+        events_result = execute(events.list(
+            calendarId=calendar_id,
+            maxResults=page_size,
+            pageToken=page_token,
+            **params,
+        ))
+        yield events_result
+
+        page_token = events_result.get('nextPageToken')
+        if not page_token:
+            return
+
+def iter_events(calendar_id='primary', fields=('id', 'summary'), time_min=None, time_max=None,
+                max_results=None, page_size=MAX_PAGE_SIZE, service=None, **params):
+    """
+    Yield events from a calendar one at a time, following nextPageToken lazily.
+    Only one page is held in memory, and the first events are yielded as soon as the first page arrives.
+    Args:
+        calendar_id (str): The calendar to list (default: 'primary').
+        fields (tuple): Event fields to request through partial response; None fetches full events.
+        time_min (str): Optional RFC3339 lower bound on event end time.
+        time_max (str): Optional RFC3339 upper bound on event start time.
+        max_results (int): Stop after this many events in total (default: no limit).
+        page_size (int): Events requested per page (at most 2500).
+        service: Optional Calendar service; defaults to get_calendar_service(SCOPES).
+        params: Any other events().list() parameters, e.g. singleEvents or orderBy.
+    """
+    if max_results is not None:
+        page_size = min(page_size, max_results)
+        if max_results <= 0:
+            return
+
+    remaining = max_results
+    pages = iter_event_pages(calendar_id, fields, page_size, service,
+                             timeMin=time_min, timeMax=time_max, **params)
+    for events_result in pages:
+        items = events_result.get('items', [])
+        if remaining is not None:
+            items = items[:remaining]
+            remaining -= len(items)
+        yield from items
+
+        if remaining == 0:
+            pages.close()
+            return
+
+def list_events(calendar_id='primary', time_min=None, time_max=None, max_results=None):
     """
-    List all events from the primary calendar and print their IDs and summaries.
+    List all events from a calendar (default: the primary calendar) and print their IDs and summaries.
     """
     try:
-        # Use the create_oauth2_credentials function to obtain credentials
-        credentials = create_oauth2_credentials()
-
-        # Build the Calendar API service using the obtained credentials
-        service = build("calendar", "v3", credentials=credentials)
-
-        # Define the calendar ID (here, 'primary' refers to the primary calendar of the authenticated user)
-        calendar_id = 'primary'
-
-        # Get the events from the calendar
-        events_result = service.events().list(calendarId=calendar_id).execute()
-        events = events_result.get('items', [])
-
-        if not events:
-            print('No upcoming events found.')
-        for event in events:
+        found = False
+        for event in iter_events(calendar_id, time_min=time_min, time_max=time_max, max_results=max_results):
+            found = True
             event_id = event['id']
             summary = event.get('summary', 'No summary available')
             print(f"Event ID: {event_id}, Summary: {summary}")
 
+        if not found:
+            print('No upcoming events found.')
+
     except HttpError as error:
         print(f"An error occurred: {error}")
 
 if __name__ == "__main__":
     # List all events and their IDs
     list_events()
-
@@ -0,0 +1,240 @@
+import datetime
+import json
+import sqlite3
+import threading
+from dotenv import load_dotenv
+from googleapiclient.errors import HttpError
+from calendar_service import get_calendar_service
+from event_list import iter_event_pages
+
+# Load environment variables from .env file
+load_dotenv()
+
+# OAuth2 scopes for Google Calendar API
+SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
+
+# Local SQLite database holding synced events and sync tokens
+STORE_FILE = 'events.sqlite3'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    calendar_id TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    summary TEXT,
+    start TEXT,
+    end TEXT,
+    start_ts REAL,
+    end_ts REAL,
+    updated TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (calendar_id, event_id)
+);
+CREATE INDEX IF NOT EXISTS events_by_start ON events (calendar_id, start_ts);
+CREATE INDEX IF NOT EXISTS events_by_master ON events (calendar_id, json_extract(data, '$.recurringEventId'));
+CREATE TABLE IF NOT EXISTS sync_state (
+    calendar_id TEXT PRIMARY KEY,
+    sync_token TEXT,
+    synced_at TEXT
+);
+"""
+
+
+def event_time(when):
+    """
+    Return (text, epoch seconds) for an event 'start' or 'end' object.
+    All-day events only carry a date, which is taken as midnight UTC.
+    """
+    if not when:
+        return None, None
+    if 'dateTime' in when:
+        text = when['dateTime']
+        moment = datetime.datetime.fromisoformat(text.replace('Z', '+00:00'))
+    else:
+        text = when.get('date')
+        if not text:
+            return None, None
+        moment = datetime.datetime.fromisoformat(text).replace(tzinfo=datetime.timezone.utc)
+    return text, moment.timestamp()
+
+
+class EventStore:
+    """
+    SQLite-backed store of synced events and the nextSyncToken of each calendar.
+    Args:
+        path (str): Database file (default: 'events.sqlite3'); ':memory:' keeps it in memory.
+    """
+
+    def __init__(self, path=STORE_FILE):
+        self.path = path
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def get_sync_token(self, calendar_id):
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT sync_token FROM sync_state WHERE calendar_id = ?', (calendar_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def apply_page(self, calendar_id, items, sync_token=None):
+        """
+        Upsert or delete the events of one page in a single transaction.
+        Cancelled events are removed, along with the exceptions of a cancelled recurring event.
+        A cancelled exception (one with a recurringEventId) is stored instead, since it is what hides
+        the deleted occurrence when the recurring event is expanded.
+        sync_token is saved when given (i.e. on the last page).
+        Returns: (number of upserts, number of deletions).
+        """
+        upserts = []
+        deletions = []
+        cancelled_instances = 0
+        for event in items:
+            if event.get('status') == 'cancelled':
+                if not event.get('recurringEventId'):
+                    deletions.append((calendar_id, event['id']))
+                    continue
+                cancelled_instances += 1
+            start, start_ts = event_time(event.get('start'))
+            end, end_ts = event_time(event.get('end'))
+            upserts.append((
+                calendar_id, event['id'], event.get('summary'), start, end,
+                start_ts, end_ts, event.get('updated'), json.dumps(event),
+            ))
+
+        with self.lock, self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO events '
+                '(calendar_id, event_id, summary, start, end, start_ts, end_ts, updated, data) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                upserts,
+            )
+            self.connection.executemany(
+                'DELETE FROM events WHERE calendar_id = ? AND event_id = ?', deletions
+            )
+            # Must match the events_by_master expression exactly, or SQLite scans the table
+            self.connection.executemany(
+                "DELETE FROM events WHERE calendar_id = ? AND json_extract(data, '$.recurringEventId') = ?",
+                deletions,
+            )
+            if sync_token:
+                self._save_sync_token(calendar_id, sync_token)
+        return len(upserts) - cancelled_instances, len(deletions) + cancelled_instances
+
+    def sweep(self, calendar_id, keep, sync_token=None):
+        """
+        Finish a full pull: delete the events of a calendar whose IDs are not in keep and save
+        sync_token, in a single transaction.
+        Returns: number of deleted events.
+        """
+        with self.lock, self.connection:
+            self.connection.execute('CREATE TEMP TABLE IF NOT EXISTS kept_events (event_id TEXT PRIMARY KEY)')
+            self.connection.executemany('INSERT OR IGNORE INTO kept_events VALUES (?)',
+                                        ((event_id,) for event_id in keep))
+            deleted = self.connection.execute(
+                'DELETE FROM events WHERE calendar_id = ? AND event_id NOT IN (SELECT event_id FROM kept_events)',
+                (calendar_id,),
+            ).rowcount
+            self.connection.execute('DELETE FROM kept_events')
+            if sync_token:
+                self._save_sync_token(calendar_id, sync_token)
+        return deleted
+
+    def _save_sync_token(self, calendar_id, sync_token):
+        self.connection.execute(
+            'INSERT OR REPLACE INTO sync_state (calendar_id, sync_token, synced_at) VALUES (?, ?, ?)',
+            (calendar_id, sync_token, datetime.datetime.now(datetime.timezone.utc).isoformat()),
+        )
+
+    def reset(self, calendar_id):
+        """
+        Forget all events and the sync token of a calendar.
+        """
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM events WHERE calendar_id = ?', (calendar_id,))
+            self.connection.execute('DELETE FROM sync_state WHERE calendar_id = ?', (calendar_id,))
+
+    def events(self, calendar_id):
+        """
+        Yield the stored events of a calendar ordered by start time.
+        This includes cancelled exceptions of recurring events (status 'cancelled'); callers
+        listing events skip them, while recurrence expansion uses them to hide occurrences.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                'SELECT data FROM events WHERE calendar_id = ? ORDER BY start_ts', (calendar_id,)
+            ).fetchall()
+        for (data,) in rows:
+            yield json.loads(data)
+
+
+def _pull(store, calendar_id, service, sync_token=None):
+    full = not sync_token
+    params = {} if full else {'syncToken': sync_token}
+    # Cancelled events are only reported in incremental results, so full pulls skip them
+    params['showDeleted'] = not full
+
+    upserted = deleted = 0
+    # A full pull overwrites what is stored page by page, so readers keep seeing the old events
+    # until the end, when the ones it did not return are swept out together with saving the token
+    seen = set()
+    next_sync_token = None
+    for events_result in iter_event_pages(calendar_id, fields=None, service=service, **params):
+        items = events_result.get('items', [])
+        if full:
+            seen.update(event['id'] for event in items)
+            next_sync_token = events_result.get('nextSyncToken') or next_sync_token
+        counts = store.apply_page(calendar_id, items, None if full else events_result.get('nextSyncToken'))
+        upserted += counts[0]
+        deleted += counts[1]
+    if full:
+        deleted += store.sweep(calendar_id, seen, next_sync_token)
+    return upserted, deleted
+
+
+def sync_calendar(calendar_id='primary', store=None, service=None):
+    """
+    Bring the local store up to date with a calendar.
+    The first call does a full pull; later calls send the stored syncToken and fetch only changes.
+    A 410 Gone (expired or invalidated token) falls back to a full resync. The stored events stay
+    readable throughout it: pages overwrite them as they arrive, and events the API no longer
+    returns are only deleted once the whole calendar has been pulled. A resync that fails part way
+    deletes nothing and keeps the old token, so the next call starts it again.
+    Returns: dict with 'full' (bool), 'upserted' and 'deleted' counts.
+    """
+    store = store or EventStore()
+    service = service or get_calendar_service(SCOPES)
+    sync_token = store.get_sync_token(calendar_id)
+
+    if sync_token:
+        try:
+            upserted, deleted = _pull(store, calendar_id, service, sync_token)
+            return {'full': False, 'upserted': upserted, 'deleted': deleted}
+        except HttpError as error:
+            if error.resp.status != 410:
+                raise
+            print(f"Sync token for {calendar_id} is no longer valid, doing a full resync.")
+
+    upserted, deleted = _pull(store, calendar_id, service)
+    return {'full': True, 'upserted': upserted, 'deleted': deleted}
+
+
+if __name__ == "__main__":
+    # Sync the primary calendar and print what is stored locally
+    event_store = EventStore()
+    try:
+        result = sync_calendar('primary', event_store)
+        kind = 'Full' if result['full'] else 'Incremental'
+        print(f"{kind} sync: {result['upserted']} updated, {result['deleted']} removed.")
+        for event in event_store.events('primary'):
+            if event.get('status') == 'cancelled':
+                continue
+            print(f"Event ID: {event['id']}, Summary: {event.get('summary', 'No summary available')}")
+    except HttpError as error:
+        print(f"An error occurred: {error}")
+    finally:
+        event_store.close()
@@ -0,0 +1,410 @@
+import argparse
+import datetime
+import calendar
+import json
+import os
+import re
+import sys
+from zoneinfo import ZoneInfo
+from dotenv import load_dotenv
+from googleapiclient.errors import HttpError
+from atomic_write import atomic_write
+from calendar_service import get_calendar_service
+from calender_list import iter_calendars
+from event_list import MAX_PAGE_SIZE, iter_event_pages
+from event_sync import event_time
+
+# Load environment variables from .env file
+load_dotenv()
+
+# OAuth2 scopes for Google Calendar API
+SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
+
+# Event fields requested for export
+EXPORT_FIELDS = ('id', 'iCalUID', 'status', 'summary', 'description', 'location', 'start', 'end',
+                 'recurrence', 'recurringEventId', 'originalStartTime', 'transparency', 'created', 'updated')
+
+# Rows buffered before a Parquet row group is written; bounds memory use
+ROW_GROUP_SIZE = 50000
+
+# iCalendar content lines are folded at 75 octets
+ICS_LINE_LIMIT = 75
+
+FORMATS = ('ndjson', 'ics', 'parquet')
+
+# TZID parameters inside the RRULE/EXDATE/RDATE lines the API returns
+_TZID_PARAM = re.compile(r';TZID=([^;:]+)')
+
+
+def _escape(text):
+    return (text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _fold(line):
+    """
+    Fold a content line into CRLF-terminated chunks of at most 75 octets, never splitting a UTF-8 sequence.
+    """
+    data = line.encode('utf-8')
+    if len(data) <= ICS_LINE_LIMIT:
+        return data + b'\r\n'
+    chunks = []
+    limit = ICS_LINE_LIMIT
+    while data:
+        cut = min(limit, len(data))
+        # Step back to the start of a UTF-8 character
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        chunks.append(data[:cut])
+        data = data[cut:]
+        # Continuation lines start with a space, which counts towards the limit
+        limit = ICS_LINE_LIMIT - 1
+    return b'\r\n '.join(chunks) + b'\r\n'
+
+
+def _ics_stamp(text):
+    moment = datetime.datetime.fromisoformat(text.replace('Z', '+00:00'))
+    return moment.astimezone(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _ics_time(name, when):
+    if 'date' in when:
+        return f"{name};VALUE=DATE:{when['date'].replace('-', '')}"
+    moment = datetime.datetime.fromisoformat(when['dateTime'].replace('Z', '+00:00'))
+    if when.get('timeZone'):
+        # Keep the wall-clock time in the event's own zone so recurrences follow its DST rules
+        local = moment.astimezone(ZoneInfo(when['timeZone'])) if moment.tzinfo else moment
+        return f"{name};TZID={when['timeZone']}:{local.strftime('%Y%m%dT%H%M%S')}"
+    if moment.tzinfo is None:
+        return f"{name}:{moment.strftime('%Y%m%dT%H%M%S')}"
+    return f"{name}:{moment.astimezone(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')}"
+
+
+class _NdjsonWriter:
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, calendar_id, events):
+        self.stream.write(''.join(
+            json.dumps(dict(event, calendarId=calendar_id), ensure_ascii=False) + '\n' for event in events
+        ).encode('utf-8'))
+
+    def close(self):
+        pass
+
+
+def _utc_offset(offset):
+    minutes = int(offset.total_seconds()) // 60
+    sign = '-' if minutes < 0 else '+'
+    return f"{sign}{abs(minutes) // 60:02d}{abs(minutes) % 60:02d}"
+
+
+def _transitions(zone, year):
+    """
+    Yield (UTC instant, offset before, offset after) for every UTC offset change of a zone in a year.
+    """
+    day = datetime.timedelta(days=1)
+    moment = datetime.datetime(year, 1, 1, tzinfo=datetime.timezone.utc)
+    while moment.year == year:
+        before, after = moment.astimezone(zone).utcoffset(), (moment + day).astimezone(zone).utcoffset()
+        if before != after:
+            # Offsets change on a quarter hour at the latest
+            step = datetime.timedelta(minutes=15)
+            while (moment + step).astimezone(zone).utcoffset() == before:
+                moment += step
+            moment += step
+            yield moment, before, after
+        moment += day
+
+
+def _vtimezone(tzid, year):
+    """
+    Return the VTIMEZONE lines of an IANA zone, with yearly rules taken from its transitions in year.
+    """
+    zone = ZoneInfo(tzid)
+    lines = ['BEGIN:VTIMEZONE', f'TZID:{tzid}']
+    transitions = list(_transitions(zone, year))
+    if not transitions:
+        moment = datetime.datetime(year, 1, 1, tzinfo=datetime.timezone.utc).astimezone(zone)
+        offset = _utc_offset(moment.utcoffset())
+        lines += ['BEGIN:STANDARD', f'DTSTART:{year}0101T000000', f'TZOFFSETFROM:{offset}',
+                  f'TZOFFSETTO:{offset}', f'TZNAME:{moment.tzname()}', 'END:STANDARD']
+    for moment, before, after in transitions:
+        kind = 'DAYLIGHT' if moment.astimezone(zone).dst() else 'STANDARD'
+        # DTSTART is the wall-clock time of the change, read in the offset in force before it
+        local = (moment + before).replace(tzinfo=None)
+        week = -1 if local.day + 7 > calendar.monthrange(local.year, local.month)[1] else (local.day - 1) // 7 + 1
+        weekday = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')[local.weekday()]
+        lines += [f'BEGIN:{kind}', f"DTSTART:{local.strftime('%Y%m%dT%H%M%S')}",
+                  f'RRULE:FREQ=YEARLY;BYMONTH={local.month};BYDAY={week}{weekday}',
+                  f'TZOFFSETFROM:{_utc_offset(before)}', f'TZOFFSETTO:{_utc_offset(after)}',
+                  f'TZNAME:{moment.astimezone(zone).tzname()}', f'END:{kind}']
+    lines.append('END:VTIMEZONE')
+    return lines
+
+
+class _IcsWriter:
+    """
+    Write events as VEVENTs. Modified occurrences of a recurring event get a RECURRENCE-ID; cancelled
+    ones become EXDATEs of their recurring event, which is therefore held back until its calendar is
+    done. A VTIMEZONE is written for every TZID used.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.stamp = datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        self.calendar_id = None
+        self.recurring = []
+        self.cancelled = {}
+        # {TZID: earliest year it is used in}
+        self.zones = {}
+        stream.write(b'BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//CalenderAPI//export_events//EN\r\n')
+
+    def _use_zone(self, tzid, text):
+        year = int(text[:4])
+        self.zones[tzid] = min(year, self.zones.get(tzid, year))
+
+    def _time(self, name, when):
+        if when.get('timeZone') and 'dateTime' in when:
+            self._use_zone(when['timeZone'], when['dateTime'])
+        return _ics_time(name, when)
+
+    def _vevent(self, event, exdates=()):
+        lines = ['BEGIN:VEVENT', f"UID:{event.get('iCalUID') or event['id']}"]
+        lines.append(f"DTSTAMP:{_ics_stamp(event['updated']) if event.get('updated') else self.stamp}")
+        if event.get('recurringEventId') and event.get('originalStartTime'):
+            lines.append(self._time('RECURRENCE-ID', event['originalStartTime']))
+        if event.get('start'):
+            lines.append(self._time('DTSTART', event['start']))
+        if event.get('end'):
+            lines.append(self._time('DTEND', event['end']))
+        for field, name in (('summary', 'SUMMARY'), ('description', 'DESCRIPTION'), ('location', 'LOCATION')):
+            if event.get(field):
+                lines.append(f"{name}:{_escape(event[field])}")
+        start = event.get('start') or {}
+        for line in event.get('recurrence') or []:
+            lines.append(line)
+            for tzid in _TZID_PARAM.findall(line):
+                self._use_zone(tzid, start.get('dateTime') or start.get('date') or self.stamp)
+        lines.extend(self._time('EXDATE', when) for when in exdates)
+        if event.get('status') in ('confirmed', 'tentative', 'cancelled'):
+            lines.append(f"STATUS:{event['status'].upper()}")
+        if event.get('transparency') == 'transparent':
+            lines.append('TRANSP:TRANSPARENT')
+        if event.get('created'):
+            lines.append(f"CREATED:{_ics_stamp(event['created'])}")
+        lines.append('END:VEVENT')
+        return b''.join(_fold(line) for line in lines)
+
+    def _flush_recurring(self):
+        self.stream.write(b''.join(self._vevent(event, self.cancelled.get(event['id'], ()))
+                                   for event in self.recurring))
+        # Cancelled occurrences of recurring events outside the export have nothing to attach to
+        self.recurring = []
+        self.cancelled = {}
+
+    def write(self, calendar_id, events):
+        if calendar_id != self.calendar_id:
+            self._flush_recurring()
+            self.calendar_id = calendar_id
+        chunks = []
+        for event in events:
+            if event.get('recurringEventId') and event.get('status') == 'cancelled':
+                if event.get('originalStartTime'):
+                    self.cancelled.setdefault(event['recurringEventId'], []).append(event['originalStartTime'])
+            elif event.get('recurrence'):
+                self.recurring.append(event)
+            else:
+                chunks.append(self._vevent(event))
+        self.stream.write(b''.join(chunks))
+
+    def close(self):
+        self._flush_recurring()
+        for tzid, year in sorted(self.zones.items()):
+            try:
+                # Rules from the year before the first use, so every time in the file follows an observance
+                lines = _vtimezone(tzid, year - 1)
+            except (KeyError, ValueError):
+                # Not an IANA zone name; clients that know it still resolve it
+                continue
+            self.stream.write(b''.join(_fold(line) for line in lines))
+        self.stream.write(b'END:VCALENDAR\r\n')
+
+
+def _timestamp_us(text):
+    if not text:
+        return None
+    moment = datetime.datetime.fromisoformat(text.replace('Z', '+00:00'))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return int(moment.timestamp() * 1_000_000)
+
+
+class _ParquetWriter:
+    """
+    Buffer events as columns and write a Parquet row group every row_group_size rows.
+    Times are stored as UTC microsecond timestamps; all-day events also get their dates as date32.
+    """
+
+    def __init__(self, stream, row_group_size=ROW_GROUP_SIZE):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow")
+        self.pa = pa
+        timestamp = pa.timestamp('us', tz='UTC')
+        self.schema = pa.schema([
+            ('calendar_id', pa.string()),
+            ('id', pa.string()),
+            ('ical_uid', pa.string()),
+            ('status', pa.string()),
+            ('summary', pa.string()),
+            ('description', pa.string()),
+            ('location', pa.string()),
+            ('start', timestamp),
+            ('end', timestamp),
+            ('all_day', pa.bool_()),
+            ('start_date', pa.date32()),
+            ('end_date', pa.date32()),
+            ('time_zone', pa.string()),
+            ('recurrence', pa.list_(pa.string())),
+            ('recurring_event_id', pa.string()),
+            ('transparent', pa.bool_()),
+            ('created', timestamp),
+            ('updated', timestamp),
+        ])
+        self.writer = pq.ParquetWriter(stream, self.schema, compression='zstd')
+        self.row_group_size = row_group_size
+        self._reset()
+
+    def _reset(self):
+        self.columns = {field.name: [] for field in self.schema}
+        self.rows = 0
+
+    def write(self, calendar_id, events):
+        columns = self.columns
+        for event in events:
+            start = event.get('start') or {}
+            end = event.get('end') or {}
+            start_ts = event_time(start)[1]
+            end_ts = event_time(end)[1]
+            columns['calendar_id'].append(calendar_id)
+            columns['id'].append(event.get('id'))
+            columns['ical_uid'].append(event.get('iCalUID'))
+            columns['status'].append(event.get('status'))
+            columns['summary'].append(event.get('summary'))
+            columns['description'].append(event.get('description'))
+            columns['location'].append(event.get('location'))
+            columns['start'].append(int(start_ts * 1_000_000) if start_ts is not None else None)
+            columns['end'].append(int(end_ts * 1_000_000) if end_ts is not None else None)
+            columns['all_day'].append('date' in start)
+            columns['start_date'].append(datetime.date.fromisoformat(start['date']) if 'date' in start else None)
+            columns['end_date'].append(datetime.date.fromisoformat(end['date']) if 'date' in end else None)
+            columns['time_zone'].append(start.get('timeZone'))
+            columns['recurrence'].append(event.get('recurrence'))
+            columns['recurring_event_id'].append(event.get('recurringEventId'))
+            columns['transparent'].append(event.get('transparency') == 'transparent')
+            columns['created'].append(_timestamp_us(event.get('created')))
+            columns['updated'].append(_timestamp_us(event.get('updated')))
+            self.rows += 1
+            if self.rows >= self.row_group_size:
+                self._flush()
+
+    def _flush(self):
+        if not self.rows:
+            return
+        arrays = [self.pa.array(self.columns[field.name], type=field.type) for field in self.schema]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+        self._reset()
+
+    def close(self):
+        self._flush()
+        self.writer.close()
+
+
+def _writer(file_format, stream, row_group_size):
+    if file_format == 'ics':
+        return _IcsWriter(stream)
+    if file_format == 'parquet':
+        return _ParquetWriter(stream, row_group_size)
+    return _NdjsonWriter(stream)
+
+
+def guess_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    return {'.ics': 'ics', '.ical': 'ics', '.parquet': 'parquet', '.pq': 'parquet'}.get(extension, 'ndjson')
+
+
+def export_events(destination, calendar_ids=None, file_format=None, time_min=None, time_max=None,
+                  single_events=False, fields=EXPORT_FIELDS, page_size=MAX_PAGE_SIZE,
+                  row_group_size=ROW_GROUP_SIZE, service=None):
+    """
+    Stream the events of one or many calendars into an NDJSON, ICS or Parquet file.
+    Events are fetched a page at a time and written as they arrive, so memory stays bounded by
+    one page (or one Parquet row group) however many years of events are exported. ICS export
+    also holds a calendar's recurring events until the calendar is done, so the occurrences
+    cancelled in later pages can be written as their EXDATEs.
+    The file is written under a temporary name and moved into place once complete.
+    Args:
+        destination (str): Output path.
+        calendar_ids (list): Calendars to export; defaults to every calendar in the user's list.
+        file_format (str): 'ndjson', 'ics' or 'parquet'; guessed from the extension when omitted.
+        time_min, time_max (str): Optional RFC3339 bounds passed to events().list().
+        single_events (bool): Export recurring events as individual instances instead of masters.
+        fields (tuple): Event fields to request; None fetches full events.
+        page_size (int): Events requested per page (at most 2500).
+        row_group_size (int): Rows per Parquet row group.
+        service: Optional Calendar service; defaults to get_calendar_service(SCOPES).
+    Returns: {calendar_id: number of events exported}.
+    """
+    service = service or get_calendar_service(SCOPES)
+    file_format = file_format or guess_format(destination)
+    if calendar_ids is None:
+        calendar_ids = [calendar['id'] for calendar in iter_calendars(fields=('id',), service=service)]
+
+    params = {'timeMin': time_min, 'timeMax': time_max}
+    if single_events:
+        params['singleEvents'] = True
+
+    counts = {}
+    with atomic_write(destination, 'wb') as stream:
+        writer = _writer(file_format, stream, row_group_size)
+        for calendar_id in calendar_ids:
+            counts[calendar_id] = 0
+            for page in iter_event_pages(calendar_id, fields, page_size, service, **params):
+                items = page.get('items', [])
+                writer.write(calendar_id, items)
+                counts[calendar_id] += len(items)
+        writer.close()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export calendar events to NDJSON, ICS or Parquet.')
+    parser.add_argument('destination', help='Output file (.ndjson, .ics or .parquet)')
+    parser.add_argument('--calendar', action='append', dest='calendar_ids',
+                        help='Calendar ID to export; repeat for several (default: all calendars)')
+    parser.add_argument('--format', choices=FORMATS, help='Output format (default: from extension)')
+    parser.add_argument('--time-min', help='Only events ending after this RFC3339 timestamp')
+    parser.add_argument('--time-max', help='Only events starting before this RFC3339 timestamp')
+    parser.add_argument('--single-events', action='store_true', help='Expand recurring events into instances')
+    parser.add_argument('--row-group-size', type=int, default=ROW_GROUP_SIZE)
+    args = parser.parse_args(argv)
+
+    try:
+        counts = export_events(args.destination, args.calendar_ids, args.format, args.time_min, args.time_max,
+                               args.single_events, row_group_size=args.row_group_size)
+    except HttpError as error:
+        print(f"An error occurred: {error}")
+        return 1
+
+    for calendar_id, count in counts.items():
+        print(f"Calendar ID: {calendar_id}, Events exported: {count}")
+    print(f"Exported {sum(counts.values())} events to {args.destination}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,537 @@
+import argparse
+import json
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+import uuid
+from email.parser import Parser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+# Path prefix of the Calendar v3 REST API and of its batch endpoint
+API_PREFIX = '/calendar/v3'
+BATCH_PATH = '/batch/calendar/v3'
+
+
+class FakeCalendarBackend:
+    """
+    In-memory stand-in for the parts of the Calendar v3 API used by the CalenderAPI scripts.
+    Args:
+        error_rate (float): Fraction of API calls answered with error_status instead of being served.
+        error_status (int): Status of injected errors (default: 503).
+        quota (float): Calls allowed per second across all callers; calls over it get
+                       403 rateLimitExceeded like the real API (default: unlimited).
+        seed (int): Seed for error injection, so runs are reproducible.
+    """
+
+    def __init__(self, error_rate=0.0, error_status=503, quota=None, seed=None):
+        self.lock = threading.Lock()
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.quota = quota
+        self.random = random.Random(seed)
+        self.quota_window = 0
+        self.quota_used = 0
+        self.fault_stats = {'calls': 0, 'injected_errors': 0, 'rate_limited': 0}
+        # Push-notification channels: {channel_id: channel}
+        self.channels = {}
+        self.notifier = _Notifier()
+        self.calendars = {'primary': {'id': 'primary', 'summary': 'Primary'}}
+        self.events = {'primary': {}}
+        self.acls = {'primary': {}}
+        # Change sequence numbers back the sync tokens: {(calendar_id, event_id): seq}
+        self.sequence = 0
+        self.versions = {}
+        self.tombstones = {}
+        self.oldest_sync_token = 0
+        self.routes = [
+            ('GET', r'/users/me/calendarList', self.list_calendar_list),
+            ('GET', r'/users/me/calendarList/([^/]+)', self.get_calendar),
+            ('DELETE', r'/users/me/calendarList/([^/]+)', self.delete_calendar),
+            ('POST', r'/calendars', self.insert_calendar),
+            ('GET', r'/calendars/([^/]+)', self.get_calendar),
+            ('PATCH', r'/calendars/([^/]+)', self.patch_calendar),
+            ('DELETE', r'/calendars/([^/]+)', self.delete_calendar),
+            ('POST', r'/freeBusy', self.query_free_busy),
+            ('GET', r'/calendars/([^/]+)/acl', self.list_acl),
+            ('POST', r'/calendars/([^/]+)/acl', self.insert_acl),
+            ('PATCH', r'/calendars/([^/]+)/acl/([^/]+)', self.patch_acl),
+            ('DELETE', r'/calendars/([^/]+)/acl/([^/]+)', self.delete_acl),
+            ('GET', r'/calendars/([^/]+)/events', self.list_events),
+            ('POST', r'/calendars/([^/]+)/events', self.insert_event),
+            ('POST', r'/calendars/([^/]+)/events/import', self.import_event),
+            ('POST', r'/calendars/([^/]+)/events/watch', self.watch_events),
+            ('POST', r'/channels/stop', self.stop_channel),
+            ('GET', r'/calendars/([^/]+)/events/([^/]+)', self.get_event),
+            ('DELETE', r'/calendars/([^/]+)/events/([^/]+)', self.delete_event),
+        ]
+
+    def dispatch(self, method, path, query, body):
+        """
+        Route one API request and return (status, response body or None).
+        """
+        if not path.startswith(API_PREFIX):
+            return 404, _error(404, 'Not Found')
+        path = path[len(API_PREFIX):]
+
+        for route_method, pattern, handler in self.routes:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                args = [unquote(arg) for arg in match.groups()]
+                with self.lock:
+                    fault = self._fault()
+                    if fault is not None:
+                        return fault
+                    return handler(query, body, *args)
+        return 404, _error(404, 'Not Found')
+
+    def _fault(self):
+        """
+        Apply the quota and error injection to one API call; return an error response or None.
+        Every call counts, including each part of a batch request, as it does against the real quota.
+        """
+        self.fault_stats['calls'] += 1
+        if self.quota is not None:
+            window = int(time.monotonic())
+            if window != self.quota_window:
+                self.quota_window = window
+                self.quota_used = 0
+            self.quota_used += 1
+            if self.quota_used > self.quota:
+                self.fault_stats['rate_limited'] += 1
+                return 403, _error(403, 'Rate Limit Exceeded', 'rateLimitExceeded')
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.fault_stats['injected_errors'] += 1
+            return self.error_status, _error(self.error_status, _status_text(self.error_status))
+        return None
+
+    def add_calendar(self, calendar_id, summary=None):
+        """
+        Create an empty calendar directly, bypassing HTTP.
+        """
+        with self.lock:
+            self.calendars[calendar_id] = {'id': calendar_id, 'summary': summary or calendar_id}
+            self.events.setdefault(calendar_id, {})
+            self.acls.setdefault(calendar_id, {})
+            return self.calendars[calendar_id]
+
+    def add_event(self, calendar_id, event):
+        """
+        Store an event directly, bypassing HTTP; used to seed benchmarks.
+        """
+        with self.lock:
+            event = dict(event)
+            event.setdefault('id', uuid.uuid4().hex)
+            event.setdefault('status', 'confirmed')
+            self._store_event(calendar_id, event)
+            return event
+
+    def expire_sync_tokens(self):
+        """
+        Invalidate every sync token handed out so far; their next use gets 410 Gone.
+        """
+        with self.lock:
+            self.oldest_sync_token = self.sequence + 1
+
+    def _store_event(self, calendar_id, event):
+        self.sequence += 1
+        self.events.setdefault(calendar_id, {})[event['id']] = event
+        self.versions[(calendar_id, event['id'])] = self.sequence
+        self.tombstones.pop((calendar_id, event['id']), None)
+        self._notify(calendar_id, 'exists')
+
+    def _remove_event(self, calendar_id, event_id):
+        event = self.events.get(calendar_id, {}).pop(event_id, None)
+        if event is not None:
+            self.sequence += 1
+            self.versions.pop((calendar_id, event_id), None)
+            self.tombstones[(calendar_id, event_id)] = self.sequence
+            self._notify(calendar_id, 'exists')
+        return event
+
+    def _notify(self, calendar_id, state, channels=None):
+        """
+        Queue a push notification to every live channel watching the calendar.
+        """
+        now_ms = time.time() * 1000
+        for channel_id, channel in list((channels or self.channels).items()):
+            if channel['calendar_id'] != calendar_id:
+                continue
+            if channel['expiration'] <= now_ms:
+                self.channels.pop(channel_id, None)
+                continue
+            channel['message_number'] += 1
+            self.notifier.send(channel['address'], {
+                'X-Goog-Channel-ID': channel_id,
+                'X-Goog-Channel-Token': channel.get('token') or '',
+                'X-Goog-Channel-Expiration': time.strftime(
+                    '%a, %d %b %Y %H:%M:%S GMT', time.gmtime(channel['expiration'] / 1000)),
+                'X-Goog-Resource-ID': channel['resource_id'],
+                'X-Goog-Resource-URI': f"{API_PREFIX}/calendars/{calendar_id}/events",
+                'X-Goog-Resource-State': state,
+                'X-Goog-Message-Number': str(channel['message_number']),
+            })
+
+    def _changed_since(self, calendar_id, since):
+        items = [event for event_id, event in self.events[calendar_id].items()
+                 if self.versions[(calendar_id, event_id)] > since]
+        items.extend({'id': event_id, 'status': 'cancelled'}
+                     for (cal, event_id), seq in self.tombstones.items()
+                     if cal == calendar_id and seq > since)
+        return items
+
+    def _page(self, kind, items, query):
+        max_results = int(query.get('maxResults', 250))
+        offset = int(query.get('pageToken', 0))
+        result = {'kind': kind, 'items': items[offset:offset + max_results]}
+        if offset + max_results < len(items):
+            result['nextPageToken'] = str(offset + max_results)
+        return result
+
+    def list_calendar_list(self, query, body):
+        return 200, self._page('calendar#calendarList', list(self.calendars.values()), query)
+
+    def insert_calendar(self, query, body):
+        calendar = dict(body or {})
+        calendar['id'] = uuid.uuid4().hex + '@group.calendar.google.com'
+        calendar['kind'] = 'calendar#calendar'
+        self.calendars[calendar['id']] = calendar
+        self.events[calendar['id']] = {}
+        self.acls[calendar['id']] = {}
+        return 200, calendar
+
+    def get_calendar(self, query, body, calendar_id):
+        if calendar_id not in self.calendars:
+            return 404, _error(404, 'Not Found')
+        return 200, self.calendars[calendar_id]
+
+    def patch_calendar(self, query, body, calendar_id):
+        if calendar_id not in self.calendars:
+            return 404, _error(404, 'Not Found')
+        self.calendars[calendar_id].update(body or {})
+        return 200, self.calendars[calendar_id]
+
+    def delete_calendar(self, query, body, calendar_id):
+        if calendar_id == 'primary':
+            return 400, _error(400, 'Cannot delete primary calendar.', 'cannotDeletePrimaryCalendar')
+        if self.calendars.pop(calendar_id, None) is None:
+            return 404, _error(404, 'Not Found')
+        for event_id in list(self.events.pop(calendar_id, {})):
+            self.versions.pop((calendar_id, event_id), None)
+        self.acls.pop(calendar_id, None)
+        return 204, None
+
+    def query_free_busy(self, query, body):
+        calendars = {}
+        for item in body.get('items', []):
+            calendar_id = item['id']
+            if calendar_id not in self.events:
+                calendars[calendar_id] = {'errors': [{'domain': 'global', 'reason': 'notFound'}]}
+                continue
+            busy = [
+                {'start': event['start'].get('dateTime', event['start'].get('date')),
+                 'end': event['end'].get('dateTime', event['end'].get('date'))}
+                for event in self.events[calendar_id].values()
+                if 'start' in event and 'end' in event and event.get('transparency') != 'transparent'
+                and _start_text(event['start']) < body['timeMax'] and _start_text(event['end']) > body['timeMin']
+            ]
+            calendars[calendar_id] = {'busy': busy}
+        return 200, {'kind': 'calendar#freeBusy', 'timeMin': body['timeMin'], 'timeMax': body['timeMax'],
+                     'calendars': calendars}
+
+    def list_acl(self, query, body, calendar_id):
+        if calendar_id not in self.acls:
+            return 404, _error(404, 'Not Found')
+        return 200, self._page('calendar#acl', list(self.acls[calendar_id].values()), query)
+
+    def insert_acl(self, query, body, calendar_id):
+        if calendar_id not in self.acls:
+            return 404, _error(404, 'Not Found')
+        scope = body['scope']
+        rule = {'kind': 'calendar#aclRule', 'id': f"{scope['type']}:{scope.get('value', '')}",
+                'scope': scope, 'role': body['role']}
+        self.acls[calendar_id][rule['id']] = rule
+        return 200, rule
+
+    def patch_acl(self, query, body, calendar_id, rule_id):
+        rule = self.acls.get(calendar_id, {}).get(rule_id)
+        if rule is None:
+            return 404, _error(404, 'Not Found')
+        rule.update(body or {})
+        return 200, rule
+
+    def delete_acl(self, query, body, calendar_id, rule_id):
+        if self.acls.get(calendar_id, {}).pop(rule_id, None) is None:
+            return 404, _error(404, 'Not Found')
+        return 204, None
+
+    def list_events(self, query, body, calendar_id):
+        if calendar_id not in self.events:
+            return 404, _error(404, 'Not Found')
+        sync_token = query.get('syncToken')
+        if sync_token:
+            if not sync_token.isdigit() or int(sync_token) < self.oldest_sync_token:
+                return 410, _error(410, 'Sync token is no longer valid, a full sync is required.',
+                                   'fullSyncRequired')
+            items = self._changed_since(calendar_id, int(sync_token))
+        else:
+            items = list(self.events[calendar_id].values())
+        result = self._page('calendar#events', items, query)
+        if 'nextPageToken' not in result:
+            result['nextSyncToken'] = str(max(self.sequence, self.oldest_sync_token))
+        return 200, result
+
+    def insert_event(self, query, body, calendar_id):
+        if calendar_id not in self.events:
+            return 404, _error(404, 'Not Found')
+        event = dict(body or {})
+        if event.get('id') in self.events[calendar_id]:
+            return 409, _error(409, 'The requested identifier already exists.', 'duplicate')
+        event['id'] = event.get('id') or uuid.uuid4().hex
+        event['status'] = 'confirmed'
+        self._store_event(calendar_id, event)
+        return 200, event
+
+    def import_event(self, query, body, calendar_id):
+        if calendar_id not in self.events:
+            return 404, _error(404, 'Not Found')
+        # Importing is idempotent on iCalUID: an existing event with the same UID is updated
+        event = dict(body or {})
+        existing = next((stored for stored in self.events[calendar_id].values()
+                         if stored.get('iCalUID') == event.get('iCalUID')), None)
+        event['id'] = existing['id'] if existing else uuid.uuid4().hex
+        event['status'] = 'confirmed'
+        self._store_event(calendar_id, event)
+        return 200, event
+
+    def watch_events(self, query, body, calendar_id):
+        if calendar_id not in self.events:
+            return 404, _error(404, 'Not Found')
+        if body['id'] in self.channels:
+            return 400, _error(400, 'Channel id not unique', 'channelIdNotUnique')
+        ttl = float(body.get('params', {}).get('ttl', 604800))
+        channel = {
+            'calendar_id': calendar_id,
+            'address': body['address'],
+            'token': body.get('token'),
+            'resource_id': 'resource-' + calendar_id,
+            'expiration': int((time.time() + ttl) * 1000),
+            'message_number': 0,
+        }
+        self.channels[body['id']] = channel
+        # Every new channel starts with a 'sync' message
+        self._notify(calendar_id, 'sync', {body['id']: channel})
+        return 200, {'kind': 'api#channel', 'id': body['id'], 'resourceId': channel['resource_id'],
+                     'resourceUri': f"{API_PREFIX}/calendars/{calendar_id}/events",
+                     'token': channel['token'], 'expiration': str(channel['expiration'])}
+
+    def stop_channel(self, query, body):
+        channel = self.channels.get(body['id'])
+        if channel is None or channel['resource_id'] != body.get('resourceId'):
+            return 404, _error(404, 'Channel not found')
+        del self.channels[body['id']]
+        return 204, None
+
+    def get_event(self, query, body, calendar_id, event_id):
+        event = self.events.get(calendar_id, {}).get(event_id)
+        if event is None:
+            return 404, _error(404, 'Not Found')
+        return 200, event
+
+    def delete_event(self, query, body, calendar_id, event_id):
+        if self._remove_event(calendar_id, event_id) is None:
+            return 410, _error(410, 'Resource has been deleted')
+        return 204, None
+
+
+class _Notifier:
+    """
+    Stand-in for Google's push delivery: POSTs notifications to webhook addresses from a
+    background thread, in order, so the backend never blocks on a slow receiver.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.thread = None
+        self.delivered = 0
+        self.failed = 0
+
+    def send(self, address, headers):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+        self.queue.put((address, headers))
+
+    def _run(self):
+        while True:
+            address, headers = self.queue.get()
+            request = urllib.request.Request(address, data=b'', headers=headers, method='POST')
+            try:
+                with urllib.request.urlopen(request, timeout=10) as response:
+                    response.read()
+                self.delivered += 1
+            except OSError:
+                # Includes HTTPError: the receiver rejected the notification
+                self.failed += 1
+            finally:
+                self.queue.task_done()
+
+    def join(self):
+        """
+        Wait until every queued notification has been delivered or has failed.
+        """
+        self.queue.join()
+
+
+def _error(code, message, reason=None):
+    return {'error': {
+        'code': code,
+        'message': message,
+        'errors': [{'reason': reason or message, 'message': message}],
+    }}
+
+
+def _start_text(when):
+    # Only used for coarse filtering; UTC timestamps compare correctly as strings
+    return when.get('dateTime', when.get('date', ''))
+
+
+def _status_text(status):
+    return BaseHTTPRequestHandler.responses.get(status, ('Unknown',))[0]
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; without TCP_NODELAY, Nagle's algorithm and
+    # delayed ACKs add ~40 ms to every response that has a body
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+
+        url = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        raw_body = self.rfile.read(length) if length else b''
+
+        if url.path == BATCH_PATH and self.command == 'POST':
+            self._send_batch(raw_body)
+            return
+
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        body = json.loads(raw_body) if raw_body else None
+        status, payload = server.backend.dispatch(self.command, url.path, query, body)
+        content = json.dumps(payload).encode('utf-8') if payload is not None else b''
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _send_batch(self, raw_body):
+        """
+        Answer a multipart/mixed batch request by dispatching every part in order.
+        """
+        header = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n"
+        message = Parser().parsestr(header + raw_body.decode('utf-8'))
+        boundary = 'batch_' + uuid.uuid4().hex
+
+        parts = []
+        for part in message.get_payload():
+            request_line, rest = part.get_payload().split('\n', 1)
+            method, target, _ = request_line.strip().split(' ', 2)
+            inner = Parser().parsestr(rest)
+            inner_body = inner.get_payload()
+            url = urlsplit(target)
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            body = json.loads(inner_body) if inner_body.strip() else None
+
+            status, payload = self.server.backend.dispatch(method, url.path, query, body)
+            content = json.dumps(payload) if payload is not None else ''
+            # Unfold the header; long Content-IDs arrive wrapped over two lines
+            content_id = ' '.join(part['Content-ID'].split())[1:-1]
+            parts.append(
+                f"--{boundary}\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {_status_text(status)}\r\n"
+                "Content-Type: application/json; charset=UTF-8\r\n"
+                f"Content-Length: {len(content.encode('utf-8'))}\r\n\r\n"
+                f"{content}\r\n"
+            )
+        parts.append(f"--{boundary}--\r\n")
+        content = ''.join(parts).encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', f'multipart/mixed; boundary={boundary}')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+
+class FakeCalendarServer:
+    """
+    Run a FakeCalendarBackend behind a local HTTP server.
+    Point the client at it with get_calendar_service(..., root_url=server.root_url).
+    Args:
+        port (int): Port to listen on (default: 0, pick a free port).
+        latency (float): Seconds added to every HTTP round trip.
+        backend (FakeCalendarBackend): State to serve; pass one to configure errors and quotas.
+    """
+
+    def __init__(self, port=0, latency=0.0, backend=None):
+        self.backend = backend or FakeCalendarBackend()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), _RequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.backend = self.backend
+        self.httpd.latency = latency
+        self.thread = None
+
+    @property
+    def root_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    # Serve the fake API until interrupted
+    parser = argparse.ArgumentParser(description='Serve an in-memory fake of the Calendar v3 API.')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds per HTTP round trip')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of calls that fail')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--quota', type=float, help='API calls allowed per second')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+    backend = FakeCalendarBackend(args.error_rate, args.error_status, args.quota, args.seed)
+    server = FakeCalendarServer(port=args.port, latency=args.latency, backend=backend)
+    print(f"Fake Calendar API listening on {server.root_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
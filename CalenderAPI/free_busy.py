@@ -0,0 +1,218 @@
+import datetime
+import numpy as np
+from dotenv import load_dotenv
+from batch_runner import execute_batched
+from calendar_service import get_calendar_service
+from event_sync import event_time
+
+# Load environment variables from .env file
+load_dotenv()
+
+# OAuth2 scopes for Google Calendar API
+SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
+
+# The freeBusy endpoint accepts at most 50 calendars per query
+FREE_BUSY_GROUP_SIZE = 50
+
+# Default grid resolution in minutes
+SLOT_MINUTES = 15
+
+
+def _timestamp(value):
+    """
+    Accept epoch seconds, a datetime (naive values are taken as UTC) or an RFC3339 string.
+    """
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return value.timestamp()
+    return float(value)
+
+
+def busy_intervals_from_events(events):
+    """
+    Return [(start_ts, end_ts)] for events that block time.
+    Cancelled events and events marked 'transparent' (shown as free) are skipped.
+    """
+    intervals = []
+    for event in events:
+        if event.get('status') == 'cancelled' or event.get('transparency') == 'transparent':
+            continue
+        start_ts = event_time(event.get('start'))[1]
+        end_ts = event_time(event.get('end'))[1]
+        if start_ts is not None and end_ts is not None:
+            intervals.append((start_ts, end_ts))
+    return intervals
+
+
+def query_free_busy(calendar_ids, time_min, time_max, service=None, scheduler=None):
+    """
+    Fetch busy intervals from the freeBusy endpoint, 50 calendars per query and
+    all queries sent together in batch requests.
+    Returns: ({calendar_id: [(start_ts, end_ts)]}, {calendar_id: error}).
+    """
+    service = service or get_calendar_service(SCOPES)
+    free_busy = service.freebusy()
+    calendar_ids = list(calendar_ids)
+    time_min = datetime.datetime.fromtimestamp(_timestamp(time_min), datetime.timezone.utc).isoformat()
+    time_max = datetime.datetime.fromtimestamp(_timestamp(time_max), datetime.timezone.utc).isoformat()
+
+    requests = []
+    for offset in range(0, len(calendar_ids), FREE_BUSY_GROUP_SIZE):
+        group = calendar_ids[offset:offset + FREE_BUSY_GROUP_SIZE]
+        body = {'timeMin': time_min, 'timeMax': time_max, 'items': [{'id': calendar_id} for calendar_id in group]}
+        requests.append((str(offset), free_busy.query(body=body)))
+    result = execute_batched(service, requests, scheduler=scheduler)
+
+    busy = {}
+    errors = {}
+    for offset, error in result['failed'].items():
+        for calendar_id in calendar_ids[int(offset):int(offset) + FREE_BUSY_GROUP_SIZE]:
+            errors[calendar_id] = error
+    for response in result['succeeded'].values():
+        for calendar_id, calendar in response.get('calendars', {}).items():
+            if calendar.get('errors'):
+                errors[calendar_id] = calendar['errors']
+                continue
+            busy[calendar_id] = [(_timestamp(period['start']), _timestamp(period['end']))
+                                 for period in calendar.get('busy', [])]
+    return busy, errors
+
+
+class BusyGrid:
+    """
+    Slot-resolution occupancy matrix: one row per person, one column per slot, True when busy.
+    All queries are NumPy operations over the whole matrix.
+    Args:
+        people (list): Row labels, e.g. calendar IDs or email addresses.
+        start: Time of the first slot (epoch seconds or datetime).
+        slot_minutes (int): Length of one slot.
+        busy (numpy.ndarray): Boolean matrix of shape (len(people), number of slots).
+    """
+
+    def __init__(self, people, start, slot_minutes, busy):
+        self.people = list(people)
+        self.start = _timestamp(start)
+        self.slot_minutes = slot_minutes
+        self.slot_seconds = slot_minutes * 60
+        self.busy = busy
+        self._rows = {person: row for row, person in enumerate(self.people)}
+
+    @classmethod
+    def from_intervals(cls, intervals_by_person, start, end, slot_minutes=SLOT_MINUTES):
+        """
+        Build a grid from {person: [(start_ts, end_ts)]}.
+        A slot is busy when any interval overlaps it; intervals are scattered into a
+        difference array and summed per row, so cost is linear in intervals plus grid size.
+        """
+        start, end = _timestamp(start), _timestamp(end)
+        slot_seconds = slot_minutes * 60
+        people = list(intervals_by_person)
+        slots = max(int(np.ceil((end - start) / slot_seconds)), 0)
+
+        rows, starts, ends = [], [], []
+        for row, person in enumerate(people):
+            intervals = intervals_by_person[person]
+            rows.extend([row] * len(intervals))
+            starts.extend(interval[0] for interval in intervals)
+            ends.extend(interval[1] for interval in intervals)
+
+        rows = np.asarray(rows, dtype=np.intp)
+        starts = np.asarray(starts, dtype=np.float64)
+        ends = np.asarray(ends, dtype=np.float64)
+        first = np.clip(np.floor((starts - start) / slot_seconds), 0, slots).astype(np.intp)
+        last = np.clip(np.ceil((ends - start) / slot_seconds), 0, slots).astype(np.intp)
+        keep = (ends > starts) & (last > first)
+
+        # Flattened difference array: +1 where an interval begins, -1 just past where it ends
+        width = slots + 1
+        size = len(people) * width
+        diff = np.bincount(rows[keep] * width + first[keep], minlength=size).astype(np.int32)
+        diff -= np.bincount(rows[keep] * width + last[keep], minlength=size).astype(np.int32)
+        busy = np.cumsum(diff.reshape(len(people), width)[:, :slots], axis=1) > 0
+        return cls(people, start, slot_minutes, busy)
+
+    @classmethod
+    def from_events(cls, events_by_person, start, end, slot_minutes=SLOT_MINUTES):
+        """
+        Build a grid from {person: [calendar events]}, e.g. the output of fetch_calendars_events().
+        """
+        intervals = {person: busy_intervals_from_events(events) for person, events in events_by_person.items()}
+        return cls.from_intervals(intervals, start, end, slot_minutes)
+
+    def _select(self, people):
+        if people is None:
+            return self.busy
+        return self.busy[[self._rows[person] for person in people]]
+
+    def slot_time(self, index):
+        """
+        Return the start of slot `index` as an aware UTC datetime.
+        """
+        return datetime.datetime.fromtimestamp(self.start + index * self.slot_seconds, datetime.timezone.utc)
+
+    def common_free(self, people=None):
+        """
+        Return a boolean vector of slots in which every selected person is free.
+        """
+        return ~self._select(people).any(axis=0)
+
+    def busy_count(self, people=None):
+        """
+        Return how many of the selected people are busy in each slot.
+        """
+        return self._select(people).sum(axis=0)
+
+    def earliest_slots(self, duration_minutes, people=None, count=1, not_before=None, step_minutes=None):
+        """
+        Return up to `count` start times at which all selected people are free for duration_minutes.
+        Args:
+            duration_minutes (int): Length of the meeting.
+            people (list): Rows to consider (default: everyone).
+            count (int): Maximum number of candidate start times.
+            not_before: Ignore slots before this time.
+            step_minutes (int): Spacing between returned candidates (default: the meeting length).
+        """
+        length = int(np.ceil(duration_minutes / self.slot_minutes))
+        free = self.common_free(people)
+        if length <= 0 or length > free.size:
+            return []
+
+        # Window sums over the free vector: a start is valid when all `length` slots are free
+        totals = np.concatenate(([0], np.cumsum(free, dtype=np.int64)))
+        valid = (totals[length:] - totals[:-length]) == length
+        if not_before is not None:
+            skip = int(np.ceil((_timestamp(not_before) - self.start) / self.slot_seconds))
+            valid[:max(skip, 0)] = False
+
+        step = max(int(np.ceil((step_minutes or duration_minutes) / self.slot_minutes)), 1)
+        starts = []
+        candidates = np.flatnonzero(valid)
+        next_allowed = -1
+        for index in candidates:
+            if index >= next_allowed:
+                starts.append(self.slot_time(int(index)))
+                next_allowed = index + step
+                if len(starts) == count:
+                    break
+        return starts
+
+    def utilization(self):
+        """
+        Return {person: fraction of slots busy}.
+        """
+        fractions = self.busy.mean(axis=1) if self.busy.shape[1] else np.zeros(len(self.people))
+        return dict(zip(self.people, fractions.tolist()))
+
+
+def find_common_free_time(calendar_ids, time_min, time_max, duration_minutes, count=5,
+                          slot_minutes=SLOT_MINUTES, service=None):
+    """
+    Query the freeBusy endpoint for many calendars and return the earliest common free slots.
+    Calendars that could not be queried are left out and reported in the second return value.
+    """
+    busy, errors = query_free_busy(calendar_ids, time_min, time_max, service)
+    grid = BusyGrid.from_intervals(busy, time_min, time_max, slot_minutes)
+    return grid.earliest_slots(duration_minutes, count=count), errors
@@ -0,0 +1,335 @@
+import argparse
+import base64
+import datetime
+import hashlib
+import json
+import os
+import sys
+from dotenv import load_dotenv
+from googleapiclient.errors import HttpError
+from atomic_write import atomic_write
+from batch_runner import BATCH_SIZE, execute_batched
+from calendar_service import get_calendar_service
+
+# Load environment variables from .env file
+load_dotenv()
+
+# OAuth2 scopes for Google Calendar API
+SCOPES = ['https://www.googleapis.com/auth/calendar']
+
+# Event fields the API sets itself and rejects or ignores on insert
+READ_ONLY_FIELDS = ('kind', 'etag', 'htmlLink', 'created', 'updated', 'creator', 'organizer',
+                    'hangoutLink', 'recurringEventId', 'sequence')
+
+# iCalendar property -> event field for plain text properties
+ICS_TEXT_FIELDS = {'SUMMARY': 'summary', 'DESCRIPTION': 'description', 'LOCATION': 'location'}
+
+
+class InvalidEvent(ValueError):
+    pass
+
+
+def read_jsonl(stream, offset=0):
+    """
+    Yield (offset after the record, line) for every non-empty line of a binary JSONL stream.
+    Lines are left unparsed so that a malformed one can be rejected on its own; see parse_jsonl().
+    """
+    stream.seek(offset)
+    for line in iter(stream.readline, b''):
+        offset += len(line)
+        if line.strip():
+            yield offset, line
+
+
+def parse_jsonl(line):
+    """
+    Parse one JSONL line into an event dict.
+    Raises InvalidEvent if the line is not valid JSON or not a JSON object.
+    """
+    try:
+        event = json.loads(line)
+    except ValueError as error:
+        raise InvalidEvent(f'invalid JSON: {error}')
+    if not isinstance(event, dict):
+        raise InvalidEvent('record is not a JSON object')
+    return event
+
+
+def _unfolded_lines(stream, offset):
+    """
+    Yield (offset after the logical line, bytes) with RFC 5545 folded lines joined back together.
+    Lines are not decoded here, so a bad byte only fails the record it belongs to.
+    """
+    stream.seek(offset)
+    pending = None
+    pending_end = offset
+    for raw in iter(stream.readline, b''):
+        offset += len(raw)
+        line = raw.rstrip(b'\r\n')
+        if line[:1] in (b' ', b'\t') and pending is not None:
+            pending += line[1:]
+            pending_end = offset
+            continue
+        if pending is not None:
+            yield pending_end, pending
+        pending = line
+        pending_end = offset
+    if pending is not None:
+        yield pending_end, pending
+
+
+def _unescape(text):
+    return (text.replace('\\n', '\n').replace('\\N', '\n')
+            .replace('\\,', ',').replace('\\;', ';').replace('\\\\', '\\'))
+
+
+def _ics_time(params, value):
+    """
+    Convert a DTSTART/DTEND value into an event 'start'/'end' object.
+    """
+    if params.get('VALUE') == 'DATE' or len(value) == 8:
+        return {'date': f"{value[:4]}-{value[4:6]}-{value[6:8]}"}
+    moment = datetime.datetime.strptime(value.rstrip('Z'), '%Y%m%dT%H%M%S')
+    if value.endswith('Z'):
+        return {'dateTime': moment.isoformat() + 'Z'}
+    when = {'dateTime': moment.isoformat()}
+    if 'TZID' in params:
+        when['timeZone'] = params['TZID']
+    return when
+
+
+def _ics_event(properties):
+    event = {}
+    recurrence = []
+    for name, params, value, line in properties:
+        if name in ICS_TEXT_FIELDS:
+            event[ICS_TEXT_FIELDS[name]] = _unescape(value)
+        elif name == 'UID':
+            event['iCalUID'] = value
+        elif name == 'DTSTART':
+            event['start'] = _ics_time(params, value)
+        elif name == 'DTEND':
+            event['end'] = _ics_time(params, value)
+        elif name in ('RRULE', 'EXRULE', 'RDATE', 'EXDATE'):
+            recurrence.append(line)
+        elif name == 'TRANSP' and value == 'TRANSPARENT':
+            event['transparency'] = 'transparent'
+    if recurrence:
+        event['recurrence'] = recurrence
+    return event
+
+
+def read_ics(stream, offset=0):
+    """
+    Yield (offset after the record, content lines) for every VEVENT of a binary iCalendar stream.
+    The lines are unfolded but left unparsed, so that a malformed VEVENT can be rejected on its
+    own; see parse_ics(). Only the current VEVENT is held in memory.
+    """
+    lines = None
+    depth = 0
+    for offset, line in _unfolded_lines(stream, offset):
+        name_part, _, value = line.partition(b':')
+        name = name_part.split(b';')[0].upper()
+        value = value.upper()
+
+        if name == b'BEGIN' and value == b'VEVENT':
+            lines = []
+            depth = 0
+        elif lines is None:
+            continue
+        elif name == b'BEGIN':
+            # Nested components such as VALARM are skipped
+            depth += 1
+        elif name == b'END' and value == b'VEVENT' and depth == 0:
+            yield offset, lines
+            lines = None
+        elif name == b'END':
+            depth -= 1
+        elif depth == 0:
+            lines.append(line)
+
+
+def parse_ics(lines):
+    """
+    Parse the content lines of one VEVENT into an event dict.
+    Raises InvalidEvent if a line is not UTF-8 or a property value cannot be read.
+    """
+    properties = []
+    try:
+        for raw in lines:
+            line = raw.decode('utf-8')
+            name_part, _, value = line.partition(':')
+            name, *raw_params = name_part.split(';')
+            params = {}
+            for param in raw_params:
+                key, _, param_value = param.partition('=')
+                params[key.upper()] = param_value.strip('"')
+            properties.append((name.upper(), params, value, line))
+        return _ics_event(properties)
+    except ValueError as error:
+        raise InvalidEvent(f'invalid VEVENT: {error}')
+
+
+def normalize_event(event):
+    """
+    Validate an event and return a copy ready for insertion.
+    Read-only fields are dropped and a missing end defaults to the start (one day for all-day events).
+    Raises InvalidEvent if the event has no usable start.
+    """
+    event = {key: value for key, value in event.items() if key not in READ_ONLY_FIELDS}
+
+    start = event.get('start')
+    if not isinstance(start, dict) or not (start.get('dateTime') or start.get('date')):
+        raise InvalidEvent('event has no start')
+
+    if not event.get('end'):
+        if 'date' in start:
+            day = datetime.date.fromisoformat(start['date']) + datetime.timedelta(days=1)
+            event['end'] = {'date': day.isoformat()}
+        else:
+            event['end'] = dict(start)
+    return event
+
+
+def idempotency_key(event):
+    """
+    Return the key that identifies an event across runs: its iCalUID, its id,
+    or else a hash of its content.
+    """
+    if event.get('iCalUID'):
+        return 'uid:' + event['iCalUID']
+    if event.get('id'):
+        return 'id:' + event['id']
+    return 'hash:' + hashlib.sha1(json.dumps(event, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _event_id(key):
+    """
+    Derive a valid event ID (base32hex, lowercase) from an idempotency key.
+    """
+    digest = hashlib.sha1(key.encode('utf-8')).digest()
+    return base64.b32hexencode(digest).decode('ascii').rstrip('=').lower()
+
+
+def _load_checkpoint(path, source):
+    if path and os.path.exists(path):
+        with open(path, 'r') as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        if checkpoint.get('source') == os.path.abspath(source):
+            return checkpoint
+    return {'source': os.path.abspath(source), 'offset': 0, 'imported': 0, 'skipped': 0, 'failed': 0}
+
+
+def _save_checkpoint(path, checkpoint):
+    with atomic_write(path) as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+
+
+def import_events(source, calendar_id='primary', file_format=None, checkpoint_path=None,
+                  batch_size=BATCH_SIZE, service=None, scheduler=None):
+    """
+    Stream events from a JSONL or ICS file into a calendar.
+    Events are validated, normalized and deduplicated on an idempotency key (iCalUID, id or
+    content hash), then inserted in batch requests. Events with an iCalUID go through
+    events().import(), which the API itself makes idempotent; the others are inserted under an
+    ID derived from their key, so a repeated insert fails with 409 and counts as already imported.
+    After every batch the byte offset reached is saved to the checkpoint file, so an
+    interrupted import resumes where it stopped. Rejected events and unparseable lines are appended to
+    '<checkpoint>.failed.jsonl'.
+    Args:
+        source (str): Path of the .jsonl or .ics file.
+        calendar_id (str): Target calendar (default: 'primary').
+        file_format (str): 'jsonl' or 'ics'; guessed from the file extension when omitted.
+        checkpoint_path (str): Checkpoint file (default: '<source>.checkpoint.json').
+        batch_size (int): Events per batch request.
+        service: Optional Calendar service; defaults to get_calendar_service(SCOPES).
+        scheduler: Optional RequestScheduler; defaults to the process-wide one.
+    Returns: the final checkpoint dict with 'imported', 'skipped' and 'failed' counts.
+    """
+    service = service or get_calendar_service(SCOPES)
+    events = service.events()
+    file_format = file_format or ('ics' if source.lower().endswith(('.ics', '.ical')) else 'jsonl')
+    if file_format == 'ics':
+        reader, parse = read_ics, parse_ics
+    else:
+        reader, parse = read_jsonl, parse_jsonl
+    checkpoint_path = checkpoint_path or source + '.checkpoint.json'
+    checkpoint = _load_checkpoint(checkpoint_path, source)
+
+    # Keys are kept as 64-bit integers so a million-event run stays small in memory
+    seen = set()
+
+    with open(source, 'rb') as stream, open(checkpoint_path + '.failed.jsonl', 'a') as failures:
+        def flush(batch, offset):
+            if batch:
+                requests = [(key, request) for key, (request, _) in batch.items()]
+                result = execute_batched(service, requests, batch_size, scheduler=scheduler,
+                                         ok_statuses=(409,))
+                checkpoint['imported'] += len(result['succeeded'])
+                checkpoint['failed'] += len(result['failed'])
+                for key, error in result['failed'].items():
+                    failures.write(json.dumps({'key': key, 'error': error, 'event': batch[key][1]}) + '\n')
+                failures.flush()
+            checkpoint['offset'] = offset
+            _save_checkpoint(checkpoint_path, checkpoint)
+
+        batch = {}
+        offset = checkpoint['offset']
+        for offset, record in reader(stream, checkpoint['offset']):
+            try:
+                event = normalize_event(parse(record))
+            except (InvalidEvent, ValueError, TypeError) as error:
+                checkpoint['failed'] += 1
+                failure = {'error': str(error)}
+                if isinstance(record, bytes):
+                    failure['line'] = record.decode('utf-8', 'replace').rstrip('\r\n')
+                else:
+                    failure['lines'] = [line.decode('utf-8', 'replace') for line in record]
+                failures.write(json.dumps(failure) + '\n')
+                continue
+
+            key = idempotency_key(event)
+            fingerprint = int.from_bytes(hashlib.sha1(key.encode('utf-8')).digest()[:8], 'big')
+            if fingerprint in seen:
+                checkpoint['skipped'] += 1
+                continue
+            seen.add(fingerprint)
+
+            if key.startswith('uid:'):
+                request = events.import_(calendarId=calendar_id, body=event)
+            else:
+                event['id'] = event.get('id') or _event_id(key)
+                request = events.insert(calendarId=calendar_id, body=event)
+            batch[key] = (request, event)
+
+            if len(batch) == batch_size:
+                flush(batch, offset)
+                batch = {}
+
+        flush(batch, offset)
+
+    return checkpoint
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Import events from a JSONL or ICS file into a calendar.')
+    parser.add_argument('source', help='Path of the .jsonl or .ics file')
+    parser.add_argument('--calendar', default='primary', help="Calendar ID (default: 'primary')")
+    parser.add_argument('--format', choices=('jsonl', 'ics'), help='Input format (default: from extension)')
+    parser.add_argument('--checkpoint', help="Checkpoint file (default: '<source>.checkpoint.json')")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    try:
+        result = import_events(args.source, args.calendar, args.format, args.checkpoint, args.batch_size)
+    except HttpError as error:
+        print(f"An error occurred: {error}")
+        return 1
+
+    print(f"Imported {result['imported']} events, skipped {result['skipped']} duplicates, "
+          f"{result['failed']} failed.")
+    return 1 if result['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import argparse
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from googleapiclient.errors import HttpError
+from calendar_service import get_calendar_service
+from calender_list import iter_calendars
+from event_list import iter_events
+from event_sync import event_time
+
+# Load environment variables from .env file
+load_dotenv()
+
+# OAuth2 scopes for Google Calendar API
+SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
+
+# Number of calendars fetched at the same time
+DEFAULT_CONCURRENCY = 16
+
+# Fields needed to print and order events
+EVENT_FIELDS = ('id', 'summary', 'start', 'end', 'status')
+
+
+def _start_key(event):
+    start_ts = event_time(event.get('start'))[1]
+    return start_ts if start_ts is not None else float('inf')
+
+
+def _fetch_calendar(calendar_id, fields, credentials, root_url, params):
+    # Each worker thread gets its own service, since the HTTP transport is not thread-safe
+    service = get_calendar_service(SCOPES, credentials, root_url)
+    events = list(iter_events(calendar_id, fields=fields, service=service, **params))
+    events.sort(key=_start_key)
+    return events
+
+
+def fetch_calendars_events(calendar_ids=None, max_workers=DEFAULT_CONCURRENCY, fields=EVENT_FIELDS,
+                           credentials=None, root_url=None, **params):
+    """
+    Fetch the events of many calendars in parallel.
+    Wall-clock time follows the slowest calendar rather than the sum of all of them.
+    Args:
+        calendar_ids (list): Calendars to fetch; defaults to every calendar in the user's list.
+        max_workers (int): Maximum number of calendars fetched concurrently.
+        fields (tuple): Event fields to request through partial response.
+        credentials: Optional credentials passed to get_calendar_service().
+        root_url (str): Optional API root, e.g. a local fake server.
+        params: Extra iter_events() arguments such as time_min, time_max or singleEvents.
+    Returns: ({calendar_id: events sorted by start}, {calendar_id: HttpError}).
+    """
+    if calendar_ids is None:
+        service = get_calendar_service(SCOPES, credentials, root_url)
+        calendar_ids = [calendar['id'] for calendar in iter_calendars(fields=('id',), service=service)]
+
+    events_by_calendar = {}
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            calendar_id: executor.submit(_fetch_calendar, calendar_id, fields, credentials, root_url, params)
+            for calendar_id in calendar_ids
+        }
+        for calendar_id, future in futures.items():
+            try:
+                events_by_calendar[calendar_id] = future.result()
+            except HttpError as error:
+                errors[calendar_id] = error
+
+    return events_by_calendar, errors
+
+
+def merge_events(events_by_calendar):
+    """
+    Merge per-calendar event lists (each sorted by start) into one time-ordered stream.
+    Yields (calendar_id, event) pairs.
+    """
+    streams = [
+        ((_start_key(event), calendar_id, event) for event in events)
+        for calendar_id, events in events_by_calendar.items()
+    ]
+    for _, calendar_id, event in heapq.merge(*streams, key=lambda item: (item[0], item[1])):
+        yield calendar_id, event
+
+
+def list_all_events(max_workers=DEFAULT_CONCURRENCY, **params):
+    """
+    Print the events of every calendar in one time-ordered listing.
+    """
+    try:
+        events_by_calendar, errors = fetch_calendars_events(max_workers=max_workers, **params)
+    except HttpError as error:
+        print(f"An error occurred: {error}")
+        return
+
+    for calendar_id, error in errors.items():
+        print(f"An error occurred for calendar {calendar_id}: {error}")
+
+    for calendar_id, event in merge_events(events_by_calendar):
+        start = event.get('start', {})
+        start = start.get('dateTime', start.get('date'))
+        print(f"{start} Calendar ID: {calendar_id}, Event ID: {event['id']}, "
+              f"Summary: {event.get('summary', 'No summary available')}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='List the events of all calendars in parallel.')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument('--time-min', help='Only events ending after this RFC3339 timestamp')
+    parser.add_argument('--time-max', help='Only events starting before this RFC3339 timestamp')
+    args = parser.parse_args()
+    list_all_events(args.concurrency, time_min=args.time_min, time_max=args.time_max)
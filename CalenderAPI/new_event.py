@@ -1,11 +1,7 @@
-import os
-import pickle
 from dotenv import load_dotenv
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.exceptions import RefreshError
 from googleapiclient.errors import HttpError
+from calendar_service import get_calendar_service
+from request_scheduler import execute
 
 # Load environment variables from .env file
 load_dotenv()
@@ -13,42 +9,6 @@ load_dotenv()
 # OAuth2 scopes for Google Calendar API
 SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
 
-def create_oauth2_credentials():
-    """
-    Create OAuth2 credentials using the installed application flow.
-    Save and reuse credentials to avoid re-authenticating each time.
-    """
-    credentials = None
-
-    # Token file to store the user's access and refresh tokens
-    token_file = 'token.pickle'
-
-    # Check if the token file exists and is not empty
-    if os.path.exists(token_file) and os.path.getsize(token_file) > 0:
-        try:
-            with open(token_file, 'rb') as token:
-                credentials = pickle.load(token)
-        except Exception as e:
-            print(f"Error loading token file: {e}")
-            credentials = None
-
-    # If there are no valid credentials available, prompt the user to log in
-    if not credentials or not credentials.valid:
-        if credentials and credentials.expired and credentials.refresh_token:
-            credentials.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                'credentials.json',  # Specify the path to your client secret JSON file
-                scopes=SCOPES
-            )
-            credentials = flow.run_local_server(port=0)
-
-        # Save the credentials for the next run
-        with open(token_file, 'wb') as token:
-            pickle.dump(credentials, token)
-
-    return credentials
-
 def create_calendar_event():
     """
     Create and insert a calendar event.
@@ -56,11 +16,8 @@ def create_calendar_event():
     Returns: Event object, including event id and link.
     """
     try:
-        # Use the create_oauth2_credentials function to obtain credentials
-        credentials = create_oauth2_credentials()
-
-        # Build the Calendar API service using the obtained credentials
-        service = build("calendar", "v3", credentials=credentials)
+        # Reuse the cached Calendar API service instead of rebuilding it on every call
+        service = get_calendar_service(SCOPES)
 
         # Event details
         event = {
@@ -92,7 +49,7 @@ def create_calendar_event():
         }
 
         # Create the event using Calendar API
-        event = service.events().insert(calendarId='primary', body=event).execute()
+        event = execute(service.events().insert(calendarId='primary', body=event))
         print(f'Event created: {event.get("htmlLink")}')
 
         return event
@@ -0,0 +1,188 @@
+import datetime
+import os
+import pickle
+import threading
+from google.auth.transport.requests import Request
+from google_auth_oauthlib.flow import InstalledAppFlow
+from google.auth.exceptions import RefreshError
+from atomic_write import atomic_write
+from request_scheduler import backoff_delay
+from tracing import CREDENTIAL_REFRESH_SECONDS
+
+# Token file to store the user's access and refresh tokens
+TOKEN_FILE = 'token.pickle'
+
+# Client secret JSON file used by the installed application flow
+CLIENT_SECRETS_FILE = 'credentials.json'
+
+# Refresh this long before the access token actually expires
+REFRESH_MARGIN = datetime.timedelta(minutes=5)
+
+# Validated credentials kept in memory, keyed by token file and scope set
+_credentials_cache = {}
+
+# Pending background refresh timers, keyed like _credentials_cache
+_refresh_timers = {}
+
+_lock = threading.RLock()
+
+
+def _cache_key(scopes, token_file):
+    return os.path.abspath(token_file), frozenset(scopes)
+
+
+def _utcnow():
+    # google-auth stores expiry as a naive UTC datetime
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def _load_token(token_file):
+    """
+    Load pickled credentials from disk, or return None if there are none.
+    """
+    if not os.path.exists(token_file) or os.path.getsize(token_file) == 0:
+        return None
+
+    try:
+        with open(token_file, 'rb') as token:
+            return pickle.load(token)
+    except Exception as e:
+        print(f"Error loading token file: {e}")
+        return None
+
+
+def _save_token(credentials, token_file):
+    """
+    Write credentials to disk, readable by the owner only.
+    """
+    with atomic_write(token_file, 'wb', private=True, fsync=True) as token:
+        pickle.dump(credentials, token)
+
+
+def _run_consent_flow(scopes):
+    flow = InstalledAppFlow.from_client_secrets_file(
+        CLIENT_SECRETS_FILE,
+        scopes=scopes
+    )
+    with CREDENTIAL_REFRESH_SECONDS.time('consent'):
+        return flow.run_local_server(port=0)
+
+
+def _needs_refresh(credentials):
+    """
+    True when the access token is expired or will expire within REFRESH_MARGIN.
+    """
+    if not credentials.token:
+        return True
+    if credentials.expiry is None:
+        return False
+    return _utcnow() >= credentials.expiry - REFRESH_MARGIN
+
+
+def _schedule_refresh(key, credentials, token_file, failures=0):
+    """
+    Arrange for the credentials to be refreshed in the background shortly before they expire,
+    or, after failed attempts, again after a jittered exponential backoff.
+    """
+    timer = _refresh_timers.pop(key, None)
+    if timer:
+        timer.cancel()
+
+    if credentials.expiry is None or not credentials.refresh_token:
+        return
+
+    if failures:
+        delay = backoff_delay(failures - 1)
+    else:
+        delay = (credentials.expiry - REFRESH_MARGIN - _utcnow()).total_seconds()
+    timer = threading.Timer(max(delay, 0), _background_refresh, args=(key, token_file, failures))
+    timer.daemon = True
+    _refresh_timers[key] = timer
+    timer.start()
+
+
+def _background_refresh(key, token_file, failures=0):
+    credentials = _credentials_cache.get(key)
+    if credentials is None:
+        return
+    # The refresh is a network round trip, so it runs without the lock; callers keep using the
+    # current token, which is still valid for up to REFRESH_MARGIN
+    try:
+        with CREDENTIAL_REFRESH_SECONDS.time('background'):
+            credentials.refresh(Request())
+    except RefreshError as e:
+        # The grant was revoked or expired; drop the entry so the next caller goes through the full login path
+        print(f"Error refreshing credentials: {e}")
+        with _lock:
+            if _credentials_cache.get(key) is credentials:
+                _credentials_cache.pop(key, None)
+                _refresh_timers.pop(key, None)
+        return
+    except Exception as e:
+        # A network error (TransportError) or the like; try again instead of letting the token lapse
+        print(f"Error refreshing credentials, retrying: {e}")
+        with _lock:
+            if _credentials_cache.get(key) is credentials:
+                _schedule_refresh(key, credentials, token_file, failures + 1)
+        return
+
+    with _lock:
+        # Skip the save if the cache was cleared or replaced during the refresh
+        if _credentials_cache.get(key) is credentials:
+            _save_token(credentials, token_file)
+            _schedule_refresh(key, credentials, token_file)
+
+
+def create_oauth2_credentials(scopes, token_file=TOKEN_FILE):
+    """
+    Return OAuth2 credentials for the given scopes.
+    The token file is read once per token file and scope set; afterwards the validated credentials are
+    served from memory and refreshed in the background before they expire.
+    Args:
+        scopes (list): OAuth2 scopes the credentials are requested for.
+        token_file (str): Path of the pickled token (default: 'token.pickle').
+    """
+    key = _cache_key(scopes, token_file)
+
+    # Fast path without the lock; near-expiry tokens are left to the background refresher
+    credentials = _credentials_cache.get(key)
+    if credentials is not None and credentials.valid:
+        return credentials
+
+    with _lock:
+        credentials = _credentials_cache.get(key)
+        if credentials is not None and credentials.valid:
+            return credentials
+
+        if credentials is None:
+            credentials = _load_token(token_file)
+
+        # If there are no valid credentials available, refresh or prompt the user to log in
+        if not credentials or _needs_refresh(credentials):
+            if credentials and credentials.refresh_token:
+                try:
+                    with CREDENTIAL_REFRESH_SECONDS.time('refresh'):
+                        credentials.refresh(Request())
+                except RefreshError as e:
+                    print(f"Error refreshing credentials: {e}")
+                    credentials = _run_consent_flow(scopes)
+            else:
+                credentials = _run_consent_flow(scopes)
+
+            # Save the credentials for the next run
+            _save_token(credentials, token_file)
+
+        _credentials_cache[key] = credentials
+        _schedule_refresh(key, credentials, token_file)
+        return credentials
+
+
+def clear_credentials_cache():
+    """
+    Forget all in-memory credentials and cancel pending background refreshes.
+    """
+    with _lock:
+        for timer in _refresh_timers.values():
+            timer.cancel()
+        _refresh_timers.clear()
+        _credentials_cache.clear()
@@ -0,0 +1,304 @@
+import datetime
+import heapq
+import re
+from zoneinfo import ZoneInfo
+from dateutil.rrule import rrulestr, rruleset
+from calendar_service import get_calendar_service
+from event_sync import event_time
+from request_scheduler import execute
+
+# OAuth2 scopes for Google Calendar API
+SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
+
+UTC = datetime.timezone.utc
+
+
+def _as_utc(value):
+    """
+    Accept epoch seconds or a datetime (naive values are taken as UTC) and return an aware UTC datetime.
+    """
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            return value.replace(tzinfo=UTC)
+        return value.astimezone(UTC)
+    return datetime.datetime.fromtimestamp(float(value), UTC)
+
+
+def _parse_datetime(text):
+    return datetime.datetime.fromisoformat(text.replace('Z', '+00:00'))
+
+
+class _Series:
+    """
+    The timing of a recurring master event: first start, duration and rule set.
+    All-day series work on naive dates, which are taken as UTC like event_time() does.
+    """
+
+    def __init__(self, master):
+        start = master['start']
+        end = master.get('end') or start
+        self.all_day = 'dateTime' not in start
+
+        if self.all_day:
+            self.tz = None
+            self.dtstart = datetime.datetime.fromisoformat(start['date'])
+            dtend = datetime.datetime.fromisoformat(end.get('date', start['date']))
+        else:
+            # Expand in the event's own zone so occurrences keep their wall-clock time across DST
+            self.tz = ZoneInfo(start['timeZone']) if start.get('timeZone') else None
+            self.dtstart = _parse_datetime(start['dateTime'])
+            if self.tz is not None:
+                self.dtstart = self.dtstart.astimezone(self.tz)
+            dtend = _parse_datetime(end.get('dateTime', start['dateTime']))
+            if self.tz is not None:
+                dtend = dtend.astimezone(self.tz)
+        self.duration = dtend - self.dtstart
+
+        self.rules = rruleset()
+        self.rules.rdate(self.dtstart)
+        for line in master.get('recurrence', []):
+            name, _, value = line.strip().partition(':')
+            name, *params = name.split(';')
+            name = name.upper()
+            if name == 'RRULE':
+                self.rules.rrule(rrulestr(self._fix_until(value), dtstart=self.dtstart))
+            elif name == 'EXRULE':
+                self.rules.exrule(rrulestr(self._fix_until(value), dtstart=self.dtstart))
+            elif name == 'RDATE':
+                for moment in self._parse_dates(params, value):
+                    self.rules.rdate(moment)
+            elif name == 'EXDATE':
+                for moment in self._parse_dates(params, value):
+                    self.rules.exdate(moment)
+
+    def _fix_until(self, rule):
+        """
+        dateutil needs UNTIL in UTC for timed series; the API also accepts dates and local times.
+        """
+        if self.all_day:
+            return rule
+
+        def to_utc(match):
+            until = match.group(1)
+            if until.endswith('Z'):
+                return match.group(0)
+            if 'T' in until:
+                moment = datetime.datetime.strptime(until, '%Y%m%dT%H%M%S')
+            else:
+                # A date-only UNTIL includes the whole day
+                moment = datetime.datetime.strptime(until, '%Y%m%d').replace(hour=23, minute=59, second=59)
+            moment = moment.replace(tzinfo=self.dtstart.tzinfo).astimezone(UTC)
+            return 'UNTIL=' + moment.strftime('%Y%m%dT%H%M%SZ')
+
+        return re.sub(r'UNTIL=([0-9TZ]+)', to_utc, rule, flags=re.IGNORECASE)
+
+    def _parse_dates(self, params, value):
+        """
+        Parse an RDATE/EXDATE value list, honouring TZID and VALUE=DATE parameters.
+        """
+        tz = self.dtstart.tzinfo
+        for param in params:
+            key, _, param_value = param.partition('=')
+            if key.upper() == 'TZID':
+                tz = ZoneInfo(param_value)
+
+        for text in value.split(','):
+            text = text.strip()
+            if 'T' not in text:
+                moment = datetime.datetime.strptime(text, '%Y%m%d')
+                if not self.all_day:
+                    # A bare date on a timed series means the occurrence on that day
+                    moment = datetime.datetime.combine(moment.date(), self.dtstart.timetz())
+            elif text.endswith('Z'):
+                moment = datetime.datetime.strptime(text, '%Y%m%dT%H%M%SZ').replace(tzinfo=UTC)
+            else:
+                moment = datetime.datetime.strptime(text, '%Y%m%dT%H%M%S').replace(tzinfo=tz)
+
+            if self.all_day:
+                yield moment.replace(tzinfo=None) if moment.tzinfo is None else moment.astimezone(UTC).replace(tzinfo=None)
+            else:
+                yield moment.astimezone(self.dtstart.tzinfo)
+
+    def to_local(self, moment):
+        """
+        Convert an aware UTC datetime into the series' comparison space.
+        """
+        if self.all_day:
+            return moment.astimezone(UTC).replace(tzinfo=None)
+        return moment.astimezone(self.tz or self.dtstart.tzinfo)
+
+    def key(self, occurrence):
+        """
+        Return the key used to match an occurrence with an exception's originalStartTime.
+        """
+        if self.all_day:
+            return occurrence.date().isoformat()
+        return occurrence.astimezone(UTC).timestamp()
+
+    def occurrences(self, window_start, window_end):
+        """
+        Lazily yield occurrence starts whose [start, start + duration) overlaps the window.
+        """
+        start = self.to_local(window_start)
+        last = self.to_local(window_end)
+        for occurrence in self.rules.xafter(start - self.duration, inc=True):
+            if occurrence >= last:
+                return
+            # Zero-length events count when they start inside the window
+            if occurrence + self.duration > start or occurrence >= start:
+                yield occurrence
+
+
+def _when(series, moment):
+    if series.all_day:
+        return {'date': moment.date().isoformat()}
+    when = {'dateTime': moment.isoformat()}
+    if series.tz is not None:
+        when['timeZone'] = series.tz.key
+    return when
+
+
+def _instance(master, series, occurrence):
+    """
+    Build the instance the API would return for one occurrence of a master event.
+    """
+    instance = {key: value for key, value in master.items() if key != 'recurrence'}
+    if series.all_day:
+        suffix = occurrence.strftime('%Y%m%d')
+    else:
+        suffix = occurrence.astimezone(UTC).strftime('%Y%m%dT%H%M%SZ')
+    instance['id'] = f"{master['id']}_{suffix}"
+    instance['recurringEventId'] = master['id']
+    instance['originalStartTime'] = _when(series, occurrence)
+    instance['start'] = _when(series, occurrence)
+    instance['end'] = _when(series, occurrence + series.duration)
+    return instance
+
+
+def _original_key(series, exception):
+    original = exception.get('originalStartTime', {})
+    if 'date' in original:
+        return original['date']
+    if 'dateTime' in original:
+        return _parse_datetime(original['dateTime']).timestamp()
+    return None
+
+
+def _overlaps(event, window_start, window_end):
+    start_ts = event_time(event.get('start'))[1]
+    end_ts = event_time(event.get('end'))[1]
+    if start_ts is None:
+        return False
+    end_ts = end_ts if end_ts is not None else start_ts
+    return start_ts < window_end.timestamp() and (end_ts > window_start.timestamp() or start_ts >= window_start.timestamp())
+
+
+def expand_event(master, window_start, window_end, exceptions=()):
+    """
+    Lazily yield the concrete instances of a recurring event that overlap [window_start, window_end).
+    RRULE, EXRULE, RDATE and EXDATE lines are honoured, occurrences keep their wall-clock time in the
+    event's timeZone, and per-instance exceptions (events whose recurringEventId is the master's id)
+    replace or cancel the occurrence they were created from. Instances are yielded in start order.
+    Args:
+        master (dict): Recurring event with a 'recurrence' list.
+        window_start, window_end: Aware datetimes, naive UTC datetimes or epoch seconds.
+        exceptions (iterable): Modified or cancelled instances of this master.
+    """
+    window_start, window_end = _as_utc(window_start), _as_utc(window_end)
+    if not master.get('recurrence'):
+        if master.get('status') != 'cancelled' and _overlaps(master, window_start, window_end):
+            yield master
+        return
+
+    series = _Series(master)
+    overrides = {}
+    for exception in exceptions:
+        key = _original_key(series, exception)
+        if key is not None:
+            overrides[key] = exception
+
+    def generated():
+        for occurrence in series.occurrences(window_start, window_end):
+            if series.key(occurrence) in overrides:
+                continue
+            instance = _instance(master, series, occurrence)
+            yield event_time(instance['start'])[1], instance['id'], instance
+
+    # Modified instances are yielded where they now are, which may differ from where they were generated
+    moved = sorted(
+        (event_time(exception['start'])[1], exception['id'], exception)
+        for exception in overrides.values()
+        if exception.get('status') != 'cancelled' and _overlaps(exception, window_start, window_end)
+    )
+    for _, _, instance in heapq.merge(generated(), moved):
+        yield instance
+
+
+def expand_events(events, window_start, window_end):
+    """
+    Expand a mix of single events, recurring masters and their exceptions (as stored by event_sync)
+    into concrete instances overlapping [window_start, window_end), in start order.
+    """
+    masters = []
+    exceptions = {}
+    for event in events:
+        if event.get('recurringEventId'):
+            exceptions.setdefault(event['recurringEventId'], []).append(event)
+        else:
+            masters.append(event)
+
+    known = {event['id'] for event in masters}
+    streams = [
+        ((event_time(instance['start'])[1], instance['id'], instance)
+         for instance in expand_event(master, window_start, window_end, exceptions.get(master['id'], ())))
+        for master in masters
+    ]
+    # Exceptions whose master is not in the input are passed through as plain events
+    orphans = [event for master_id, group in exceptions.items() if master_id not in known for event in group]
+    streams.append(
+        (event_time(event['start'])[1], event['id'], event)
+        for event in sorted(orphans, key=lambda event: event_time(event.get('start'))[1] or 0)
+        if event.get('status') != 'cancelled' and _overlaps(event, _as_utc(window_start), _as_utc(window_end))
+    )
+    for _, _, instance in heapq.merge(*streams):
+        yield instance
+
+
+def validate_expansion(calendar_id, event_id, window_start, window_end, exceptions=(), service=None):
+    """
+    Compare the local expansion of a recurring event with the API's own events().instances().
+    Args:
+        calendar_id (str): Calendar holding the event.
+        event_id (str): ID of the recurring master event.
+        window_start, window_end: Window to compare.
+        exceptions (iterable): Known exceptions of the event, e.g. from the local EventStore.
+        service: Optional Calendar service; defaults to get_calendar_service(SCOPES).
+    Returns: dict with 'missing' (IDs only the API returned), 'extra' (IDs only expanded locally)
+             and 'moved' (IDs whose start time differs).
+    """
+    window_start, window_end = _as_utc(window_start), _as_utc(window_end)
+    events = (service or get_calendar_service(SCOPES)).events()
+    master = execute(events.get(calendarId=calendar_id, eventId=event_id))
+
+    remote = {}
+    page_token = None
+    while True:
+        instances_result = execute(events.instances(
+            calendarId=calendar_id, eventId=event_id, pageToken=page_token,
+            timeMin=window_start.isoformat(), timeMax=window_end.isoformat(),
+        ))
+        for instance in instances_result.get('items', []):
+            remote[instance['id']] = event_time(instance['start'])[1]
+        page_token = instances_result.get('nextPageToken')
+        if not page_token:
+            break
+
+    local = {
+        instance['id']: event_time(instance['start'])[1]
+        for instance in expand_event(master, window_start, window_end, exceptions)
+    }
+    return {
+        'missing': sorted(set(remote) - set(local)),
+        'extra': sorted(set(local) - set(remote)),
+        'moved': sorted(key for key in set(local) & set(remote) if local[key] != remote[key]),
+    }
@@ -0,0 +1,208 @@
+import json
+import os
+import random
+import threading
+import time
+from googleapiclient.errors import HttpError
+from tracing import API_CALL_SECONDS, API_RETRIES, THROTTLE_SECONDS, operation_name
+
+# Default budgets in requests per second; Calendar allows roughly 600/min per user
+USER_RATE = float(os.environ.get('CALENDAR_USER_QPS', 10))
+PROJECT_RATE = float(os.environ.get('CALENDAR_PROJECT_QPS', 150))
+
+# How many times a request is retried before its error is raised
+MAX_RETRIES = 5
+
+# Statuses worth retrying; 403 is only retried for rate-limit reasons
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+
+# Server errors may come after the request took effect, so they are only retried for these
+# methods, or for inserts whose body names the resource (an 'id' or 'iCalUID')
+IDEMPOTENT_METHODS = ('GET', 'PUT', 'DELETE')
+SERVER_ERRORS = {500, 502, 503, 504}
+
+
+def is_idempotent(request):
+    """
+    Return True if sending the request twice has the same effect as sending it once.
+    """
+    method = getattr(request, 'method', None)
+    if method in IDEMPOTENT_METHODS:
+        return True
+    if method != 'POST' or not getattr(request, 'body', None):
+        return False
+    try:
+        body = json.loads(request.body)
+    except ValueError:
+        return False
+    return isinstance(body, dict) and bool(body.get('id') or body.get('iCalUID'))
+
+
+def is_retryable(error, request=None):
+    """
+    Return True if an HttpError is transient and the request should be retried.
+    A 5xx is only retried when the request is given and idempotent; 429 and rate-limit 403s
+    are rejected before the request is processed, so they are always retried.
+    """
+    status = error.resp.status
+    if status in SERVER_ERRORS:
+        return request is not None and is_idempotent(request)
+    if status in RETRYABLE_STATUSES:
+        return True
+    if status == 403:
+        content = error.content.decode('utf-8', 'replace') if error.content else ''
+        return any(reason in content for reason in RATE_LIMIT_REASONS)
+    return False
+
+
+def backoff_delay(attempt, base=1.0, cap=32.0):
+    """
+    Full-jitter exponential backoff: a random delay in [0, min(cap, base * 2**attempt)].
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that refills at `rate` tokens per second up to `capacity`.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, cost=1):
+        """
+        Take `cost` tokens, going into debt if needed, and return how long the caller must wait.
+        Reserving up front keeps waiters in FIFO order without holding the lock while sleeping.
+        """
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens -= cost
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class RequestScheduler:
+    """
+    Paces Calendar API requests through per-user and per-project token buckets and
+    retries transient failures with jittered exponential backoff.
+    Args:
+        user_rate (float): Requests per second allowed for each user.
+        project_rate (float): Requests per second allowed for the whole project.
+        max_retries (int): Retries for retryable errors before giving up.
+    """
+
+    def __init__(self, user_rate=USER_RATE, project_rate=PROJECT_RATE, max_retries=MAX_RETRIES):
+        self.user_rate = user_rate
+        self.project_bucket = TokenBucket(project_rate)
+        self.user_buckets = {}
+        self.max_retries = max_retries
+        self.lock = threading.Lock()
+        self._stats = {
+            'requests': 0,
+            'throttled': 0,
+            'throttle_seconds': 0.0,
+            'retries': 0,
+            'failures': 0,
+            'queue_depth': 0,
+            'max_queue_depth': 0,
+        }
+
+    def _user_bucket(self, user):
+        with self.lock:
+            bucket = self.user_buckets.get(user)
+            if bucket is None:
+                bucket = self.user_buckets[user] = TokenBucket(self.user_rate)
+            return bucket
+
+    def _count(self, name, amount=1):
+        with self.lock:
+            self._stats[name] += amount
+
+    def acquire(self, user='me', cost=1):
+        """
+        Block until both the user's and the project's budget allow `cost` more requests.
+        """
+        wait = max(self._user_bucket(user).reserve(cost), self.project_bucket.reserve(cost))
+        if wait <= 0:
+            return
+
+        with self.lock:
+            self._stats['throttled'] += 1
+            self._stats['throttle_seconds'] += wait
+            self._stats['queue_depth'] += 1
+            self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], self._stats['queue_depth'])
+        THROTTLE_SECONDS.inc(amount=wait)
+        try:
+            time.sleep(wait)
+        finally:
+            self._count('queue_depth', -1)
+
+    def execute(self, request, user='me', cost=1, max_retries=None):
+        """
+        Execute an HttpRequest or BatchHttpRequest within the budget, retrying transient errors.
+        Args:
+            request: Anything with an execute() method.
+            user (str): Key of the per-user budget (default: 'me').
+            cost (int): Number of API calls the request counts as, e.g. the size of a batch.
+            max_retries (int): Overrides the scheduler's retries, e.g. 0 where the caller retries itself.
+        """
+        operation = operation_name(request)
+        max_retries = self.max_retries if max_retries is None else max_retries
+        for attempt in range(max_retries + 1):
+            self.acquire(user, cost)
+            self._count('requests')
+            start = time.perf_counter()
+            try:
+                response = request.execute()
+            except HttpError as error:
+                API_CALL_SECONDS.observe(time.perf_counter() - start, operation, str(error.resp.status))
+                if attempt == max_retries or not is_retryable(error, request):
+                    self._count('failures')
+                    raise
+                self._count('retries')
+                API_RETRIES.inc(operation)
+                time.sleep(backoff_delay(attempt))
+            else:
+                API_CALL_SECONDS.observe(time.perf_counter() - start, operation, 'ok')
+                return response
+
+    def stats(self):
+        """
+        Return a snapshot of request, throttle, retry and queue-depth counters.
+        """
+        with self.lock:
+            return dict(self._stats)
+
+
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+
+def get_scheduler():
+    """
+    Return the process-wide scheduler shared by every CalenderAPI operation.
+    """
+    global _default_scheduler
+    if _default_scheduler is None:
+        with _default_lock:
+            if _default_scheduler is None:
+                _default_scheduler = RequestScheduler()
+    return _default_scheduler
+
+
+def execute(request, user='me', cost=1):
+    """
+    Execute a request through the process-wide scheduler.
+    """
+    return get_scheduler().execute(request, user, cost)
@@ -1,11 +1,7 @@
-import os
-import pickle
 from dotenv import load_dotenv
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.exceptions import RefreshError
 from googleapiclient.errors import HttpError
+from calendar_service import get_calendar_service
+from request_scheduler import execute
 
 # Load environment variables from .env file
 load_dotenv()
@@ -13,52 +9,13 @@ load_dotenv()
 # OAuth2 scopes for Google Calendar API
 SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
 
-def create_oauth2_credentials():
-    """
-    Create OAuth2 credentials using the installed application flow.
-    Save and reuse credentials to avoid re-authenticating each time.
-    """
-    credentials = None
-
-    # Token file to store the user's access and refresh tokens
-    token_file = 'token.pickle'
-
-    # Check if the token file exists and is not empty
-    if os.path.exists(token_file) and os.path.getsize(token_file) > 0:
-        try:
-            with open(token_file, 'rb') as token:
-                credentials = pickle.load(token)
-        except Exception as e:
-            print(f"Error loading token file: {e}")
-            credentials = None
-
-    # If there are no valid credentials available, prompt the user to log in
-    if not credentials or not credentials.valid:
-        if credentials and credentials.expired and credentials.refresh_token:
-            credentials.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                'credentials.json',  # Specify the path to your client secret JSON file
-                scopes=SCOPES
-            )
-            credentials = flow.run_local_server(port=0)
-
-        # Save the credentials for the next run
-        with open(token_file, 'wb') as token:
-            pickle.dump(credentials, token)
-
-    return credentials
-
 def create_secondary_calendar():
     """
     Create a secondary calendar and return its calendar ID.
     """
     try:
-        # Use the create_oauth2_credentials function to obtain credentials
-        credentials = create_oauth2_credentials()
-
-        # Build the Calendar API service using the obtained credentials
-        service = build("calendar", "v3", credentials=credentials)
+        # Reuse the cached Calendar API service instead of rebuilding it on every call
+        service = get_calendar_service(SCOPES)
 
         # Define the secondary calendar details
         calendar = {
@@ -67,7 +24,7 @@ def create_secondary_calendar():
         }
 
         # Create the secondary calendar using Calendar API
-        created_calendar = service.calendars().insert(body=calendar).execute()
+        created_calendar = execute(service.calendars().insert(body=calendar))
 
         print(f'Secondary calendar created: {created_calendar.get("id")}')
         return created_calendar.get("id")
@@ -81,11 +38,8 @@ def add_event_to_calendar(calendar_id):
     Add an event to the specified calendar.
     """
     try:
-        # Use the create_oauth2_credentials function to obtain credentials
-        credentials = create_oauth2_credentials()
-
-        # Build the Calendar API service using the obtained credentials
-        service = build("calendar", "v3", credentials=credentials)
+        # Reuse the cached Calendar API service instead of rebuilding it on every call
+        service = get_calendar_service(SCOPES)
 
         # Event details
         event = {
@@ -117,7 +71,7 @@ def add_event_to_calendar(calendar_id):
         }
 
         # Create the event using Calendar API
-        event = service.events().insert(calendarId=calendar_id, body=event).execute()
+        event = execute(service.events().insert(calendarId=calendar_id, body=event))
         print(f'Event created: {event.get("htmlLink")}')
 
         return event
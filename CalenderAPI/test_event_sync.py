@@ -0,0 +1,36 @@
+from event_sync import EventStore
+
+
+def _event(event_id, **fields):
+    return dict({'id': event_id, 'start': {'date': '2030-01-01'}, 'end': {'date': '2030-01-02'}}, **fields)
+
+
+def test_cancelled_recurring_event_takes_its_exceptions_along():
+    store = EventStore(':memory:')
+    store.apply_page('primary', [
+        _event('weekly', recurrence=['RRULE:FREQ=WEEKLY']),
+        _event('weekly_20300108', recurringEventId='weekly', summary='Moved'),
+        _event('other'),
+    ])
+
+    assert store.apply_page('primary', [{'id': 'weekly', 'status': 'cancelled'}]) == (0, 1)
+    assert [event['id'] for event in store.events('primary')] == ['other']
+
+
+def test_cancelled_exception_is_kept_to_hide_its_occurrence():
+    store = EventStore(':memory:')
+    store.apply_page('primary', [_event('weekly', recurrence=['RRULE:FREQ=WEEKLY'])])
+
+    cancelled = _event('weekly_20300108', recurringEventId='weekly', status='cancelled',
+                       start={'date': '2030-01-08'}, end={'date': '2030-01-09'})
+    assert store.apply_page('primary', [cancelled]) == (0, 1)
+    assert [event.get('status') for event in store.events('primary')] == [None, 'cancelled']
+
+
+def test_exceptions_are_deleted_through_an_index():
+    store = EventStore(':memory:')
+    plan = store.connection.execute(
+        "EXPLAIN QUERY PLAN DELETE FROM events WHERE calendar_id = ? AND json_extract(data, '$.recurringEventId') = ?",
+        ('primary', 'weekly'),
+    ).fetchall()
+    assert 'USING INDEX events_by_master' in plan[0][-1]
@@ -0,0 +1,98 @@
+import json
+import pytest
+from google.auth.credentials import AnonymousCredentials
+import request_scheduler
+from calendar_service import get_calendar_service
+from fake_calendar_server import FakeCalendarServer
+from import_events import import_events
+from request_scheduler import RequestScheduler
+
+ICS = b"""BEGIN:VCALENDAR
+VERSION:2.0
+BEGIN:VEVENT
+UID:first@example.com
+SUMMARY:First
+DTSTART:20300101T090000Z
+DTEND:20300101T100000Z
+END:VEVENT
+BEGIN:VEVENT
+UID:broken@example.com
+SUMMARY:Broken
+DTSTART:2024bad
+END:VEVENT
+BEGIN:VEVENT
+UID:bad-bytes@example.com
+SUMMARY:Caf\xe9
+DTSTART:20300102T090000Z
+END:VEVENT
+BEGIN:VEVENT
+UID:last@example.com
+SUMMARY:Last
+DTSTART;VALUE=DATE:20300103
+BEGIN:VALARM
+TRIGGER:-PT15M
+END:VALARM
+END:VEVENT
+END:VCALENDAR
+"""
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(request_scheduler, '_default_scheduler', RequestScheduler(1e9, 1e9))
+    with FakeCalendarServer() as server:
+        calendar_service = get_calendar_service(['https://www.googleapis.com/auth/calendar'],
+                                                AnonymousCredentials(), server.root_url)
+        calendar_service.backend = server.backend
+        yield calendar_service
+
+
+def _summaries(service):
+    return sorted(event.get('summary') for event in service.backend.events['primary'].values())
+
+
+def _failures(source):
+    with open(str(source) + '.checkpoint.json.failed.jsonl') as failures:
+        return [json.loads(line) for line in failures]
+
+
+def test_malformed_vevent_is_skipped(service, tmp_path):
+    source = tmp_path / 'events.ics'
+    source.write_bytes(ICS)
+
+    result = import_events(str(source), service=service)
+
+    assert (result['imported'], result['failed']) == (2, 2)
+    assert _summaries(service) == ['First', 'Last']
+    failures = _failures(source)
+    assert [failure['lines'][0] for failure in failures] == ['UID:broken@example.com', 'UID:bad-bytes@example.com']
+    assert result['offset'] == ICS.index(b'END:VCALENDAR')
+
+
+def test_resume_moves_past_a_malformed_vevent(service, tmp_path):
+    source = tmp_path / 'events.ics'
+    source.write_bytes(ICS)
+    import_events(str(source), service=service)
+
+    result = import_events(str(source), service=service)
+
+    assert (result['imported'], result['failed']) == (2, 2)
+    assert len(_failures(source)) == 2
+
+
+def test_malformed_jsonl_lines_are_skipped(service, tmp_path):
+    source = tmp_path / 'events.jsonl'
+    lines = [
+        json.dumps({'summary': 'First', 'start': {'date': '2030-01-01'}}),
+        '{not json',
+        '[1, 2]',
+        json.dumps({'summary': 'No start'}),
+        json.dumps({'summary': 'Last', 'start': {'date': '2030-01-03'}}),
+    ]
+    source.write_text('\n'.join(lines) + '\n')
+
+    result = import_events(str(source), service=service)
+
+    assert (result['imported'], result['failed']) == (2, 3)
+    assert _summaries(service) == ['First', 'Last']
+    assert [failure['line'] for failure in _failures(source)] == lines[1:4]
@@ -0,0 +1,105 @@
+import datetime
+import pickle
+import threading
+import pytest
+from google.auth.exceptions import TransportError
+import oauth_credentials
+from oauth_credentials import clear_credentials_cache, create_oauth2_credentials
+
+SCOPES = ['https://www.googleapis.com/auth/calendar']
+
+
+class _Credentials:
+    """
+    Stands in for google.oauth2 credentials; refresh() fails with a TransportError `failures` times.
+    """
+
+    def __init__(self, name, failures=0):
+        self.name = name
+        self.token = 'token'
+        self.refresh_token = 'refresh-token'
+        self.expiry = oauth_credentials._utcnow() + datetime.timedelta(hours=1)
+        self.failures = failures
+        self.refreshes = 0
+        self.during_refresh = None
+
+    @property
+    def valid(self):
+        return oauth_credentials._utcnow() < self.expiry
+
+    def refresh(self, request):
+        self.refreshes += 1
+        if self.during_refresh:
+            self.during_refresh()
+        if self.refreshes <= self.failures:
+            raise TransportError('connection reset')
+        self.token = f'token-{self.refreshes}'
+        self.expiry = oauth_credentials._utcnow() + datetime.timedelta(hours=1)
+
+
+def _write_token(path, credentials):
+    with open(path, 'wb') as token:
+        pickle.dump(credentials, token)
+    return str(path)
+
+
+class _Saves(list):
+    """
+    Records (credentials name, token file) for every save and sets done on each one.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.done = threading.Event()
+
+    def __call__(self, credentials, token_file):
+        self.append((credentials.name, token_file))
+        self.done.set()
+
+
+@pytest.fixture(autouse=True)
+def saved(monkeypatch):
+    saves = _Saves()
+    monkeypatch.setattr(oauth_credentials, '_save_token', saves)
+    monkeypatch.setattr(oauth_credentials, 'backoff_delay', lambda attempt: 0)
+    yield saves
+    clear_credentials_cache()
+
+
+def test_credentials_are_cached_per_token_file(tmp_path):
+    first = _write_token(tmp_path / 'first.pickle', _Credentials('first'))
+    second = _write_token(tmp_path / 'second.pickle', _Credentials('second'))
+
+    assert create_oauth2_credentials(SCOPES, first).name == 'first'
+    assert create_oauth2_credentials(SCOPES, second).name == 'second'
+    assert create_oauth2_credentials(SCOPES, first).name == 'first'
+
+
+def test_background_refresh_retries_after_a_transport_error(tmp_path, saved):
+    token_file = _write_token(tmp_path / 'token.pickle', _Credentials('token', failures=2))
+    credentials = create_oauth2_credentials(SCOPES, token_file)
+
+    oauth_credentials._background_refresh(oauth_credentials._cache_key(SCOPES, token_file), token_file)
+
+    assert saved.done.wait(10)
+    assert (credentials.refreshes, credentials.token) == (3, 'token-3')
+    assert saved == [('token', token_file)]
+    assert create_oauth2_credentials(SCOPES, token_file) is credentials
+
+
+def test_background_refresh_does_not_block_other_callers(tmp_path, saved):
+    other = _write_token(tmp_path / 'other.pickle', _Credentials('other'))
+    token_file = _write_token(tmp_path / 'token.pickle', _Credentials('token'))
+    credentials = create_oauth2_credentials(SCOPES, token_file)
+    loaded = []
+
+    def load_other():
+        caller = threading.Thread(target=lambda: loaded.append(create_oauth2_credentials(SCOPES, other).name))
+        caller.start()
+        caller.join(5)
+
+    credentials.during_refresh = load_other
+    oauth_credentials._background_refresh(oauth_credentials._cache_key(SCOPES, token_file), token_file)
+
+    assert loaded == ['other']
+    assert credentials.token == 'token-1'
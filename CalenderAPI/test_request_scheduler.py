@@ -0,0 +1,82 @@
+import json
+import pytest
+from google.auth.credentials import AnonymousCredentials
+from googleapiclient.errors import HttpError
+from httplib2 import Response
+import batch_runner
+import request_scheduler
+from batch_runner import execute_batched
+from calendar_service import get_calendar_service
+from fake_calendar_server import FakeCalendarBackend, FakeCalendarServer
+from request_scheduler import RequestScheduler
+
+
+class _Request:
+    """
+    Stands in for an HttpRequest that fails with `status` a given number of times.
+    """
+
+    def __init__(self, method, body=None, status=503, failures=1):
+        self.method = method
+        self.body = json.dumps(body) if body is not None else None
+        self.status = status
+        self.failures = failures
+        self.calls = 0
+
+    def execute(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise HttpError(Response({'status': self.status}), b'{}')
+        return {'ok': True}
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(request_scheduler, 'backoff_delay', lambda attempt: 0)
+    monkeypatch.setattr(batch_runner, 'backoff_delay', lambda attempt: 0)
+
+
+@pytest.mark.parametrize('method, body', [
+    ('GET', None),
+    ('PUT', {'summary': 'Moved'}),
+    ('DELETE', None),
+    ('POST', {'id': 'abc123', 'summary': 'Insert with an id'}),
+    ('POST', {'iCalUID': 'x@example.com', 'summary': 'Import'}),
+])
+def test_server_errors_are_retried_for_idempotent_requests(method, body):
+    request = _Request(method, body)
+    assert RequestScheduler(1e9, 1e9).execute(request) == {'ok': True}
+    assert request.calls == 2
+
+
+def test_server_errors_are_not_retried_for_plain_inserts():
+    request = _Request('POST', {'summary': 'Insert without an id'})
+    with pytest.raises(HttpError):
+        RequestScheduler(1e9, 1e9).execute(request)
+    assert request.calls == 1
+
+
+def test_rate_limits_are_retried_for_every_method():
+    request = _Request('POST', {'summary': 'Insert without an id'}, status=429)
+    assert RequestScheduler(1e9, 1e9).execute(request) == {'ok': True}
+    assert request.calls == 2
+
+
+def test_failed_batches_are_retried_in_one_layer():
+    class CountingScheduler(RequestScheduler):
+        sent = 0
+
+        def execute(self, request, user='me', cost=1, max_retries=None):
+            CountingScheduler.sent += 1
+            return super().execute(request, user, cost, max_retries)
+
+    with FakeCalendarServer(backend=FakeCalendarBackend(error_rate=1.0)) as server:
+        service = get_calendar_service(['https://www.googleapis.com/auth/calendar'],
+                                       AnonymousCredentials(), server.root_url)
+        events = service.events()
+        requests = [(str(number), events.get(calendarId='primary', eventId=f'event{number}'))
+                    for number in range(3)]
+        result = execute_batched(service, requests, max_retries=2, scheduler=CountingScheduler(1e9, 1e9))
+
+    assert CountingScheduler.sent == 3
+    assert len(result['failed']) == 3
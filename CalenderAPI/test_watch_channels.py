@@ -0,0 +1,219 @@
+import datetime
+import queue
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from google.auth.credentials import AnonymousCredentials
+import request_scheduler
+from event_sync import EventStore
+from fake_calendar_server import FakeCalendarServer
+from request_scheduler import RequestScheduler
+from watch_channels import ChannelManager
+
+
+class _Webhook(BaseHTTPRequestHandler):
+    """
+    Receives the fake server's notifications and hands them to the manager, like the app's webhook route.
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        calendar_id = self.server.manager.handle_notification(
+            self.headers.get('X-Goog-Channel-ID'), self.headers.get('X-Goog-Channel-Token'),
+            self.headers.get('X-Goog-Resource-ID'), self.headers.get('X-Goog-Resource-State'),
+        )
+        self.send_response(200 if calendar_id else 404)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    monkeypatch.setattr(request_scheduler, '_default_scheduler', RequestScheduler(1e9, 1e9))
+    with FakeCalendarServer() as server:
+        yield server
+
+
+@pytest.fixture
+def manager(fake, tmp_path):
+    webhook = ThreadingHTTPServer(('127.0.0.1', 0), _Webhook)
+    webhook.daemon_threads = True
+    threading.Thread(target=webhook.serve_forever, daemon=True).start()
+    host, port = webhook.server_address[:2]
+    channel_manager = ChannelManager(f'http://{host}:{port}/notifications', store=EventStore(':memory:'),
+                                     channels_file=str(tmp_path / 'channels.json'),
+                                     credentials=AnonymousCredentials(), root_url=fake.root_url)
+    webhook.manager = channel_manager
+    yield channel_manager
+    channel_manager.close()
+    webhook.shutdown()
+    webhook.server_close()
+
+
+def _add_event(fake, summary):
+    start = datetime.datetime(2030, 1, 1, 9, tzinfo=datetime.timezone.utc)
+    fake.backend.add_event('primary', {
+        'summary': summary,
+        'start': {'dateTime': start.isoformat()},
+        'end': {'dateTime': (start + datetime.timedelta(hours=1)).isoformat()},
+    })
+
+
+def _record_syncs(manager):
+    syncs = queue.Queue()
+    manager.add_listener(lambda calendar_id, result: syncs.put((calendar_id, result)))
+    return syncs
+
+
+def _summaries(manager):
+    return sorted(event['summary'] for event in manager.store.events('primary'))
+
+
+def test_notifications_from_a_channel_are_accepted(fake, manager):
+    syncs = _record_syncs(manager)
+    notifier = fake.backend.notifier
+    channel = manager.ensure_watch('primary')
+    # The new channel's 'sync' message may arrive before watch() has recorded the channel
+    notifier.join()
+    delivered, failed = notifier.delivered, notifier.failed
+
+    _add_event(fake, 'Standup')
+    notifier.join()
+    assert (notifier.delivered, notifier.failed) == (delivered + 1, failed)
+    assert manager.validate(channel['id'], channel['token'], channel['resource_id']) == 'primary'
+
+    manager.start()
+    calendar_id, result = syncs.get(timeout=10)
+    assert (calendar_id, result['upserted']) == ('primary', 1)
+    assert _summaries(manager) == ['Standup']
+
+
+def test_wrong_token_or_resource_id_is_rejected(fake, manager):
+    notifier = fake.backend.notifier
+    channel = manager.ensure_watch('primary')
+    notifier.join()
+    failed = notifier.failed
+    headers = {
+        'X-Goog-Channel-ID': channel['id'],
+        'X-Goog-Channel-Token': channel['token'],
+        'X-Goog-Resource-ID': channel['resource_id'],
+        'X-Goog-Resource-State': 'exists',
+    }
+    for forged in ({'X-Goog-Channel-Token': 'guessed'}, {'X-Goog-Channel-Token': ''},
+                   {'X-Goog-Resource-ID': 'resource-other'}, {'X-Goog-Channel-ID': 'unknown-channel'}):
+        notifier.send(manager.address, dict(headers, **forged))
+    notifier.join()
+
+    assert notifier.failed == failed + 4
+    # Nothing was queued, so stopping the worker after it started leaves the store untouched
+    manager.start().close()
+    assert list(manager.store.events('primary')) == []
+
+
+def test_repeated_notifications_are_coalesced(fake, manager):
+    syncs = _record_syncs(manager)
+    manager.ensure_watch('primary')
+    for number in range(5):
+        _add_event(fake, f'Event {number}')
+    fake.backend.notifier.join()
+
+    manager.start()
+    calendar_id, result = syncs.get(timeout=10)
+    # close() lets the worker finish, so a second queued sync would have run by the time it returns
+    manager.close()
+    assert (calendar_id, result['upserted']) == ('primary', 5)
+    assert syncs.empty()
+    assert len(_summaries(manager)) == 5
+
+
+def test_notification_during_a_sync_queues_one_follow_up(fake, manager):
+    syncs = _record_syncs(manager)
+    entered = threading.Event()
+    release = threading.Event()
+
+    def block_first_sync(calendar_id, result):
+        if not entered.is_set():
+            entered.set()
+            release.wait(10)
+
+    manager.add_listener(block_first_sync)
+    manager.ensure_watch('primary')
+    manager.start()
+    _add_event(fake, 'First')
+    assert entered.wait(10)
+
+    for number in range(3):
+        _add_event(fake, f'During {number}')
+    fake.backend.notifier.join()
+    release.set()
+
+    assert syncs.get(timeout=10)[1]['upserted'] == 1
+    assert syncs.get(timeout=10)[1]['upserted'] == 3
+    manager.close()
+    assert syncs.empty()
+
+
+def test_renewal_opens_the_new_channel_before_stopping_the_old(fake, manager, monkeypatch):
+    open_at_stop = []
+    stop = manager.stop
+
+    def recording_stop(channel_id):
+        open_at_stop.append(set(fake.backend.channels))
+        stop(channel_id)
+
+    monkeypatch.setattr(manager, 'stop', recording_stop)
+    old = manager.ensure_watch('primary')
+    # A week from now every channel is within the renewal margin
+    assert manager.renew_due(now=time.time() + 7 * 24 * 3600) == 1
+
+    new_id, = manager.channels
+    assert new_id != old['id']
+    assert open_at_stop == [{old['id'], new_id}]
+    assert set(fake.backend.channels) == {new_id}
+
+
+def test_sync_worker_survives_failures(fake, manager):
+    syncs = _record_syncs(manager)
+
+    def failing_listener(calendar_id, result):
+        raise RuntimeError('listener failed')
+
+    manager.listeners.insert(0, failing_listener)
+    manager.ensure_watch('primary')
+    manager.start()
+
+    _add_event(fake, 'First')
+    assert syncs.get(timeout=10)[1]['upserted'] == 1
+
+    # A store error mid-sync must not end the worker either
+    failed = threading.Event()
+
+    class BrokenStore:
+        def get_sync_token(self, calendar_id):
+            failed.set()
+            raise sqlite3.OperationalError('database is locked')
+
+    store, manager.store = manager.store, BrokenStore()
+    manager.request_sync('primary')
+    assert failed.wait(10)
+    manager.store = store
+
+    _add_event(fake, 'Second')
+    assert syncs.get(timeout=10)[1]['upserted'] == 1
+    assert _summaries(manager) == ['First', 'Second']
+
+
+def test_retain_stops_channels_of_calendars_no_longer_watched(fake, manager):
+    fake.backend.add_calendar('team', 'Team')
+    kept = manager.ensure_watch('primary')
+    manager.ensure_watch('team')
+
+    assert manager.retain(['primary']) == 1
+    assert set(manager.channels) == set(fake.backend.channels) == {kept['id']}
+    reloaded = ChannelManager(manager.address, store=manager.store, channels_file=manager.channels_file)
+    assert set(reloaded.channels) == {kept['id']}
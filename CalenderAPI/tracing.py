@@ -0,0 +1,178 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds of the latency histogram buckets, Prometheus' default set
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+# Content type of the Prometheus text exposition format
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Monotonic counter with optional labels, e.g. Counter('retries_total', '...', ('operation',)).
+    """
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        # Unlabelled counters are exported as 0 before their first increment
+        self.values = {} if self.label_names else {(): 0}
+        self.lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            items = sorted(self.values.items())
+        for labels, value in items:
+            yield self.name, _label_text(self.label_names, labels), value
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram with optional labels, rendered like prometheus_client's.
+    Observing costs a bisect and a few additions under a lock.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # {labels: [per-bucket counts (last one is +Inf), sum, count]}
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self.values.get(labels)
+            if entry is None:
+                entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        """
+        Observe the duration of a with-block.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def samples(self):
+        with self.lock:
+            items = sorted((labels, (list(entry[0]), entry[1], entry[2])) for labels, entry in self.values.items())
+        names = self.label_names + ('le',)
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                yield self.name + '_bucket', _label_text(names, labels + (_number(bound),)), cumulative
+            yield self.name + '_sum', _label_text(self.label_names, labels), total
+            yield self.name + '_count', _label_text(self.label_names, labels), count
+
+
+class Registry:
+    """
+    A set of metrics that can be rendered together in the Prometheus text format.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, label_names=()):
+        return self.register(Counter(name, documentation, label_names))
+
+    def histogram(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, label_names, buckets))
+
+    def render(self):
+        """
+        Return every metric in the Prometheus text exposition format.
+        """
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry and the Calendar client metrics recorded into it
+REGISTRY = Registry()
+
+API_CALL_SECONDS = REGISTRY.histogram(
+    'calendar_api_call_seconds', 'Latency of one Calendar API call attempt.', ('operation', 'status'))
+API_RETRIES = REGISTRY.counter(
+    'calendar_api_retries_total', 'Calendar API calls retried after a transient error.', ('operation',))
+THROTTLE_SECONDS = REGISTRY.counter(
+    'calendar_api_throttle_seconds_total', 'Time spent waiting for the client-side rate limiter.')
+HTTP_SENT_BYTES = REGISTRY.counter(
+    'calendar_http_sent_bytes_total', 'Request body bytes sent to the Calendar API.', ('method',))
+HTTP_RECEIVED_BYTES = REGISTRY.counter(
+    'calendar_http_received_bytes_total', 'Response body bytes received from the Calendar API.', ('method',))
+CREDENTIAL_REFRESH_SECONDS = REGISTRY.histogram(
+    'calendar_credential_refresh_seconds', 'Time spent refreshing or obtaining OAuth2 credentials.', ('mode',))
+DISCOVERY_SECONDS = REGISTRY.histogram(
+    'calendar_discovery_seconds', 'Time spent loading and parsing the discovery document.')
+SERVICE_BUILD_SECONDS = REGISTRY.histogram(
+    'calendar_service_build_seconds', 'Time spent building a Calendar service object.')
+
+
+def operation_name(request):
+    """
+    Return a low-cardinality label for a request: its API method ID, e.g. 'calendar.events.list',
+    or 'batch' for batch requests.
+    """
+    method_id = getattr(request, 'methodId', None)
+    if method_id:
+        return method_id
+    if hasattr(request, 'add'):
+        return 'batch'
+    return type(request).__name__
+
+
+def render_metrics():
+    """
+    Return the process-wide metrics in the Prometheus text exposition format.
+    """
+    return REGISTRY.render()
@@ -0,0 +1,278 @@
+import datetime
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+import uuid
+from googleapiclient.errors import HttpError
+from atomic_write import atomic_write
+from calendar_service import get_calendar_service
+from event_sync import EventStore, sync_calendar
+from request_scheduler import execute
+
+# OAuth2 scopes for Google Calendar API
+SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
+
+# Active channels are kept here so a restarted app keeps using them
+CHANNELS_FILE = 'watch_channels.json'
+
+# Requested channel lifetime; the API caps it (about a week for events)
+WATCH_TTL = datetime.timedelta(days=7)
+
+# Channels are replaced this long before they expire
+RENEW_MARGIN = datetime.timedelta(hours=1)
+
+# Upper bound on how long the renewal thread sleeps between checks
+MAX_SLEEP_SECONDS = 300
+
+# Wait before retrying a renewal that failed
+RENEW_RETRY_SECONDS = 60
+
+# Resource states that mean the watched collection changed; 'sync' only confirms a new channel
+CHANGE_STATES = ('exists', 'not_exists')
+
+
+class ChannelManager:
+    """
+    Keep push-notification channels open on calendars and turn their notifications into
+    incremental syncs of only the affected calendar.
+    Notifications are coalesced: while a calendar's sync is queued, further notifications for it
+    are absorbed, and one arriving during a running sync queues exactly one follow-up sync.
+    Channels are renewed by a background thread RENEW_MARGIN before they expire; the new channel
+    is opened before the old one is stopped, so no change goes unnoticed in between.
+    Args:
+        address (str): HTTPS URL of the webhook route that receives notifications.
+        store (EventStore): Local event store the syncs write to; defaults to EventStore().
+        channels_file (str): JSON file the active channels are persisted to.
+        credentials: Optional credentials passed to get_calendar_service().
+        root_url (str): Optional API root, e.g. a local fake server.
+        ttl (timedelta): Requested channel lifetime.
+        renew_margin (timedelta): How long before expiry a channel is replaced.
+    """
+
+    def __init__(self, address, store=None, channels_file=CHANNELS_FILE, credentials=None, root_url=None,
+                 ttl=WATCH_TTL, renew_margin=RENEW_MARGIN):
+        self.address = address
+        self.store = store or EventStore()
+        self.channels_file = channels_file
+        self.credentials = credentials
+        self.root_url = root_url
+        self.ttl = ttl
+        self.renew_margin = renew_margin
+        self.lock = threading.Lock()
+        self.channels = self._load_channels()
+        self.listeners = []
+        self._pending = set()
+        self._sync_wake = threading.Condition(self.lock)
+        self._renew_wake = threading.Event()
+        self._closed = False
+        self._renew_failed = False
+        self._threads = []
+
+    def _service(self):
+        # Services are cached per thread, so each worker thread gets its own transport
+        return get_calendar_service(SCOPES, self.credentials, self.root_url)
+
+    def _load_channels(self):
+        if self.channels_file and os.path.exists(self.channels_file):
+            with open(self.channels_file, 'r') as channels_file:
+                return json.load(channels_file)
+        return {}
+
+    def _save_channels(self):
+        if not self.channels_file:
+            return
+        with atomic_write(self.channels_file) as channels_file:
+            json.dump(self.channels, channels_file)
+
+    def add_listener(self, callback):
+        """
+        Call callback(calendar_id, sync_result) after every notification-triggered sync,
+        e.g. to invalidate an UpcomingEvents index.
+        """
+        self.listeners.append(callback)
+
+    def watch(self, calendar_id):
+        """
+        Open a new channel on a calendar's events and return its record.
+        """
+        body = {
+            'id': str(uuid.uuid4()),
+            'type': 'web_hook',
+            'address': self.address,
+            'token': secrets.token_urlsafe(32),
+            'params': {'ttl': str(int(self.ttl.total_seconds()))},
+        }
+        response = execute(self._service().events().watch(calendarId=calendar_id, body=body))
+        channel = {
+            'calendar_id': calendar_id,
+            'token': body['token'],
+            'resource_id': response['resourceId'],
+            'expiration': int(response.get('expiration') or (time.time() + self.ttl.total_seconds()) * 1000),
+        }
+        with self.lock:
+            self.channels[body['id']] = channel
+            self._save_channels()
+        self._renew_wake.set()
+        return dict(channel, id=body['id'])
+
+    def ensure_watch(self, calendar_id):
+        """
+        Return a live channel on the calendar, reusing a persisted one unless it is due for renewal.
+        """
+        deadline = (time.time() + self.renew_margin.total_seconds()) * 1000
+        with self.lock:
+            for channel_id, channel in self.channels.items():
+                if channel['calendar_id'] == calendar_id and channel['expiration'] > deadline:
+                    return dict(channel, id=channel_id)
+        return self.watch(calendar_id)
+
+    def stop(self, channel_id):
+        """
+        Stop a channel; the API stops sending its notifications.
+        """
+        with self.lock:
+            channel = self.channels.pop(channel_id, None)
+            self._save_channels()
+        if channel is None:
+            return
+        try:
+            execute(self._service().channels().stop(body={'id': channel_id, 'resourceId': channel['resource_id']}))
+        except HttpError as error:
+            # A 404 means the channel had already expired on the server
+            if error.resp.status != 404:
+                raise
+
+    def retain(self, calendar_ids):
+        """
+        Stop every persisted channel on a calendar that is not in calendar_ids, e.g. one that was
+        dropped from the configuration since the channels were opened. Returns the number stopped.
+        """
+        calendar_ids = set(calendar_ids)
+        with self.lock:
+            unwanted = [channel_id for channel_id, channel in self.channels.items()
+                        if channel['calendar_id'] not in calendar_ids]
+
+        stopped = 0
+        for channel_id in unwanted:
+            try:
+                self.stop(channel_id)
+                stopped += 1
+            except HttpError as error:
+                # The channel is already forgotten locally, so its notifications are rejected until it expires
+                print(f"Could not stop channel {channel_id}: {error}")
+        return stopped
+
+    def renew_due(self, now=None):
+        """
+        Replace every channel that expires within renew_margin. Returns the number renewed.
+        """
+        now = time.time() if now is None else now
+        deadline = (now + self.renew_margin.total_seconds()) * 1000
+        with self.lock:
+            due = [(channel_id, channel['calendar_id']) for channel_id, channel in self.channels.items()
+                   if channel['expiration'] <= deadline]
+
+        renewed = 0
+        for channel_id, calendar_id in due:
+            try:
+                self.watch(calendar_id)
+                renewed += 1
+            except HttpError as error:
+                print(f"Could not renew watch on {calendar_id}: {error}")
+                continue
+            try:
+                self.stop(channel_id)
+            except HttpError as error:
+                # The old channel simply runs out; its notifications are still accepted until then
+                print(f"Could not stop channel {channel_id}: {error}")
+        self._renew_failed = renewed < len(due)
+        return renewed
+
+    def validate(self, channel_id, token, resource_id=None):
+        """
+        Return the calendar ID of a known channel whose token (and resource ID, if given) match, else None.
+        """
+        channel = self.channels.get(channel_id)
+        if channel is None or not hmac.compare_digest(channel['token'], token or ''):
+            return None
+        if resource_id is not None and resource_id != channel['resource_id']:
+            return None
+        return channel['calendar_id']
+
+    def handle_notification(self, channel_id, token, resource_id, resource_state):
+        """
+        Validate one notification and queue a sync of its calendar if it reports a change.
+        Returns the calendar ID, or None if the notification did not come from one of our channels.
+        """
+        calendar_id = self.validate(channel_id, token, resource_id)
+        if calendar_id is not None and resource_state in CHANGE_STATES:
+            self.request_sync(calendar_id)
+        return calendar_id
+
+    def request_sync(self, calendar_id):
+        with self.lock:
+            self._pending.add(calendar_id)
+            self._sync_wake.notify()
+
+    def _sync_loop(self):
+        while True:
+            with self.lock:
+                while not self._pending and not self._closed:
+                    self._sync_wake.wait()
+                if self._closed:
+                    return
+                calendar_id = self._pending.pop()
+
+            # Any failure (the API, the store, a token refresh, a listener) is reported and the
+            # worker carries on; an uncaught one would end all notification-driven syncs
+            try:
+                result = sync_calendar(calendar_id, self.store, self._service())
+            except Exception as error:
+                print(f"Sync of {calendar_id} failed: {error!r}")
+                continue
+            for listener in self.listeners:
+                try:
+                    listener(calendar_id, result)
+                except Exception as error:
+                    print(f"Listener for {calendar_id} failed: {error!r}")
+
+    def _renew_loop(self):
+        while not self._closed:
+            with self.lock:
+                expirations = [channel['expiration'] / 1000 for channel in self.channels.values()]
+            wake_at = min(expirations, default=float('inf')) - self.renew_margin.total_seconds()
+            delay = wake_at - time.time()
+            if delay <= 0 and self._renew_failed:
+                delay = RENEW_RETRY_SECONDS
+            self._renew_wake.wait(min(max(delay, 0), MAX_SLEEP_SECONDS))
+            self._renew_wake.clear()
+            if not self._closed:
+                self.renew_due()
+
+    def start(self):
+        """
+        Start the sync worker and the renewal thread.
+        """
+        for target in (self._sync_loop, self._renew_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def close(self, stop_channels=False):
+        """
+        Stop the background threads, and optionally the channels themselves.
+        """
+        with self.lock:
+            self._closed = True
+            self._sync_wake.notify_all()
+        self._renew_wake.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if stop_channels:
+            for channel_id in list(self.channels):
+                self.stop(channel_id)
@@ -1,15 +1,9 @@
-file=open("Story.txt" , "r")
-cont=file.read()
-stri=""
-for i in cont:
-    if i.islower==True:
-        a=i.capitalize()
-        stri=stri+a
-     
-    else:
-        stri+stri+i
-        
-file2=open("New.txt" , "w+")
-file2.write(stri)
-print(stri)
+import shutil
+import sys
+from case_transform import transform_file
 
+# Upper-cases Story.txt into New.txt block by block instead of building the result one character at a time
+transform_file("Story.txt", "New.txt", mode="upper")
+
+with open("New.txt", "r") as file2:
+    shutil.copyfileobj(file2, sys.stdout)
@@ -0,0 +1,184 @@
+import argparse
+import os
+import re
+import sys
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Characters (text mode) or bytes (binary mode) transformed per step
+BLOCK_SIZE = 1024 * 1024
+
+MODES = ('upper', 'words', 'sentence')
+
+ASCII_LOWER = b'abcdefghijklmnopqrstuvwxyz'
+ASCII_UPPER = b'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+UPPER_TABLE = bytes.maketrans(ASCII_LOWER, ASCII_UPPER)
+LOWER_TABLE = bytes.maketrans(ASCII_UPPER, ASCII_LOWER)
+
+# Context put in front of a block so rules that look back see the end of the previous block:
+# ' ' a word starts at the next letter, '. ' so does a sentence, '.' a sentence ends unless a letter
+# follows directly, '-' the previous block ended inside a word
+WORD_START = ' '
+SENTENCE_START = '. '
+SENTENCE_END = '.'
+IN_WORD = '-'
+
+# A letter starts a word after whitespace, and a sentence after '.', '!' or '?' and whitespace
+_TEXT_WORD = re.compile(r'(?<!\S)[^\W\d_]')
+_TEXT_SENTENCE = re.compile(r'(?<=[.!?])(\s+)([^\W\d_])')
+_BYTES_WORD = re.compile(rb'(?<!\S)[a-z]')
+_BYTES_SENTENCE = re.compile(rb'(?<=[.!?])(\s+)([a-z])')
+
+if np is not None:
+    # Whitespace as bytes patterns see it; str patterns also count the separators \x1c-\x1f
+    _BYTES_WHITESPACE = np.zeros(256, dtype=bool)
+    _BYTES_WHITESPACE[list(b' \t\n\r\x0b\x0c')] = True
+    _TEXT_WHITESPACE = _BYTES_WHITESPACE.copy()
+    _TEXT_WHITESPACE[list(b'\x1c\x1d\x1e\x1f')] = True
+    _TERMINATOR = np.zeros(256, dtype=bool)
+    _TERMINATOR[list(b'.!?')] = True
+    _LOWER_LETTER = np.zeros(256, dtype=bool)
+    _LOWER_LETTER[list(ASCII_LOWER)] = True
+
+
+def _upper_starts(data, mode, text=False):
+    """
+    Upper-case the ASCII letters that start a word or sentence in lower-cased bytes, data[0] being context.
+    With text=True the bytes are ASCII text and whitespace is what it is for str.
+    """
+    if np is None:
+        if mode == 'words':
+            return _BYTES_WORD.sub(lambda match: match[0].translate(UPPER_TABLE), data)
+        return _BYTES_SENTENCE.sub(lambda match: match[1] + match[2].translate(UPPER_TABLE), data)
+
+    codes = np.frombuffer(data, dtype=np.uint8)
+    whitespace = (_TEXT_WHITESPACE if text else _BYTES_WHITESPACE)[codes]
+    # Every whitespace run is preceded by a word end and, unless it closes the block, followed by a
+    # word start; the context byte is never whitespace, so the k-th start pairs with the k-th end
+    word_starts = np.flatnonzero(whitespace[:-1] & ~whitespace[1:]) + 1
+    selected = _LOWER_LETTER[codes[word_starts]]
+    if mode == 'sentence':
+        word_ends = np.flatnonzero(~whitespace[:-1] & whitespace[1:])[:len(word_starts)]
+        selected &= _TERMINATOR[codes[word_ends]]
+    if not selected.any():
+        return data
+    codes = codes.copy()
+    codes[word_starts[selected]] -= 0x20
+    return codes.tobytes()
+
+
+def _next_context(tail, mode):
+    if mode == 'words':
+        return WORD_START if tail[-1:].isspace() else IN_WORD
+    stripped = tail.rstrip()
+    if stripped[-1:] not in ('.', '!', '?', b'.', b'!', b'?'):
+        return IN_WORD
+    return SENTENCE_START if len(stripped) < len(tail) else SENTENCE_END
+
+
+class CaseTransformer:
+    """
+    Incremental case transformation: feed() blocks of text in order and write what it returns.
+    Modes:
+        upper: every letter upper-cased.
+        words: the first letter of every whitespace-separated word upper-cased, the rest lower-cased.
+        sentence: the first letter of every sentence upper-cased, the rest lower-cased.
+    Whole blocks go through str.upper()/lower() or bytes.translate(); word and sentence starts are
+    found with a vectorized NumPy pass over ASCII data (a regular expression otherwise), so no Python
+    code runs per character. The transformer carries one piece of context between blocks, so
+    words and sentences cut by a block boundary come out the same as in one pass.
+    Args:
+        mode (str): One of MODES.
+        binary (bool): Take and return bytes. Only ASCII letters change, so UTF-8 passes through intact.
+    """
+
+    def __init__(self, mode='upper', binary=False):
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode {mode!r}; expected one of {', '.join(MODES)}")
+        self.mode = mode
+        self.binary = binary
+        self.context = SENTENCE_START if mode == 'sentence' else WORD_START
+
+    def feed(self, block):
+        if self.mode == 'upper':
+            return block.translate(UPPER_TABLE) if self.binary else block.upper()
+        if not block:
+            return block
+
+        if self.binary:
+            data = self.context.encode('ascii') + block.translate(LOWER_TABLE)
+            result = _upper_starts(data, self.mode)
+        else:
+            data = self.context + block.lower()
+            if np is not None and data.isascii():
+                result = _upper_starts(data.encode('ascii'), self.mode, text=True).decode('ascii')
+            elif self.mode == 'words':
+                result = _TEXT_WORD.sub(lambda match: match[0].upper(), data)
+            else:
+                result = _TEXT_SENTENCE.sub(lambda match: match[1] + match[2].upper(), data)
+        # The context is ASCII punctuation or whitespace, which no mode changes
+        skip = len(self.context)
+        self.context = _next_context(data, self.mode)
+        return result[skip:]
+
+
+def transform_file(source, destination, mode='upper', binary=False, encoding='utf-8', block_size=BLOCK_SIZE):
+    """
+    Stream source through a CaseTransformer into destination, one block at a time.
+    Binary mode reads into one preallocated buffer and never decodes, so memory stays constant
+    however large the file; text mode decodes incrementally and handles every Unicode letter.
+    The output is written under a temporary name and moved into place once complete, so
+    destination may be the source itself.
+    Returns: the number of characters (bytes in binary mode) written.
+    """
+    transformer = CaseTransformer(mode, binary)
+    tmp_path = destination + '.tmp'
+    written = 0
+    try:
+        if binary:
+            buffer = bytearray(block_size)
+            view = memoryview(buffer)
+            with open(source, 'rb') as infile, open(tmp_path, 'wb') as outfile:
+                while True:
+                    size = infile.readinto(buffer)
+                    if not size:
+                        break
+                    written += outfile.write(transformer.feed(bytes(view[:size])))
+        else:
+            # newline='' keeps line endings exactly as they are
+            with open(source, 'r', encoding=encoding, newline='') as infile, \
+                    open(tmp_path, 'w', encoding=encoding, newline='') as outfile:
+                while True:
+                    block = infile.read(block_size)
+                    if not block:
+                        break
+                    written += outfile.write(transformer.feed(block))
+        os.replace(tmp_path, destination)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Change the case of a text file, streaming it block by block.')
+    parser.add_argument('source')
+    parser.add_argument('destination')
+    parser.add_argument('--mode', choices=MODES, default='upper')
+    parser.add_argument('--binary', action='store_true',
+                        help='Constant-memory mode: work on raw bytes, changing ASCII letters only')
+    parser.add_argument('--encoding', default='utf-8')
+    parser.add_argument('--block-size', type=int, default=BLOCK_SIZE)
+    args = parser.parse_args(argv)
+
+    written = transform_file(args.source, args.destination, args.mode, args.binary, args.encoding, args.block_size)
+    print(f"Wrote {written} {'bytes' if args.binary else 'characters'} to {args.destination}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
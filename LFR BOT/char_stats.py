@@ -0,0 +1,182 @@
+import argparse
+import codecs
+import sys
+import numpy as np
+
+# Bytes read per step when analysing a file
+CHUNK_SIZE = 4 * 1024 * 1024
+
+VOWELS = frozenset('aeiouAEIOU')
+CONSONANTS = frozenset('bcdfghjklmnpqrstvwxyzBCDFGHJKLMNPQRSTVWXYZ')
+DIGITS = frozenset('0123456789')
+
+# The same classes as byte values; in UTF-8 and other ASCII-compatible encodings an ASCII byte is always that character
+_VOWEL_BYTES = np.array(sorted(map(ord, VOWELS)))
+_CONSONANT_BYTES = np.array(sorted(map(ord, CONSONANTS)))
+_DIGIT_BYTES = np.array(sorted(map(ord, DIGITS)))
+
+
+def is_vowel(char):
+    return char in VOWELS
+
+
+class CharStats:
+    """
+    Running byte and code point histograms of a text, updated a block at a time.
+    Each block is counted with one np.bincount over a NumPy view of its bytes (or of its UTF-32
+    code units), so no Python code runs per character.
+    Args:
+        encoding (str): Encoding of the bytes passed to update().
+        codepoints (bool): Also decode and count code points; without them only bytes are counted,
+            which is several times faster and enough for the ASCII vowel, consonant and digit counts.
+    """
+
+    def __init__(self, encoding='utf-8', codepoints=True):
+        self.encoding = encoding
+        self.byte_counts = np.zeros(256, dtype=np.int64)
+        self.codepoint_counts = np.zeros(128, dtype=np.int64) if codepoints else None
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace') if codepoints else None
+
+    def update(self, data):
+        """
+        Count a block of encoded bytes. Blocks may split multi-byte characters.
+        """
+        self.byte_counts += np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256)
+        if self._decoder is not None:
+            self._count_text(self._decoder.decode(data))
+        return self
+
+    def update_text(self, text):
+        """
+        Count a block of already decoded text.
+        """
+        self.byte_counts += np.bincount(np.frombuffer(text.encode(self.encoding), dtype=np.uint8), minlength=256)
+        if self.codepoint_counts is not None:
+            self._count_text(text)
+        return self
+
+    def finish(self):
+        """
+        Count any bytes the decoder still holds back, e.g. a truncated final character.
+        """
+        if self._decoder is not None:
+            self._count_text(self._decoder.decode(b'', final=True))
+        return self
+
+    def _count_text(self, text):
+        if not text:
+            return
+        if text.isascii():
+            units = np.frombuffer(text.encode('ascii'), dtype=np.uint8)
+        else:
+            units = np.frombuffer(text.encode('utf-32-le'), dtype='<u4')
+        counts = np.bincount(units)
+        if len(counts) > len(self.codepoint_counts):
+            grown = np.zeros(len(counts), dtype=np.int64)
+            grown[:len(self.codepoint_counts)] = self.codepoint_counts
+            self.codepoint_counts = grown
+        self.codepoint_counts[:len(counts)] += counts
+
+    def _ascii_counts(self):
+        # Code points when we have them (correct for any encoding), otherwise the ASCII bytes
+        if self.codepoint_counts is not None:
+            return self.codepoint_counts
+        return self.byte_counts
+
+    def byte_histogram(self):
+        """
+        Return a 256-entry array: how often each byte value occurs.
+        """
+        return self.byte_counts.copy()
+
+    def codepoint_histogram(self):
+        """
+        Return {character: count} for every character that occurs.
+        """
+        if self.codepoint_counts is None:
+            raise ValueError("Code points were not counted; create CharStats with codepoints=True")
+        present = np.flatnonzero(self.codepoint_counts)
+        return {chr(code): int(count) for code, count in zip(present, self.codepoint_counts[present])}
+
+    def most_common(self, count=10):
+        """
+        Return the `count` most frequent characters as (character, count) pairs.
+        """
+        histogram = self.codepoint_histogram()
+        return sorted(histogram.items(), key=lambda item: (-item[1], item[0]))[:count]
+
+    def counts(self):
+        """
+        Return the totals: bytes, vowels, consonants and digits (ASCII), plus characters, letters
+        and whitespace when code points were counted.
+        """
+        table = self._ascii_counts()
+        result = {
+            'bytes': int(self.byte_counts.sum()),
+            'vowels': int(table[_VOWEL_BYTES].sum()),
+            'consonants': int(table[_CONSONANT_BYTES].sum()),
+            'digits': int(table[_DIGIT_BYTES].sum()),
+        }
+        if self.codepoint_counts is not None:
+            present = np.flatnonzero(self.codepoint_counts)
+            # Classifying each distinct character once is cheap however long the text is
+            letters = [code for code in present if chr(code).isalpha()]
+            spaces = [code for code in present if chr(code).isspace()]
+            result['characters'] = int(self.codepoint_counts.sum())
+            result['letters'] = int(self.codepoint_counts[letters].sum())
+            result['whitespace'] = int(self.codepoint_counts[spaces].sum())
+        return result
+
+
+def analyze(text, codepoints=True, encoding='utf-8'):
+    """
+    Return the CharStats of a str or bytes object.
+    """
+    stats = CharStats(encoding, codepoints)
+    if isinstance(text, str):
+        return stats.update_text(text)
+    return stats.update(text).finish()
+
+
+def iter_blocks(stream, chunk_size=CHUNK_SIZE):
+    """
+    Yield successive blocks of a binary stream, reusing one buffer; each block is only valid until the next.
+    """
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    while True:
+        size = stream.readinto(buffer)
+        if not size:
+            return
+        yield view[:size]
+
+
+def analyze_file(path, codepoints=True, encoding='utf-8', chunk_size=CHUNK_SIZE):
+    """
+    Stream a file through CharStats; memory use is one block plus the histograms.
+    """
+    stats = CharStats(encoding, codepoints)
+    with open(path, 'rb') as stream:
+        for block in iter_blocks(stream, chunk_size):
+            stats.update(block)
+    return stats.finish()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Character statistics of text files.')
+    parser.add_argument('paths', nargs='+')
+    parser.add_argument('--encoding', default='utf-8')
+    parser.add_argument('--bytes-only', action='store_true', help='Skip decoding; count bytes and ASCII classes only')
+    parser.add_argument('--top', type=int, default=10, help='Show the N most common characters')
+    args = parser.parse_args(argv)
+
+    for path in args.paths:
+        stats = analyze_file(path, not args.bytes_only, args.encoding)
+        print(f"{path}: " + ', '.join(f"{name} {value}" for name, value in stats.counts().items()))
+        if not args.bytes_only and args.top:
+            print('  ' + ' '.join(f"{char!r}:{count}" for char, count in stats.most_common(args.top)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
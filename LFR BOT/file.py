@@ -1,12 +1,11 @@
+from word_count import count_words
+
 
 def func(string):
- file=open('Story.txt' , 'r')
- v=file.read()
- lst=v.split(" ")
- a=0
- for i in lst:
-    a=a+1
- print(a)
-
-string=input("Enter the file name")
-func(string)
\ No newline at end of file
+ # Counts words in the named file across any whitespace, without loading it all into memory
+ print(count_words(string))
+
+
+if __name__ == "__main__":
+ string=input("Enter the file name")
+ func(string)
@@ -0,0 +1,503 @@
+import argparse
+import codecs
+import hashlib
+import json
+import mmap
+import os
+import re
+import sys
+import tempfile
+import time
+from array import array
+import numpy as np
+from char_stats import iter_blocks
+from text_report import CHUNK_SIZE, DEFAULT_PATTERN, iter_files, term_boundary, tokenize
+
+# Index files are kept in this directory inside the indexed corpus
+INDEX_DIR = '.text_index'
+MANIFEST_NAME = 'manifest.json'
+
+# Bump when the on-disk layout changes
+INDEX_VERSION = 1
+
+# Positions buffered before a segment is written; bounds memory while indexing
+SEGMENT_POSITIONS = 20_000_000
+
+OPERATORS = ('AND', 'OR', 'NOT')
+
+# Query tokens: parentheses, quoted phrases and bare words
+_QUERY_TOKEN = re.compile(r'\s*(?:(\()|(\))|"([^"]*)"|([^\s()"]+))')
+
+_EMPTY = np.zeros(0, dtype=np.uint32)
+
+
+def iter_terms(path, encoding='utf-8', chunk_size=CHUNK_SIZE, digest=None):
+    """
+    Yield the terms of a file in order, reading it a block at a time.
+    If a hashlib object is given as digest, it is updated with every block read.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    carry = ''
+    with open(path, 'rb') as stream:
+        for block in iter_blocks(stream, chunk_size):
+            if digest is not None:
+                digest.update(block)
+            text = carry + decoder.decode(block)
+            cut = term_boundary(text)
+            carry = text[cut:]
+            yield from tokenize(text[:cut])
+    yield from tokenize(carry + decoder.decode(b'', final=True))
+
+
+def _map(path):
+    with open(path, 'rb') as source:
+        if os.fstat(source.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class _Segment:
+    """
+    One immutable, memory-mapped slice of the index. Three files:
+        .terms     the segment's terms, UTF-8, concatenated in byte order
+        .lexicon   uint64 pairs (term offset, posting offset), one per term plus an end row
+        .postings  uint32 words; per term: document count n, n document IDs,
+                   n + 1 position bounds, then the positions of every document back to back
+    Nothing is read until a term is looked up, so opening an index costs three mmap calls per segment.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self._maps = [_map(prefix + suffix) for suffix in ('.terms', '.lexicon', '.postings')]
+        self.terms = self._maps[0]
+        self.lexicon = np.frombuffer(self._maps[1], dtype='<u8').reshape(-1, 2)
+        self.postings = np.frombuffer(self._maps[2], dtype='<u4')
+        self.size = len(self.lexicon) - 1
+
+    def find(self, term):
+        """
+        Binary-search the terms for `term` (bytes); return its row or -1.
+        """
+        offsets = self.lexicon[:, 0]
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            candidate = self.terms[int(offsets[middle]):int(offsets[middle + 1])]
+            if candidate < term:
+                low = middle + 1
+            elif candidate > term:
+                high = middle
+            else:
+                return middle
+        return -1
+
+    def entry(self, row):
+        """
+        Return (document IDs, position bounds, positions) of a term row as zero-copy array views.
+        """
+        start = int(self.lexicon[row, 1])
+        count = int(self.postings[start])
+        docs = self.postings[start + 1:start + 1 + count]
+        bounds = self.postings[start + 1 + count:start + 2 + 2 * count]
+        positions = self.postings[start + 2 + 2 * count:start + 2 + 2 * count + int(bounds[-1])]
+        return docs, bounds, positions
+
+    def iter_entries(self):
+        for row in range(self.size):
+            term = bytes(self.terms[int(self.lexicon[row, 0]):int(self.lexicon[row + 1, 0])])
+            yield term, self.entry(row)
+
+    def close(self):
+        # Arrays handed out by entry() are views of the maps, so each map is unmapped once the
+        # last view is gone rather than closed here
+        self.terms = self.lexicon = self.postings = None
+        self._maps = []
+
+
+def _write_segment(prefix, postings):
+    """
+    Write {term: [(doc_id, positions array), ...]} as a segment; documents must be in ID order.
+    """
+    entries = sorted((term.encode('utf-8'), documents) for term, documents in postings.items())
+    lexicon = array('Q')
+    words = 0
+    with open(prefix + '.terms.tmp', 'wb') as terms_file, open(prefix + '.postings.tmp', 'wb') as postings_file:
+        term_offset = 0
+        for term, documents in entries:
+            lexicon.extend((term_offset, words))
+            terms_file.write(term)
+            term_offset += len(term)
+
+            header = array('I', [len(documents)])
+            header.extend(doc_id for doc_id, _ in documents)
+            bound = 0
+            header.append(bound)
+            for _, positions in documents:
+                bound += len(positions)
+                header.append(bound)
+            postings_file.write(header.tobytes())
+            # Positions are array('I') while indexing and uint32 array views when compacting
+            for _, positions in documents:
+                postings_file.write(positions.tobytes())
+            words += len(header) + bound
+        lexicon.extend((term_offset, words))
+    with open(prefix + '.lexicon.tmp', 'wb') as lexicon_file:
+        lexicon_file.write(lexicon.tobytes())
+    for suffix in ('.terms', '.lexicon', '.postings'):
+        os.replace(prefix + suffix + '.tmp', prefix + suffix)
+
+
+class TextIndex:
+    """
+    Positional inverted index over the text files of a directory, stored on disk in segments.
+    update() indexes new and changed files into a new segment and marks the old copies of
+    changed or removed files deleted, so nothing already written is rewritten; compact() merges
+    the segments and drops deleted documents. A manifest lists the live documents and segments
+    and is replaced atomically, so readers always see a complete index.
+    Queries look terms up by binary search in the memory-mapped lexicon and combine the posting
+    arrays with NumPy set operations:
+        term            documents containing the term
+        a b, a AND b    both
+        a OR b          either
+        NOT a           every document without a
+        "a b c"         the terms next to each other, in order
+    Terms are the lower-cased word tokens of text_report.tokenize().
+    Args:
+        root (str): Directory holding the corpus.
+        index_dir (str): Where the index lives; defaults to INDEX_DIR inside root.
+    """
+
+    def __init__(self, root, index_dir=None):
+        self.root = root
+        self.index_dir = index_dir or os.path.join(root, INDEX_DIR)
+        self.segments = []
+        self._load()
+
+    def _manifest_path(self):
+        return os.path.join(self.index_dir, MANIFEST_NAME)
+
+    def _load(self):
+        try:
+            with open(self._manifest_path(), 'r') as manifest_file:
+                manifest = json.load(manifest_file)
+        except FileNotFoundError:
+            manifest = None
+        if manifest is None or manifest.get('version') != INDEX_VERSION:
+            manifest = {'version': INDEX_VERSION, 'next_doc': 0, 'next_segment': 0, 'segments': [],
+                        'documents': {}, 'deleted': []}
+        self.manifest = manifest
+        self.documents = {int(doc_id): info for doc_id, info in manifest['documents'].items()}
+        self.deleted = np.array(sorted(manifest['deleted']), dtype=np.uint32)
+        self.all_documents = np.array(sorted(self.documents), dtype=np.uint32)
+        for segment in self.segments:
+            segment.close()
+        self.segments = [_Segment(os.path.join(self.index_dir, name)) for name in manifest['segments']]
+
+    def _save(self):
+        self.manifest['documents'] = {str(doc_id): info for doc_id, info in self.documents.items()}
+        os.makedirs(self.index_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.index_dir, prefix='.manifest-', suffix='.tmp')
+        with os.fdopen(fd, 'w') as manifest_file:
+            json.dump(self.manifest, manifest_file)
+        os.replace(tmp_path, self._manifest_path())
+        self._load()
+
+    def _new_segment_prefix(self):
+        name = f"segment-{self.manifest['next_segment']:06d}"
+        self.manifest['next_segment'] += 1
+        return name, os.path.join(self.index_dir, name)
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def update(self, pattern=DEFAULT_PATTERN, encoding='utf-8'):
+        """
+        Bring the index up to date with the files under root.
+        Files whose size and mtime are unchanged are skipped without being opened. Other files are
+        read once, hashing and tokenizing in the same pass; a touched file whose content hash turns
+        out unchanged keeps its document and the new terms are dropped.
+        Returns: {'added': n, 'removed': n, 'unchanged': n}.
+        """
+        by_path = {info['path']: doc_id for doc_id, info in self.documents.items()}
+        deleted = set(self.manifest['deleted'])
+        summary = {'added': 0, 'removed': 0, 'unchanged': 0}
+        os.makedirs(self.index_dir, exist_ok=True)
+
+        postings = {}
+        buffered = 0
+        seen = set()
+        for path in iter_files(self.root, pattern):
+            if os.path.commonpath([os.path.abspath(path), os.path.abspath(self.index_dir)]) == \
+                    os.path.abspath(self.index_dir):
+                continue
+            relative = os.path.relpath(path, self.root)
+            seen.add(relative)
+            stat_result = os.stat(path)
+            old_id = by_path.get(relative)
+            if old_id is not None:
+                info = self.documents[old_id]
+                if info['size'] == stat_result.st_size and info['mtime_ns'] == stat_result.st_mtime_ns:
+                    summary['unchanged'] += 1
+                    continue
+
+            hasher = hashlib.blake2b()
+            positions = {}
+            for position, term in enumerate(iter_terms(path, encoding, digest=hasher)):
+                term_positions = positions.get(term)
+                if term_positions is None:
+                    term_positions = positions[term] = array('I')
+                term_positions.append(position)
+            digest = hasher.hexdigest()
+
+            if old_id is not None:
+                if digest == info['hash']:
+                    info['mtime_ns'] = stat_result.st_mtime_ns
+                    summary['unchanged'] += 1
+                    continue
+                del self.documents[old_id]
+                deleted.add(old_id)
+
+            doc_id = self.manifest['next_doc']
+            self.manifest['next_doc'] += 1
+            for term, term_positions in positions.items():
+                postings.setdefault(term, []).append((doc_id, term_positions))
+                buffered += len(term_positions)
+            self.documents[doc_id] = {'path': relative, 'size': stat_result.st_size,
+                                      'mtime_ns': stat_result.st_mtime_ns, 'hash': digest}
+            summary['added'] += 1
+
+            if buffered >= SEGMENT_POSITIONS:
+                self._flush(postings)
+                postings = {}
+                buffered = 0
+
+        for relative, doc_id in by_path.items():
+            if relative not in seen and doc_id in self.documents:
+                del self.documents[doc_id]
+                deleted.add(doc_id)
+                summary['removed'] += 1
+
+        if postings:
+            self._flush(postings)
+        self.manifest['deleted'] = sorted(deleted)
+        self._save()
+        return summary
+
+    def _flush(self, postings):
+        name, prefix = self._new_segment_prefix()
+        _write_segment(prefix, postings)
+        self.manifest['segments'].append(name)
+
+    def compact(self):
+        """
+        Merge every segment into one and drop deleted documents.
+        """
+        deleted = set(self.manifest['deleted'])
+        merged = {}
+        for segment in self.segments:
+            for term, (docs, bounds, positions) in segment.iter_entries():
+                documents = merged.setdefault(term.decode('utf-8'), [])
+                for index, doc_id in enumerate(docs.tolist()):
+                    if doc_id not in deleted:
+                        documents.append((doc_id, positions[bounds[index]:bounds[index + 1]]))
+        old = list(self.manifest['segments'])
+        self.manifest['segments'] = []
+        merged = {term: documents for term, documents in merged.items() if documents}
+        if merged:
+            self._flush(merged)
+        self.manifest['deleted'] = []
+        self._save()
+        for name in old:
+            for suffix in ('.terms', '.lexicon', '.postings'):
+                os.remove(os.path.join(self.index_dir, name + suffix))
+
+    def _entries(self, term):
+        key = term.encode('utf-8')
+        for segment in self.segments:
+            row = segment.find(key)
+            if row >= 0:
+                yield segment.entry(row)
+
+    def _live(self, docs):
+        if len(self.deleted) and len(docs):
+            docs = docs[~np.isin(docs, self.deleted, assume_unique=True)]
+        return docs
+
+    def term_documents(self, term):
+        """
+        Return the sorted IDs of the live documents containing `term`.
+        """
+        found = [docs for docs, _, _ in self._entries(term)]
+        if not found:
+            return _EMPTY
+        # Segments hold increasing document IDs, so concatenating them keeps the order
+        return self._live(found[0] if len(found) == 1 else np.concatenate(found))
+
+    def positions(self, term):
+        """
+        Return {document ID: term positions} for every live document containing `term`.
+        """
+        deleted = set(self.manifest['deleted'])
+        result = {}
+        for docs, bounds, positions in self._entries(term):
+            for index, doc_id in enumerate(docs.tolist()):
+                if doc_id not in deleted:
+                    result[doc_id] = positions[bounds[index]:bounds[index + 1]]
+        return result
+
+    def _positions_in(self, term, doc_ids):
+        """
+        Return the positions of `term` in each of doc_ids, which all contain it.
+        """
+        result = {}
+        for docs, bounds, positions in self._entries(term):
+            rows = np.searchsorted(docs, doc_ids)
+            for doc_id, row in zip(doc_ids.tolist(), rows.tolist()):
+                if row < len(docs) and docs[row] == doc_id:
+                    result[doc_id] = positions[bounds[row]:bounds[row + 1]]
+        return result
+
+    def phrase_matches(self, phrase):
+        """
+        Return {document ID: start positions} where the terms of `phrase` occur consecutively.
+        """
+        terms = tokenize(phrase)
+        if not terms:
+            return {}
+        candidates = self.term_documents(terms[0])
+        for term in terms[1:]:
+            candidates = np.intersect1d(candidates, self.term_documents(term), assume_unique=True)
+            if not len(candidates):
+                return {}
+
+        starts = {doc_id: positions.astype(np.int64)
+                  for doc_id, positions in self._positions_in(terms[0], candidates).items()}
+        for offset, term in enumerate(terms[1:], 1):
+            following = self._positions_in(term, candidates)
+            for doc_id in list(starts):
+                starts[doc_id] = np.intersect1d(starts[doc_id], following[doc_id].astype(np.int64) - offset,
+                                                assume_unique=True)
+                if not len(starts[doc_id]):
+                    del starts[doc_id]
+        return starts
+
+    def _phrase_documents(self, phrase):
+        terms = tokenize(phrase)
+        if len(terms) == 1:
+            return self.term_documents(terms[0])
+        return np.array(sorted(self.phrase_matches(phrase)), dtype=np.uint32)
+
+    def query(self, text):
+        """
+        Evaluate a boolean query and return the sorted IDs of the matching documents.
+        """
+        tokens = []
+        for match in _QUERY_TOKEN.finditer(text):
+            opening, closing, phrase, word = match.groups()
+            if opening or closing:
+                tokens.append(opening or closing)
+            elif phrase is not None:
+                tokens.append(('phrase', phrase))
+            elif word in OPERATORS:
+                tokens.append(word)
+            else:
+                tokens.append(('phrase', word))
+        result, position = self._parse_or(tokens, 0)
+        if position != len(tokens):
+            raise ValueError(f"Unexpected {tokens[position]!r} in query {text!r}")
+        return result
+
+    def _parse_or(self, tokens, position):
+        result, position = self._parse_and(tokens, position)
+        while position < len(tokens) and tokens[position] == 'OR':
+            right, position = self._parse_and(tokens, position + 1)
+            result = np.union1d(result, right)
+        return result, position
+
+    def _parse_and(self, tokens, position):
+        result, position = self._parse_not(tokens, position)
+        while position < len(tokens) and tokens[position] not in ('OR', ')'):
+            if tokens[position] == 'AND':
+                position += 1
+            right, position = self._parse_not(tokens, position)
+            result = np.intersect1d(result, right, assume_unique=True)
+        return result, position
+
+    def _parse_not(self, tokens, position):
+        if position < len(tokens) and tokens[position] == 'NOT':
+            operand, position = self._parse_not(tokens, position + 1)
+            return np.setdiff1d(self.all_documents, operand, assume_unique=True), position
+        return self._parse_atom(tokens, position)
+
+    def _parse_atom(self, tokens, position):
+        if position >= len(tokens):
+            raise ValueError("Query ends unexpectedly")
+        token = tokens[position]
+        if token == '(':
+            result, position = self._parse_or(tokens, position + 1)
+            if position >= len(tokens) or tokens[position] != ')':
+                raise ValueError("Missing ')' in query")
+            return result, position + 1
+        if isinstance(token, tuple):
+            return self._phrase_documents(token[1]), position + 1
+        raise ValueError(f"Unexpected {token!r} in query")
+
+    def search(self, text):
+        """
+        Return the paths (relative to root) of the documents matching a query.
+        """
+        return [self.documents[doc_id]['path'] for doc_id in self.query(text).tolist()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build and query a positional inverted index of text files.')
+    parser.add_argument('--root', default='.', help='Directory holding the text files')
+    parser.add_argument('--index', help=f'Index directory (default: {INDEX_DIR} in the root)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    update_parser = subparsers.add_parser('update', help='Index new and changed files')
+    update_parser.add_argument('--pattern', default=DEFAULT_PATTERN)
+    update_parser.add_argument('--compact', action='store_true', help='Merge all segments afterwards')
+    search_parser = subparsers.add_parser('search', help='Run a query, e.g. \'sky AND "is pink" NOT girl\'')
+    search_parser.add_argument('query')
+    search_parser.add_argument('--positions', action='store_true', help='Show where a phrase query matches')
+    subparsers.add_parser('compact', help='Merge all segments and drop deleted documents')
+    args = parser.parse_args(argv)
+
+    with TextIndex(args.root, args.index) as index:
+        if args.command == 'update':
+            summary = index.update(args.pattern)
+            if args.compact:
+                index.compact()
+            print(f"{summary['added']} indexed, {summary['removed']} removed, {summary['unchanged']} unchanged; "
+                  f"{len(index.documents)} documents in {len(index.segments)} segments.")
+        elif args.command == 'compact':
+            index.compact()
+            print(f"{len(index.documents)} documents in {len(index.segments)} segment(s).")
+        else:
+            started = time.perf_counter()
+            try:
+                if args.positions:
+                    matches = {index.documents[doc_id]['path']: starts.tolist()
+                               for doc_id, starts in index.phrase_matches(args.query).items()}
+                else:
+                    matches = index.search(args.query)
+            except ValueError as error:
+                print(error, file=sys.stderr)
+                return 2
+            elapsed = (time.perf_counter() - started) * 1000
+            for match in matches:
+                print(f"{match}: {matches[match]}" if args.positions else match)
+            print(f"{len(matches)} match(es) in {elapsed:.3f} ms", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+import argparse
+import codecs
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from char_stats import CharStats, iter_blocks
+from word_count import count_chunk, merge
+
+# Bytes read per step; every metric is taken from the same block
+CHUNK_SIZE = 1024 * 1024
+
+# Per-file results are kept here, inside the scanned directory, between runs
+CACHE_NAME = '.text_report_cache.json'
+
+# Bump when the stored per-file results change shape
+CACHE_VERSION = 1
+
+# Terms stored per file; directory-wide top terms are merged from these, so they are exact
+# as long as a term that ranks in the top N overall is within the top TERMS_KEPT of its files
+TERMS_KEPT = 500
+
+DEFAULT_PATTERN = '*.txt'
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+# ASCII punctuation and control characters become spaces, so str.split() finds the terms in C
+_ASCII_SEPARATORS = {code: ' ' for code in range(128) if not _is_word_char(chr(code))}
+
+_TERM = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """
+    Split text into lower-cased terms: runs of letters, digits and underscores.
+    """
+    if text.isascii():
+        return text.lower().translate(_ASCII_SEPARATORS).split()
+    return _TERM.findall(text.lower())
+
+
+def term_boundary(text):
+    """
+    Return where the last complete term of a block ends; the rest may continue in the next block.
+    """
+    cut = len(text)
+    while cut and _is_word_char(text[cut - 1]):
+        cut -= 1
+    return cut
+
+
+def analyze_file(path, top=TERMS_KEPT, encoding='utf-8', chunk_size=CHUNK_SIZE):
+    """
+    Read a file once and return its words, lines, characters, bytes, vowels, top terms and content hash.
+    Words are whitespace-separated (as in word_count); terms are lower-cased runs of letters,
+    digits and underscores. Memory use is one block plus the term counts.
+    """
+    digest = hashlib.blake2b()
+    chars = CharStats(encoding, codepoints=False)
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    tallies = []
+    terms = Counter()
+    lines = characters = 0
+    carry = ''
+    last_byte = b''
+
+    with open(path, 'rb') as stream:
+        for block in iter_blocks(stream, chunk_size):
+            data = bytes(block)
+            digest.update(data)
+            chars.update(data)
+            tallies.append(count_chunk(data))
+            lines += data.count(b'\n')
+            last_byte = data[-1:]
+
+            text = carry + decoder.decode(data)
+            # Hold back a term the block boundary may have cut in two
+            cut = term_boundary(text)
+            carry = text[cut:]
+            characters += cut
+            terms.update(tokenize(text[:cut]))
+
+    text = carry + decoder.decode(b'', final=True)
+    characters += len(text)
+    terms.update(tokenize(text))
+    if last_byte and last_byte != b'\n':
+        # The last line has no newline but is still a line
+        lines += 1
+
+    counts = chars.counts()
+    return {
+        'words': merge(tallies).words,
+        'lines': lines,
+        'characters': characters,
+        'bytes': counts['bytes'],
+        'vowels': counts['vowels'],
+        'terms': terms.most_common(top),
+        'hash': digest.hexdigest(),
+    }
+
+
+def _scan(job):
+    """
+    Worker: analyse a file whose size or mtime changed. The content hash comes out of the same
+    read, and 'unchanged' records whether it still matches the cached one.
+    """
+    path, cached_hash, top, encoding = job
+    result = analyze_file(path, top, encoding)
+    result['unchanged'] = result['hash'] == cached_hash
+    return result
+
+
+def iter_files(directory, pattern=DEFAULT_PATTERN):
+    for root, dirs, names in os.walk(directory):
+        dirs.sort()
+        for name in sorted(names):
+            if name != CACHE_NAME and fnmatch.fnmatch(name, pattern):
+                yield os.path.join(root, name)
+
+
+def _load_cache(path, top, encoding):
+    try:
+        with open(path, 'r') as cache_file:
+            cache = json.load(cache_file)
+    except (FileNotFoundError, ValueError):
+        return {}
+    # Results depend on how many terms were kept and how the files were decoded
+    if (cache.get('version'), cache.get('top'), cache.get('encoding')) != (CACHE_VERSION, top, encoding):
+        return {}
+    return cache['files']
+
+
+def _save_cache(path, files, top, encoding):
+    # Write atomically so an interrupted run never leaves a half-written cache
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.report-', suffix='.tmp')
+    with os.fdopen(fd, 'w') as cache_file:
+        json.dump({'version': CACHE_VERSION, 'top': top, 'encoding': encoding, 'files': files}, cache_file)
+    os.replace(tmp_path, path)
+
+
+def analyze_directory(directory, pattern=DEFAULT_PATTERN, workers=None, cache_path=None, top=TERMS_KEPT,
+                      encoding='utf-8'):
+    """
+    Analyse every matching file under a directory, reusing cached results for unchanged files.
+    A cache written with another top or encoding is discarded.
+    A file whose size and mtime match the cache is not opened at all. The others are read once,
+    spread over a process pool; the content hash from that read tells which of them only had
+    their mtime touched.
+    Args:
+        directory (str): Directory to walk.
+        pattern (str): fnmatch pattern of the file names to include.
+        workers (int): Worker processes; 1 analyses in-process.
+        cache_path (str): Cache file; defaults to CACHE_NAME inside the directory, '' disables it.
+        top (int): Terms kept per file.
+        encoding (str): Text encoding of the files.
+    Returns: ({relative path: result}, {'cached': n, 'rehashed': n, 'analyzed': n}).
+    """
+    if cache_path is None:
+        cache_path = os.path.join(directory, CACHE_NAME)
+    cache = _load_cache(cache_path, top, encoding) if cache_path else {}
+
+    results = {}
+    pending = []
+    for path in iter_files(directory, pattern):
+        relative = os.path.relpath(path, directory)
+        stat_result = os.stat(path)
+        entry = cache.get(relative)
+        if entry and entry['size'] == stat_result.st_size and entry['mtime_ns'] == stat_result.st_mtime_ns:
+            results[relative] = entry
+        else:
+            pending.append((relative, path, stat_result, entry['hash'] if entry else None))
+
+    jobs = [(path, cached_hash, top, encoding) for _, path, _, cached_hash in pending]
+    if workers == 1 or len(jobs) < 2:
+        scanned = list(map(_scan, jobs))
+    else:
+        # Hand out several files per task so thousands of small documents do not cost a round trip each
+        chunksize = max(1, len(jobs) // (4 * (workers or os.cpu_count() or 1)))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            scanned = list(executor.map(_scan, jobs, chunksize=chunksize))
+
+    summary = {'cached': len(results), 'rehashed': 0, 'analyzed': 0}
+    for (relative, _, stat_result, _), result in zip(pending, scanned):
+        if result.pop('unchanged'):
+            summary['rehashed'] += 1
+        else:
+            summary['analyzed'] += 1
+        result.update(size=stat_result.st_size, mtime_ns=stat_result.st_mtime_ns)
+        results[relative] = result
+
+    if cache_path:
+        _save_cache(cache_path, results, top, encoding)
+    return dict(sorted(results.items())), summary
+
+
+def format_report(results, top=10):
+    """
+    Render per-file lines, the totals and the most common terms as plain text.
+    """
+    lines = []
+    totals = Counter()
+    terms = Counter()
+    for path, result in results.items():
+        lines.append(f"{path}: words {result['words']}, lines {result['lines']}, "
+                     f"characters {result['characters']}, vowels {result['vowels']}")
+        for name in ('words', 'lines', 'characters', 'bytes', 'vowels'):
+            totals[name] += result[name]
+        terms.update(dict(result['terms']))
+    lines.append(f"Total ({len(results)} files): words {totals['words']}, lines {totals['lines']}, "
+                 f"characters {totals['characters']}, vowels {totals['vowels']}")
+    lines.append(f"Top {top} terms: " + ', '.join(f"{term} {count}" for term, count in terms.most_common(top)))
+    return '\n'.join(lines) + '\n'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Word, line, character, vowel and term counts for a directory.')
+    parser.add_argument('directory', nargs='?', default='.')
+    parser.add_argument('--pattern', default=DEFAULT_PATTERN, help='File names to include (default: *.txt)')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--top', type=int, default=10, help='Most common terms to report')
+    parser.add_argument('--cache', help=f'Cache file (default: {CACHE_NAME} in the directory)')
+    parser.add_argument('--no-cache', action='store_true', help='Analyse every file and keep no cache')
+    parser.add_argument('--encoding', default='utf-8')
+    parser.add_argument('--output', help='Write the report to this file, e.g. finalFile')
+    args = parser.parse_args(argv)
+
+    cache_path = '' if args.no_cache else args.cache
+    results, summary = analyze_directory(args.directory, args.pattern, args.workers, cache_path,
+                                         max(args.top, TERMS_KEPT), args.encoding)
+    report = format_report(results, args.top)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(report)
+    else:
+        sys.stdout.write(report)
+    print(f"{summary['analyzed']} analysed, {summary['rehashed']} unchanged after hashing, "
+          f"{summary['cached']} from cache.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,21 +1,15 @@
+from char_stats import analyze, is_vowel
+
 def is_Vowel(a):
- for i in ['a' , 'e' , 'i ','o' ,'u']:
-   if  a==i :
-      print("True")
-   else :
-      print("False")
+ # One membership test instead of printing a result for every vowel in the list
+ print(len(a) == 1 and is_vowel(a))
 
 def Main(b):
-
- count=0
- for i in b:
-   if i in ['a','e',"i" ,"o" , "u"]:
-      count=count+1
- print(count)
-
+ print(analyze(b).counts()['vowels'])
 
 
-a=input("Enter the charector")
-b=input("Enter the string")
-is_Vowel(a)
-Main(b)
\ No newline at end of file
+if __name__ == "__main__":
+ a=input("Enter the charector")
+ b=input("Enter the string")
+ is_Vowel(a)
+ Main(b)
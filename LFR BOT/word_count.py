@@ -0,0 +1,199 @@
+import argparse
+import mmap
+import os
+import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+# Bytes read (or mapped) per step; memory use per worker stays at about this much
+CHUNK_SIZE = 1024 * 1024
+
+# Files smaller than this are counted in-process; starting workers costs more than it saves
+PARALLEL_MIN_SIZE = 64 * 1024 * 1024
+
+# Each worker gets several segments so a slow one does not hold up the rest
+SEGMENTS_PER_WORKER = 4
+
+# The separators str.split() and bytes.split() agree on
+ASCII_WHITESPACE = b' \t\n\r\x0b\x0c'
+
+# str.isspace() also counts the ASCII file/group/record/unit separators
+UNICODE_ASCII_WHITESPACE = ASCII_WHITESPACE + b'\x1c\x1d\x1e\x1f'
+
+# UTF-8 encodings of the non-ASCII whitespace characters (U+0085, U+00A0, U+2000-U+200A, U+3000, ...)
+UNICODE_WHITESPACE = tuple(chr(code).encode('utf-8') for code in range(0x80, 0x3001) if chr(code).isspace())
+
+
+def _word_table(whitespace):
+    # Map every whitespace byte to b' ' and every other byte to b'w'
+    return bytes(0x20 if byte in whitespace else 0x77 for byte in range(256))
+
+
+ASCII_TABLE = _word_table(ASCII_WHITESPACE)
+UNICODE_TABLE = _word_table(UNICODE_ASCII_WHITESPACE)
+
+# Words in a chunk, and whether the chunk starts and ends inside a word (None for an empty chunk)
+Tally = namedtuple('Tally', ['words', 'starts_in_word', 'ends_in_word'])
+
+EMPTY = Tally(0, None, None)
+
+
+def count_chunk(chunk, unicode=False):
+    """
+    Count the words in one block of bytes without splitting it into a list.
+    The block is translated to ' '/'w' and every ' w' pair marks the start of a word.
+    With unicode=True the block must be whole UTF-8 characters; Unicode whitespace also separates words.
+    """
+    if unicode and not chunk.isascii():
+        for separator in UNICODE_WHITESPACE:
+            if separator in chunk:
+                chunk = chunk.replace(separator, b' ')
+    if not chunk:
+        return EMPTY
+    marks = chunk.translate(UNICODE_TABLE if unicode else ASCII_TABLE)
+    starts_in_word = marks[0] == 0x77
+    return Tally(marks.count(b' w') + starts_in_word, starts_in_word, marks[-1] == 0x77)
+
+
+def merge(tallies):
+    """
+    Combine the tallies of consecutive chunks; a word cut in two by a chunk boundary is counted once.
+    """
+    words = 0
+    starts_in_word = ends_in_word = None
+    for tally in tallies:
+        if tally.starts_in_word is None:
+            # An empty chunk neither joins nor separates its neighbours
+            continue
+        words += tally.words
+        if ends_in_word and tally.starts_in_word:
+            words -= 1
+        if starts_in_word is None:
+            starts_in_word = tally.starts_in_word
+        ends_in_word = tally.ends_in_word
+    if starts_in_word is None:
+        return EMPTY
+    return Tally(words, starts_in_word, ends_in_word)
+
+
+def _char_start(buffer, position, end):
+    # Step forward past UTF-8 continuation bytes so a segment never begins mid-character
+    while position < end and (buffer[position] & 0xC0) == 0x80:
+        position += 1
+    return position
+
+
+def _count_range(buffer, start, end, chunk_size, unicode):
+    tallies = []
+    position = start
+    while position < end:
+        stop = min(position + chunk_size, end)
+        if unicode:
+            stop = _char_start(buffer, stop, end)
+        tallies.append(count_chunk(buffer[position:stop], unicode))
+        position = stop
+    return merge(tallies)
+
+
+def _count_segment(path, start, end, chunk_size, unicode):
+    with open(path, 'rb') as source, mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        if hasattr(buffer, 'madvise'):
+            buffer.madvise(mmap.MADV_SEQUENTIAL)
+        return _count_range(buffer, start, end, chunk_size, unicode)
+
+
+def count_stream(stream, chunk_size=CHUNK_SIZE, unicode=False):
+    """
+    Count the words in a binary file object (a pipe, a socket, stdin) by reading fixed-size blocks.
+    Returns a Tally.
+    """
+    tallies = []
+    carry = b''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        chunk = carry + chunk
+        carry = b''
+        if unicode:
+            # Hold back the last character, which may still be missing bytes, until the next block
+            cut = len(chunk) - 1
+            while cut > 0 and (chunk[cut] & 0xC0) == 0x80:
+                cut -= 1
+            chunk, carry = chunk[:cut], chunk[cut:]
+        tallies.append(count_chunk(chunk, unicode))
+    tallies.append(count_chunk(carry, unicode))
+    return merge(tallies)
+
+
+def _segments(path, size, parts, unicode):
+    bounds = [size * part // parts for part in range(parts + 1)]
+    if unicode:
+        with open(path, 'rb') as source, mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            bounds = [_char_start(buffer, bound, size) for bound in bounds]
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+
+
+def count_file(path, workers=None, chunk_size=CHUNK_SIZE, unicode=False, executor=None):
+    """
+    Count the words in a file of any size. Returns a Tally.
+    Regular files are memory-mapped; large ones are cut into segments that a process pool counts
+    in parallel, and the partial tallies are merged in order. Anything that cannot be mapped
+    (empty files, pipes, devices) is read as a stream.
+    Args:
+        path (str): File to count.
+        workers (int): Worker processes; defaults to the CPU count, 1 counts in-process.
+        chunk_size (int): Bytes handled per step.
+        unicode (bool): Treat the file as UTF-8 and split on Unicode whitespace too.
+        executor: Optional process pool to reuse across files.
+    """
+    size = os.stat(path).st_size
+    if size == 0 or not os.path.isfile(path):
+        with open(path, 'rb') as stream:
+            return count_stream(stream, chunk_size, unicode)
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or size < PARALLEL_MIN_SIZE:
+        return _count_segment(path, 0, size, chunk_size, unicode)
+
+    segments = _segments(path, size, workers * SEGMENTS_PER_WORKER, unicode)
+    pool = executor or ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [pool.submit(_count_segment, path, start, end, chunk_size, unicode) for start, end in segments]
+        return merge(future.result() for future in futures)
+    finally:
+        if executor is None:
+            pool.shutdown()
+
+
+def count_words(path, workers=None, unicode=False):
+    """
+    Return the number of whitespace-separated words in a file.
+    """
+    return count_file(path, workers, unicode=unicode).words
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Count the words in files of any size.')
+    parser.add_argument('paths', nargs='+', help="Files to count; '-' reads standard input")
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--unicode', action='store_true', help='Split on Unicode whitespace in UTF-8 text too')
+    args = parser.parse_args(argv)
+
+    total = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for path in args.paths:
+            if path == '-':
+                words = count_stream(sys.stdin.buffer, args.chunk_size, args.unicode).words
+            else:
+                words = count_file(path, args.workers, args.chunk_size, args.unicode, executor).words
+            total += words
+            print(f"The no of words in {path} is {words}")
+    if len(args.paths) > 1:
+        print(f"Total: {total}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())